@@ -0,0 +1,27 @@
+"""
+Configuración de gunicorn.
+Prepara el directorio compartido de prometheus_client para que /metrics agregue
+las métricas de todos los workers
+"""
+import os
+import shutil
+import tempfile
+
+prometheus_dir = os.environ.setdefault(
+    "PROMETHEUS_MULTIPROC_DIR",
+    os.path.join(tempfile.gettempdir(), "prometheus_multiproc")
+)
+
+
+def on_starting(server):
+    # Los archivos de una ejecución anterior falsearían los contadores
+    shutil.rmtree(prometheus_dir, ignore_errors=True)
+    os.makedirs(prometheus_dir, exist_ok=True)
+
+
+def child_exit(server, worker):
+    try:
+        from prometheus_client import multiprocess
+    except ImportError:
+        return
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,39 @@
+"""add user_points_totals running aggregate
+
+Revision ID: 3f9c2a7d1b4e
+Revises: 846cebf033f6
+Create Date: 2026-10-18 09:12:41.503118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f9c2a7d1b4e'
+down_revision = '846cebf033f6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('user_points_totals',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('total_points', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.user_id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+    op.create_index('ix_user_points_totals_total_points', 'user_points_totals', ['total_points'], unique=False)
+
+    # Poblar los totales con el historial existente
+    op.execute(
+        "INSERT INTO user_points_totals (user_id, total_points, updated_at) "
+        "SELECT user_id, SUM(points), CURRENT_TIMESTAMP FROM user_points "
+        "WHERE user_id IS NOT NULL GROUP BY user_id"
+    )
+
+
+def downgrade():
+    op.drop_index('ix_user_points_totals_total_points', table_name='user_points_totals')
+    op.drop_table('user_points_totals')
@@ -0,0 +1,44 @@
+"""add upload_sessions for chunked resumable uploads
+
+Revision ID: 5b0e83f4a6d9
+Revises: c4e7b19a0d52
+Create Date: 2026-10-18 12:41:55.190337
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b0e83f4a6d9'
+down_revision = 'c4e7b19a0d52'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('upload_sessions',
+    sa.Column('upload_id', sa.String(length=32), nullable=False),
+    sa.Column('filename', sa.String(length=255), nullable=False),
+    sa.Column('type', sa.Enum('video', 'image', 'gif', 'animation', 'document', name='type_upload_sessions'), nullable=False),
+    sa.Column('description', sa.String(length=255), nullable=True),
+    sa.Column('total_size', sa.BigInteger(), nullable=False),
+    sa.Column('chunk_size', sa.Integer(), nullable=False),
+    sa.Column('total_chunks', sa.Integer(), nullable=False),
+    sa.Column('status', sa.Enum('uploading', 'completed', 'cancelled', name='status_upload_sessions'), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('completed_at', sa.DateTime(), nullable=True),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('lesson_id', sa.Integer(), nullable=False),
+    sa.Column('job_id', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['job_id'], ['media_jobs.job_id'], ondelete='SET NULL'),
+    sa.ForeignKeyConstraint(['lesson_id'], ['lessons.lesson_id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['user_id'], ['users.user_id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('upload_id')
+    )
+
+
+def downgrade():
+    op.drop_table('upload_sessions')
+    sa.Enum(name='status_upload_sessions').drop(op.get_bind(), checkfirst=True)
+    sa.Enum(name='type_upload_sessions').drop(op.get_bind(), checkfirst=True)
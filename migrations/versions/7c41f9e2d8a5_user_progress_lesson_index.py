@@ -0,0 +1,26 @@
+"""add user_progress (lesson_id, user_id) index for course/module progress queries
+
+Revision ID: 7c41f9e2d8a5
+Revises: e3a8b25c9f10
+Create Date: 2026-10-18 17:48:36.270113
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c41f9e2d8a5'
+down_revision = 'e3a8b25c9f10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Progreso filtrado por curso o módulo: se llega a user_progress desde las lecciones.
+    # Las consultas por usuario ya usan uq_user_lesson_progress (user_id, lesson_id)
+    op.create_index('ix_user_progress_lesson_user', 'user_progress', ['lesson_id', 'user_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_user_progress_lesson_user', table_name='user_progress')
@@ -0,0 +1,60 @@
+"""add user_points source key for idempotent awards
+
+Revision ID: 9d2c6a41e7f3
+Revises: 5b0e83f4a6d9
+Create Date: 2026-10-18 15:07:23.418902
+
+"""
+import re
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9d2c6a41e7f3'
+down_revision = '5b0e83f4a6d9'
+branch_labels = None
+depends_on = None
+
+# Descripciones que generaban las compras antes de existir la clave de origen
+PURCHASE_DESCRIPTION = re.compile(r'purchase_id:(\d+)|Compra #?(\d+) del curso')
+
+
+def upgrade():
+    with op.batch_alter_table('user_points') as batch_op:
+        batch_op.add_column(sa.Column('source_type', sa.String(length=30), nullable=True))
+        batch_op.add_column(sa.Column('source_id', sa.Integer(), nullable=True))
+
+    # Asignar la clave a los puntos de compras ya otorgados para que no se vuelvan a otorgar.
+    # Si una compra se premió dos veces, solo el primer registro recibe la clave
+    bind = op.get_bind()
+    rows = bind.execute(sa.text(
+        "SELECT point_id, user_id, event_description FROM user_points "
+        "WHERE event_description LIKE '%Compra %' ORDER BY point_id"
+    )).all()
+
+    seen = set()
+    for point_id, user_id, description in rows:
+        match = PURCHASE_DESCRIPTION.search(description or '')
+        if not match:
+            continue
+        purchase_id = int(match.group(1) or match.group(2))
+        if (user_id, purchase_id) in seen:
+            continue
+        seen.add((user_id, purchase_id))
+        bind.execute(
+            sa.text("UPDATE user_points SET source_type = 'purchase', source_id = :source_id "
+                    "WHERE point_id = :point_id"),
+            {'source_id': purchase_id, 'point_id': point_id}
+        )
+
+    with op.batch_alter_table('user_points') as batch_op:
+        batch_op.create_unique_constraint('uq_user_points_source', ['user_id', 'source_type', 'source_id'])
+
+
+def downgrade():
+    with op.batch_alter_table('user_points') as batch_op:
+        batch_op.drop_constraint('uq_user_points_source', type_='unique')
+        batch_op.drop_column('source_id')
+        batch_op.drop_column('source_type')
@@ -0,0 +1,62 @@
+"""add indexes for hot filter and sort columns
+
+Revision ID: a81d5e60c2f7
+Revises: 3f9c2a7d1b4e
+Create Date: 2026-10-18 10:03:17.224905
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a81d5e60c2f7'
+down_revision = '3f9c2a7d1b4e'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Columna usada por routes.py y el webhook de Stripe pero ausente en la migración inicial
+    op.add_column('purchases', sa.Column('stripe_payment_intent_id', sa.String(length=255), nullable=True))
+
+    # Ranking de usuarios activos ordenado por puntos (points_ranking, leaderboard)
+    op.create_index('ix_users_active_points', 'users', ['current_points'], unique=False,
+                    postgresql_where=sa.text('is_active'), sqlite_where=sa.text('is_active'))
+    op.create_index('ix_users_role_active', 'users', ['role', 'is_active'], unique=False)
+
+    # Cursos por profesor y catálogo público de cursos activos
+    op.create_index('ix_courses_created_by', 'courses', ['created_by'], unique=False)
+    op.create_index('ix_courses_active', 'courses', ['course_id'], unique=False,
+                    postgresql_where=sa.text('is_active'), sqlite_where=sa.text('is_active'))
+
+    # Compras por usuario/estado, por curso, por fecha y por PaymentIntent
+    op.create_index('ix_purchases_user_status', 'purchases', ['user_id', 'status'], unique=False)
+    op.create_index('ix_purchases_course_id', 'purchases', ['course_id'], unique=False)
+    op.create_index('ix_purchases_date', 'purchases', ['purchase_date', 'purchase_id'], unique=False)
+    op.create_index('ix_purchases_stripe_payment_intent_id', 'purchases', ['stripe_payment_intent_id'], unique=True)
+    op.create_index('ix_purchases_pending', 'purchases', ['purchase_id'], unique=False,
+                    postgresql_where=sa.text("status = 'pending'"), sqlite_where=sa.text("status = 'pending'"))
+
+    # Historial de puntos por usuario y multimedia por lección en orden
+    op.create_index('ix_user_points_user_date', 'user_points', ['user_id', 'date'], unique=False)
+    op.create_index('ix_multimedia_resources_lesson_order', 'multimedia_resources', ['lesson_id', 'order'], unique=False)
+
+    # user_progress.user_id, lessons.module_id y modules.course_id ya están cubiertos por
+    # las restricciones únicas uq_user_lesson_progress, uq_lesson_order_per_module y
+    # uq_module_order_per_course, cuyo índice empieza por esa columna
+
+
+def downgrade():
+    op.drop_index('ix_multimedia_resources_lesson_order', table_name='multimedia_resources')
+    op.drop_index('ix_user_points_user_date', table_name='user_points')
+    op.drop_index('ix_purchases_pending', table_name='purchases')
+    op.drop_index('ix_purchases_stripe_payment_intent_id', table_name='purchases')
+    op.drop_index('ix_purchases_date', table_name='purchases')
+    op.drop_index('ix_purchases_course_id', table_name='purchases')
+    op.drop_index('ix_purchases_user_status', table_name='purchases')
+    op.drop_index('ix_courses_active', table_name='courses')
+    op.drop_index('ix_courses_created_by', table_name='courses')
+    op.drop_index('ix_users_role_active', table_name='users')
+    op.drop_index('ix_users_active_points', table_name='users')
+    op.drop_column('purchases', 'stripe_payment_intent_id')
@@ -0,0 +1,29 @@
+"""add media_jobs.locked_at lease to reclaim jobs of crashed workers
+
+Revision ID: b6d1f0a7c3e2
+Revises: 7c41f9e2d8a5
+Create Date: 2026-10-18 19:02:41.518307
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b6d1f0a7c3e2'
+down_revision = '7c41f9e2d8a5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('media_jobs') as batch_op:
+        batch_op.add_column(sa.Column('locked_at', sa.DateTime(), nullable=True))
+
+    # Los trabajos que ya estaban 'running' sin lease se recuperan en el siguiente ciclo del worker
+    op.execute("UPDATE media_jobs SET locked_at = started_at WHERE status = 'running'")
+
+
+def downgrade():
+    with op.batch_alter_table('media_jobs') as batch_op:
+        batch_op.drop_column('locked_at')
@@ -0,0 +1,59 @@
+"""add media_jobs queue for background lesson media uploads
+
+Revision ID: c4e7b19a0d52
+Revises: a81d5e60c2f7
+Create Date: 2026-10-18 11:26:09.871442
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4e7b19a0d52'
+down_revision = 'a81d5e60c2f7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('media_jobs',
+    sa.Column('job_id', sa.Integer(), nullable=False),
+    sa.Column('status', sa.Enum('pending', 'running', 'done', 'failed', name='status_media_jobs'), nullable=False),
+    sa.Column('total_files', sa.Integer(), nullable=False),
+    sa.Column('processed_files', sa.Integer(), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('error', sa.String(length=500), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('started_at', sa.DateTime(), nullable=True),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.Column('lesson_id', sa.Integer(), nullable=False),
+    sa.Column('created_by', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['created_by'], ['users.user_id'], ondelete='SET NULL'),
+    sa.ForeignKeyConstraint(['lesson_id'], ['lessons.lesson_id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('job_id')
+    )
+    op.create_index('ix_media_jobs_status', 'media_jobs', ['status', 'job_id'], unique=False)
+    op.create_table('media_job_files',
+    sa.Column('file_id', sa.Integer(), nullable=False),
+    sa.Column('path', sa.String(length=500), nullable=False),
+    sa.Column('original_filename', sa.String(length=255), nullable=False),
+    sa.Column('type', sa.Enum('video', 'image', 'gif', 'animation', 'document', name='type_media_job_files'), nullable=False),
+    sa.Column('description', sa.String(length=255), nullable=True),
+    sa.Column('position', sa.Integer(), nullable=False),
+    sa.Column('status', sa.Enum('pending', 'done', 'failed', name='status_media_job_files'), nullable=False),
+    sa.Column('job_id', sa.Integer(), nullable=False),
+    sa.Column('resource_id', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['job_id'], ['media_jobs.job_id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['resource_id'], ['multimedia_resources.resource_id'], ondelete='SET NULL'),
+    sa.PrimaryKeyConstraint('file_id')
+    )
+
+
+def downgrade():
+    op.drop_table('media_job_files')
+    op.drop_index('ix_media_jobs_status', table_name='media_jobs')
+    op.drop_table('media_jobs')
+    sa.Enum(name='status_media_job_files').drop(op.get_bind(), checkfirst=True)
+    sa.Enum(name='type_media_job_files').drop(op.get_bind(), checkfirst=True)
+    sa.Enum(name='status_media_jobs').drop(op.get_bind(), checkfirst=True)
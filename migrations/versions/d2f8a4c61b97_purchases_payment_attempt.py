@@ -0,0 +1,26 @@
+"""add purchases.payment_attempt so a revived cancelled purchase gets a new PaymentIntent
+
+Revision ID: d2f8a4c61b97
+Revises: b6d1f0a7c3e2
+Create Date: 2026-10-18 20:14:05.227913
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd2f8a4c61b97'
+down_revision = 'b6d1f0a7c3e2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('purchases') as batch_op:
+        batch_op.add_column(sa.Column('payment_attempt', sa.Integer(), nullable=False, server_default='0'))
+
+
+def downgrade():
+    with op.batch_alter_table('purchases') as batch_op:
+        batch_op.drop_column('payment_attempt')
@@ -0,0 +1,38 @@
+"""add stripe_webhook_events inbox
+
+Revision ID: e3a8b25c9f10
+Revises: 9d2c6a41e7f3
+Create Date: 2026-10-18 16:22:09.731458
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e3a8b25c9f10'
+down_revision = '9d2c6a41e7f3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('stripe_webhook_events',
+    sa.Column('event_id', sa.String(length=255), nullable=False),
+    sa.Column('type', sa.String(length=100), nullable=False),
+    sa.Column('payload', sa.Text(), nullable=False),
+    sa.Column('status', sa.Enum('pending', 'processed', 'failed', name='status_stripe_webhook_events'), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('error', sa.String(length=500), nullable=True),
+    sa.Column('received_at', sa.DateTime(), nullable=False),
+    sa.Column('processed_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('event_id')
+    )
+    op.create_index('ix_stripe_webhook_events_pending', 'stripe_webhook_events', ['received_at'], unique=False,
+                    postgresql_where=sa.text("status = 'pending'"), sqlite_where=sa.text("status = 'pending'"))
+
+
+def downgrade():
+    op.drop_index('ix_stripe_webhook_events_pending', table_name='stripe_webhook_events')
+    op.drop_table('stripe_webhook_events')
+    sa.Enum(name='status_stripe_webhook_events').drop(op.get_bind(), checkfirst=True)
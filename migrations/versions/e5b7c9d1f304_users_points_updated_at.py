@@ -0,0 +1,28 @@
+"""add users.points_updated_at so every process's leaderboard can pick up point changes
+
+Revision ID: e5b7c9d1f304
+Revises: d2f8a4c61b97
+Create Date: 2026-10-18 21:06:52.904113
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5b7c9d1f304'
+down_revision = 'd2f8a4c61b97'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.add_column(sa.Column('points_updated_at', sa.DateTime(), nullable=True))
+        batch_op.create_index('ix_users_points_updated_at', ['points_updated_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.drop_index('ix_users_points_updated_at')
+        batch_op.drop_column('points_updated_at')
@@ -0,0 +1,29 @@
+"""add catalog_versions so every process's catalog cache sees writes made by other processes
+
+Revision ID: f7c2a9e4b150
+Revises: e5b7c9d1f304
+Create Date: 2026-10-18 23:12:40.518306
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f7c2a9e4b150'
+down_revision = 'e5b7c9d1f304'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    catalog_versions = op.create_table('catalog_versions',
+    sa.Column('name', sa.String(length=50), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+    op.bulk_insert(catalog_versions, [{'name': 'catalog', 'version': 0}])
+
+
+def downgrade():
+    op.drop_table('catalog_versions')
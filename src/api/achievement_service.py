@@ -0,0 +1,157 @@
+"""
+achievement_service.py
+Asignación automática de logros: los umbrales (required_points) se guardan ordenados en memoria
+y cada cambio de current_points otorga con bisect los logros cuyos umbrales se han cruzado
+"""
+import os
+import threading
+import time
+from bisect import bisect_right
+from datetime import datetime, timezone
+
+from api.models import db, dialect_insert, Achievements, UserAchievements, Users
+
+# Las escrituras de /achievements en este proceso refrescan los umbrales al momento; las de otros
+# procesos de gunicorn se ven como mucho tras el TTL
+ACHIEVEMENT_THRESHOLDS_TTL = int(os.getenv("ACHIEVEMENT_THRESHOLDS_TTL", "60"))
+
+
+class AchievementService:
+    """Umbrales de logros ordenados por required_points y alta de logros por cruce de umbral"""
+
+    def __init__(self, ttl_seconds=ACHIEVEMENT_THRESHOLDS_TTL):
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        # (instante de carga, required_points ordenados, achievement_id en el mismo orden)
+        self._thresholds = None
+
+    def thresholds(self):
+        """
+        Returns:
+            tuple: (required_points ordenados, achievement_id correspondientes)
+        """
+        snapshot = self._thresholds
+        if snapshot and time.monotonic() - snapshot[0] <= self.ttl_seconds:
+            return snapshot[1], snapshot[2]
+
+        with self._lock:
+            snapshot = self._thresholds
+            if snapshot and time.monotonic() - snapshot[0] <= self.ttl_seconds:
+                return snapshot[1], snapshot[2]
+
+            rows = db.session.execute(
+                db.select(Achievements.required_points, Achievements.achievement_id)
+                .order_by(Achievements.required_points, Achievements.achievement_id)
+            ).all()
+            snapshot = (
+                time.monotonic(),
+                tuple(row.required_points for row in rows),
+                tuple(row.achievement_id for row in rows)
+            )
+            self._thresholds = snapshot
+
+        return snapshot[1], snapshot[2]
+
+    def refresh(self):
+        """Descarta los umbrales tras crear, modificar o eliminar un logro"""
+        with self._lock:
+            self._thresholds = None
+
+    def crossed(self, old_points, new_points):
+        """
+        Logros con old_points < required_points <= new_points. Si los puntos bajan no se retira nada
+
+        Returns:
+            tuple: IDs de los logros alcanzados con este cambio
+        """
+        old_points = old_points or 0
+        new_points = new_points or 0
+        if new_points <= old_points:
+            return ()
+
+        points, achievement_ids = self.thresholds()
+        return achievement_ids[bisect_right(points, old_points):bisect_right(points, new_points)]
+
+    def award_crossed(self, changes):
+        """
+        Otorga en una sola sentencia los logros cruzados por varios cambios de puntos (no hace commit).
+        Los que el usuario ya tenía se ignoran por uq_user_achievement (ON CONFLICT DO NOTHING)
+
+        Args:
+            changes (dict): user_id -> (current_points anterior, current_points nuevo)
+
+        Returns:
+            dict: user_id -> lista de achievement_id otorgados ahora
+        """
+        now = datetime.now(timezone.utc)
+        rows = [
+            {'user_id': user_id, 'achievement_id': achievement_id, 'obtained_date': now}
+            for user_id, (old_points, new_points) in changes.items() if user_id
+            for achievement_id in self.crossed(old_points, new_points)
+        ]
+        if not rows:
+            return {}
+
+        statement = dialect_insert(UserAchievements).on_conflict_do_nothing(
+            index_elements=[UserAchievements.user_id, UserAchievements.achievement_id]
+        ).returning(UserAchievements.user_id, UserAchievements.achievement_id)
+
+        awarded = {}
+        for user_id, achievement_id in db.session.execute(statement, rows).all():
+            awarded.setdefault(user_id, []).append(achievement_id)
+        return awarded
+
+    @staticmethod
+    def backfill(chunk_size=5000, achievement_ids=None, echo=print):
+        """
+        Otorga los logros a todos los usuarios que ya cumplen required_points con un
+        INSERT ... SELECT ... ON CONFLICT DO NOTHING por rango de user_id y un commit por rango:
+        las transacciones son cortas y las altas simultáneas del motor no chocan con el relleno
+
+        Args:
+            chunk_size (int): Tamaño del rango de user_id por sentencia
+            achievement_ids (list): Limitar a estos logros (por defecto todos)
+            echo (callable): Salida del progreso
+
+        Returns:
+            dict: Totales (rangos procesados, logros insertados, segundos)
+        """
+        stats = {'chunks': 0, 'inserted': 0}
+        started = time.perf_counter()
+
+        low, high = db.session.execute(db.select(db.func.min(Users.user_id), db.func.max(Users.user_id))).one()
+        db.session.commit()
+        if low is None:
+            stats['seconds'] = 0.0
+            return stats
+
+        conditions = [Users.current_points >= Achievements.required_points]
+        if achievement_ids:
+            conditions.append(Achievements.achievement_id.in_(achievement_ids))
+
+        for start in range(low, high + 1, chunk_size):
+            end = start + chunk_size
+            qualifying = (
+                db.select(Users.user_id, Achievements.achievement_id, db.literal(datetime.now(timezone.utc)))
+                .join(Achievements, db.and_(*conditions))
+                .where(Users.user_id >= start, Users.user_id < end)
+            )
+            statement = dialect_insert(UserAchievements).from_select(
+                ['user_id', 'achievement_id', 'obtained_date'], qualifying
+            ).on_conflict_do_nothing(
+                index_elements=[UserAchievements.user_id, UserAchievements.achievement_id]
+            )
+
+            inserted = db.session.execute(statement).rowcount
+            db.session.commit()
+
+            stats['chunks'] += 1
+            stats['inserted'] += max(inserted or 0, 0)
+            echo(f"  user_id {start}-{min(end - 1, high)}: {stats['inserted']} achievements awarded so far")
+
+        stats['seconds'] = round(time.perf_counter() - started, 2)
+        return stats
+
+
+# Instancia global del servicio
+achievement_service = AchievementService()
@@ -0,0 +1,314 @@
+"""
+benchmark.py
+Pruebas de carga de los endpoints calientes de /api con presupuestos de latencia y de consultas SQL
+"""
+import json
+import os
+import platform
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import stripe
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event
+
+from api.models import db, Users
+from api.cloudinary_service import cloudinary_service, LocalFakeUploader
+from api.seed_service import SEED_PASSWORD
+from api.leaderboard_service import leaderboard
+from api.catalog_cache_service import catalog_cache
+
+BASELINES_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'perf', 'baselines.json'))
+
+# Margen que se añade a las mediciones al regenerar los presupuestos de latencia:
+# las consultas SQL son deterministas, la latencia depende de la máquina
+BUDGET_HEADROOM = 2.0
+BUDGET_MIN_SLACK_MS = 5.0
+# Los presupuestos de latencia solo se comprueban en el mismo entorno en que se midieron,
+# y aun así multiplicados por esta tolerancia (ruido de CPU, disco y otras cargas)
+LATENCY_TOLERANCE = float(os.getenv("LOAD_TEST_LATENCY_TOLERANCE", "3"))
+ENVIRONMENT_KEY = '_environment'
+
+# (nombre, método, ruta, rol del usuario que hace la petición, cuerpo JSON)
+HOT_ENDPOINTS = [
+    ('login', 'POST', '/api/login', None, 'login'),
+    ('courses_public', 'GET', '/api/courses-public?page=1&per_page=20', None, None),
+    ('lessons_private', 'GET', '/api/lessons-private?page=1&per_page=20', 'teacher', None),
+    ('points_ranking_admin', 'GET', '/api/points-ranking?page=1&per_page=20', 'admin', None),
+    ('points_ranking_student', 'GET', '/api/points-ranking', 'student', None),
+    ('user_points', 'GET', '/api/user-points?page=1&per_page=20', 'admin', None),
+    ('purchases_private', 'GET', '/api/purchases-private?page=1&per_page=20', 'admin', None),
+    ('purchases_private_cursor', 'GET', '/api/purchases-private?cursor=&per_page=20', 'admin', None),
+    ('userprogress', 'GET', '/api/userprogress', 'student', None),
+    ('userprogress_course', 'GET', '/api/userprogress?course_id=1&per_page=20', 'teacher', None),
+    ('userprogress_summary', 'GET', '/api/userprogress/summary', 'student', None),
+]
+
+
+class OfflineStripeClient(stripe.HTTPClient):
+    """Cliente HTTP de Stripe que nunca sale a la red durante las pruebas de carga"""
+
+    name = "offline"
+
+    def request(self, method, url, headers, post_data=None):
+        raise stripe.APIConnectionError("Stripe está desactivado durante las pruebas de carga")
+
+    def request_stream(self, method, url, headers, post_data=None):
+        return self.request(method, url, headers, post_data)
+
+    def close(self):
+        pass
+
+
+def stub_external_services():
+    """Sustituye Stripe y Cloudinary por dobles locales (sin red)"""
+    stripe.default_http_client = OfflineStripeClient()
+    cloudinary_service.uploader = LocalFakeUploader()
+
+
+class QueryCounter:
+    """
+    Cuenta las sentencias SQL ejecutadas por cada hilo. Es un context manager:
+    el listener solo está registrado en el engine dentro del bloque with
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self._local = threading.local()
+
+    def __enter__(self):
+        event.listen(self.engine, 'before_cursor_execute', self._count)
+        return self
+
+    def __exit__(self, *exc_info):
+        event.remove(self.engine, 'before_cursor_execute', self._count)
+        return False
+
+    def _count(self, *args):
+        self._local.count = getattr(self._local, 'count', 0) + 1
+
+    def reset(self):
+        self._local.count = 0
+
+    @property
+    def count(self):
+        return getattr(self._local, 'count', 0)
+
+
+def percentile(sorted_values, pct):
+    """Percentil por rango más cercano sobre una lista ordenada"""
+    if not sorted_values:
+        return 0.0
+    index = max(int(round(pct / 100 * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(index, len(sorted_values) - 1)]
+
+
+class LoadTest:
+    """
+    Ejecuta los endpoints calientes en proceso (test client de Flask, con conteo de SQL)
+    o contra un servidor ya arrancado (p. ej. gunicorn) si se indica base_url
+    """
+
+    def __init__(self, app, requests=200, concurrency=1, warmup=10, base_url=None, only=None):
+        self.app = app
+        self.requests = requests
+        self.concurrency = concurrency
+        self.warmup = warmup
+        self.base_url = base_url.rstrip('/') if base_url else None
+        self.endpoints = [e for e in HOT_ENDPOINTS if not only or e[0] in only]
+        self.counter = None
+
+    def _pick_users(self):
+        admin = db.session.execute(
+            db.select(Users).where(Users.is_admin == True, Users.is_active == True).order_by(Users.user_id)
+        ).scalar()
+        teacher = db.session.execute(
+            db.select(Users).where(Users.role == 'teacher', Users.is_admin == False, Users.is_active == True)
+            .order_by(Users.user_id)
+        ).scalar()
+        student = db.session.execute(
+            db.select(Users).where(Users.role == 'student', Users.is_active == True, Users.current_points > 0)
+            .order_by(Users.user_id)
+        ).scalar()
+
+        if not all([admin, teacher, student]):
+            raise RuntimeError("La base de datos no tiene datos suficientes: ejecuta antes 'flask seed-dataset'")
+
+        return {'admin': admin, 'teacher': teacher, 'student': student}
+
+    @staticmethod
+    def _token(user):
+        claims = {
+            'user_id': user.user_id,
+            'is_active': user.is_active,
+            'role': user.role,
+            'is_admin': user.is_admin,
+            'trial_end_date': user.trial_end_date.isoformat() if user.trial_end_date else None
+        }
+        return create_access_token(identity=str(user.user_id), additional_claims=claims)
+
+    def _prepare(self):
+        users = self._pick_users()
+        self.headers = {role: {'Authorization': f"Bearer {self._token(user)}"} for role, user in users.items()}
+        self.bodies = {'login': {'email': users['student'].email, 'password': SEED_PASSWORD}}
+        db.session.rollback()
+
+    def _call(self, client, method, path, role, body):
+        headers = self.headers.get(role, {}) if role else {}
+        payload = self.bodies.get(body) if body else None
+
+        if self.base_url:
+            data = json.dumps(payload).encode() if payload is not None else None
+            request = urllib.request.Request(self.base_url + path, data=data, method=method,
+                                             headers={**headers, 'Content-Type': 'application/json'})
+            started = time.perf_counter()
+            try:
+                with urllib.request.urlopen(request) as response:
+                    response.read()
+                    status = response.status
+            except urllib.error.HTTPError as e:
+                status = e.code
+            return time.perf_counter() - started, status, None
+
+        self.counter.reset()
+        started = time.perf_counter()
+        response = client.open(path, method=method, headers=headers, json=payload)
+        elapsed = time.perf_counter() - started
+        queries = self.counter.count
+        # El test client no cierra el contexto de la app hasta la siguiente petición
+        db.session.remove()
+        return elapsed, response.status_code, queries
+
+    def _run_endpoint(self, endpoint):
+        name, method, path, role, body = endpoint
+        per_worker = [self.requests // self.concurrency + (1 if i < self.requests % self.concurrency else 0)
+                      for i in range(self.concurrency)]
+
+        def worker(count):
+            with self.app.app_context():
+                client = self.app.test_client()
+                for _ in range(self.warmup if count else 0):
+                    self._call(client, method, path, role, body)
+                return [self._call(client, method, path, role, body) for _ in range(count)]
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            samples = [sample for chunk in executor.map(worker, per_worker) for sample in chunk]
+        wall = time.perf_counter() - started
+
+        latencies = sorted(sample[0] * 1000 for sample in samples)
+        errors = sum(1 for sample in samples if sample[1] >= 400)
+        queries = [sample[2] for sample in samples if sample[2] is not None]
+
+        return {
+            'requests': len(samples),
+            'errors': errors,
+            'p50_ms': round(percentile(latencies, 50), 2),
+            'p95_ms': round(percentile(latencies, 95), 2),
+            'p99_ms': round(percentile(latencies, 99), 2),
+            'throughput_rps': round(len(samples) / wall, 1) if wall else 0.0,
+            'queries_per_request': max(queries) if queries else None
+        }
+
+    def run(self, echo=print):
+        """
+        Returns:
+            dict: Resultados por endpoint
+        """
+        stub_external_services()
+        self._prepare()
+
+        if self.base_url:
+            return self._run_all(echo)
+
+        # En proceso no hay otros escritores: las lecturas periódicas de cambios (ranking, versión del
+        # catálogo) solo harían que max_queries dependiera de lo que dura la prueba
+        synced = [(cache, cache.sync_seconds) for cache in (leaderboard, catalog_cache)]
+        for cache, _ in synced:
+            cache.sync_seconds = float('inf')
+        try:
+            with QueryCounter(db.engine) as self.counter:
+                return self._run_all(echo)
+        finally:
+            for cache, sync_seconds in synced:
+                cache.sync_seconds = sync_seconds
+
+    def _run_all(self, echo):
+        results = {}
+        for endpoint in self.endpoints:
+            results[endpoint[0]] = result = self._run_endpoint(endpoint)
+            echo(f"{endpoint[0]:<26} p50 {result['p50_ms']:>8.2f}ms  p95 {result['p95_ms']:>8.2f}ms  "
+                 f"p99 {result['p99_ms']:>8.2f}ms  {result['throughput_rps']:>8.1f} req/s  "
+                 f"sql {result['queries_per_request'] if result['queries_per_request'] is not None else '-':>3}  "
+                 f"errors {result['errors']}")
+        return results
+
+
+def environment():
+    """Entorno en que se miden las latencias: los presupuestos de otro entorno no son comparables"""
+    return {
+        'dialect': db.engine.dialect.name,
+        'python': platform.python_version(),
+        'platform': platform.platform(terse=True),
+        'machine': platform.machine(),
+        'cpus': os.cpu_count()
+    }
+
+
+def load_baselines(path=BASELINES_PATH):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_baselines(results, path=BASELINES_PATH):
+    """Guarda como presupuestos las mediciones actuales con margen, junto con el entorno de la medición"""
+    baselines = load_baselines(path)
+    baselines[ENVIRONMENT_KEY] = environment()
+    for name, result in results.items():
+        baselines[name] = {
+            'p95_ms': round(max(result['p95_ms'] * BUDGET_HEADROOM, result['p95_ms'] + BUDGET_MIN_SLACK_MS), 1),
+            'max_queries': result['queries_per_request']
+        }
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(baselines, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def latency_budgets_apply(baselines):
+    """Las latencias solo se comparan si los presupuestos se midieron en este mismo entorno"""
+    return baselines.get(ENVIRONMENT_KEY) == environment()
+
+
+def compare_to_baselines(results, baselines, latency_tolerance=LATENCY_TOLERANCE):
+    """
+    Los presupuestos de consultas SQL se comprueban siempre; los de latencia solo en el entorno
+    en que se midieron y multiplicados por latency_tolerance
+
+    Returns:
+        list: Mensajes de los endpoints que superan su presupuesto
+    """
+    check_latency = latency_budgets_apply(baselines)
+    failures = []
+    for name, result in results.items():
+        budget = baselines.get(name)
+        if not budget or name == ENVIRONMENT_KEY:
+            continue
+
+        if result['errors']:
+            failures.append(f"{name}: {result['errors']} respuestas con error")
+
+        p95_budget = budget.get('p95_ms')
+        if check_latency and p95_budget is not None and result['p95_ms'] > p95_budget * latency_tolerance:
+            failures.append(f"{name}: p95 {result['p95_ms']}ms > presupuesto {p95_budget}ms x {latency_tolerance}")
+
+        queries = result['queries_per_request']
+        if budget.get('max_queries') is not None and queries is not None and queries > budget['max_queries']:
+            failures.append(f"{name}: {queries} consultas SQL por petición > presupuesto {budget['max_queries']}")
+
+    return failures
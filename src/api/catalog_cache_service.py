@@ -0,0 +1,169 @@
+"""
+catalog_cache_service.py
+Caché del catálogo (cursos, módulos y lecciones): respuestas públicas con ETag y árboles de curso
+"""
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import current_app, request
+from sqlalchemy.exc import SQLAlchemyError
+
+from api.models import db, dialect_insert, CatalogVersions
+
+# Las escrituras de este proceso invalidan la caché al momento; las de otros procesos (otros
+# workers de gunicorn, el worker de multimedia) se ven al leer la versión compartida de
+# catalog_versions, como mucho cada CATALOG_CACHE_SYNC_SECONDS. El TTL queda como red de seguridad
+CATALOG_CACHE_TTL = int(os.getenv("CATALOG_CACHE_TTL", "60"))
+CATALOG_CACHE_SYNC_SECONDS = float(os.getenv("CATALOG_CACHE_SYNC_SECONDS", "2"))
+CATALOG_CACHE_MAX_ENTRIES = int(os.getenv("CATALOG_CACHE_MAX_ENTRIES", "1024"))
+CATALOG_VERSION_NAME = 'catalog'
+
+WRITE_METHODS = ('POST', 'PUT', 'PATCH', 'DELETE')
+
+
+class CatalogCache:
+    """Caché versionada: cada escritura del catálogo sube la versión e invalida todo"""
+
+    def __init__(self, ttl_seconds=CATALOG_CACHE_TTL, max_entries=CATALOG_CACHE_MAX_ENTRIES,
+                 sync_seconds=CATALOG_CACHE_SYNC_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.sync_seconds = sync_seconds
+        self.version = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # clave -> (versión, instante, valor)
+        self._shared_version = None  # Última versión leída de catalog_versions
+        self._synced_at = None       # Instante (monotonic) de esa lectura
+
+    def bump(self):
+        """Invalida todo lo cacheado tras un cambio en el catálogo"""
+        with self._lock:
+            self.version += 1
+            self._entries.clear()
+
+    @staticmethod
+    def publish():
+        """
+        Sube la versión compartida en la sesión actual (no hace commit): los demás procesos
+        invalidan su caché en su siguiente lectura de catalog_versions
+        """
+        statement = dialect_insert(CatalogVersions).values(name=CATALOG_VERSION_NAME, version=1)
+        db.session.execute(statement.on_conflict_do_update(
+            index_elements=[CatalogVersions.name],
+            set_={'version': CatalogVersions.version + 1}
+        ))
+
+    def sync(self):
+        """Lee la versión compartida y, si otro proceso la subió, invalida todo lo cacheado"""
+        now = time.monotonic()
+        shared = db.session.execute(
+            db.select(CatalogVersions.version).where(CatalogVersions.name == CATALOG_VERSION_NAME)
+        ).scalar() or 0
+
+        with self._lock:
+            if self._shared_version is not None and shared != self._shared_version:
+                self.version += 1
+                self._entries.clear()
+            self._shared_version = shared
+            self._synced_at = now
+
+    def _ensure_synced(self):
+        if self._synced_at is None or time.monotonic() - self._synced_at > self.sync_seconds:
+            self.sync()
+
+    @staticmethod
+    def _key():
+        return 'response', request.path, tuple(sorted(request.args.items(multi=True)))
+
+    def get(self, key):
+        """Devuelve el valor cacheado para la clave o None si no existe o está desactualizado"""
+        self._ensure_synced()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if not entry:
+                return None
+
+            version, stored_at, value = entry
+            if version != self.version or time.monotonic() - stored_at > self.ttl_seconds:
+                del self._entries[key]
+                return None
+
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, version, value):
+        """
+        Guarda un valor calculado con la versión indicada (la leída antes de consultar la base de datos)
+        """
+        with self._lock:
+            # Si hubo una escritura mientras se generaba el valor, no se guarda
+            if version != self.version:
+                return
+
+            self._entries[key] = (version, time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def cached(self, view):
+        """
+        Decorador para endpoints GET públicos: cachea la respuesta por ruta y query string,
+        añade un ETag fuerte y responde 304 si coincide con If-None-Match
+        """
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method != 'GET':
+                return view(*args, **kwargs)
+
+            key = self._key()
+            entry = self.get(key)
+
+            if entry:
+                body, mimetype, etag = entry
+                response = current_app.response_class(body, status=200, mimetype=mimetype)
+                response.set_etag(etag)
+                return response.make_conditional(request)
+
+            version = self.version
+            response = current_app.make_response(view(*args, **kwargs))
+
+            if response.status_code != 200:
+                return response
+
+            body = response.get_data()
+            etag = hashlib.sha256(body).hexdigest()
+            self.set(key, version, (body, response.mimetype, etag))
+
+            response.set_etag(etag)
+            return response.make_conditional(request)
+
+        return wrapper
+
+    def invalidates(self, view):
+        """Decorador para endpoints que escriben en el catálogo: sube la versión si la escritura tuvo éxito"""
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            response = current_app.make_response(view(*args, **kwargs))
+
+            if request.method in WRITE_METHODS and response.status_code < 400:
+                self.bump()
+                try:
+                    self.publish()
+                    db.session.commit()
+                except SQLAlchemyError:
+                    # La escritura ya se guardó: los demás procesos la verán como mucho tras el TTL
+                    db.session.rollback()
+                    current_app.logger.exception("Catálogo: no se pudo publicar la nueva versión")
+
+            return response
+
+        return wrapper
+
+
+# Instancia global de la caché
+catalog_cache = CatalogCache()
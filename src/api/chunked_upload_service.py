@@ -0,0 +1,256 @@
+"""
+chunked_upload_service.py
+Subidas por partes (reanudables) para archivos grandes de las lecciones
+"""
+import math
+import os
+import shutil
+import tempfile
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from werkzeug.utils import secure_filename
+
+from api.models import db, UploadSessions
+from .cloudinary_service import CloudinaryService
+from .media_job_service import MEDIA_SPOOL_DIR, classify_media_file
+
+# Cada parte se guarda en su propio archivo: las partes recibidas sobreviven a cortes de conexión
+UPLOAD_SESSION_DIR = os.getenv("UPLOAD_SESSION_DIR", os.path.join(tempfile.gettempdir(), "chunked_uploads"))
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(5 * 1024 * 1024)))
+# Una subida sin partes nuevas durante este tiempo se da por abandonada
+UPLOAD_SESSION_TTL_HOURS = float(os.getenv("UPLOAD_SESSION_TTL_HOURS", "24"))
+
+# Tamaño del bloque leído del request: es lo máximo que se tiene en memoria por parte
+STREAM_BLOCK_SIZE = 64 * 1024
+
+
+class ChunkedUploadService:
+    """Servicio para recibir archivos por partes y ensamblarlos en disco"""
+
+    @staticmethod
+    def plan_upload(filename, total_size):
+        """
+        Valida el archivo declarado y calcula cómo se dividirá en partes
+
+        Returns:
+            dict: tipo multimedia, tamaño de parte y número de partes
+
+        Raises:
+            ValueError: Si el archivo no está permitido o supera el tamaño máximo
+        """
+        media_info = classify_media_file(filename)
+        if not media_info:
+            raise ValueError(f"Tipo de archivo no permitido: {filename}")
+
+        if not isinstance(total_size, int) or total_size < 1:
+            raise ValueError("total_size debe ser un número entero positivo")
+
+        media_type = media_info[0]
+        max_size_mb = CloudinaryService.ALLOWED_CONFIG[media_type]['max_size_mb']
+        if total_size > max_size_mb * 1024 * 1024:
+            raise ValueError(
+                f"Archivo muy grande ({total_size / (1024 * 1024):.1f}MB). "
+                f"Máximo: {max_size_mb}MB"
+            )
+
+        return {
+            'type': media_type,
+            'chunk_size': UPLOAD_CHUNK_SIZE,
+            'total_chunks': math.ceil(total_size / UPLOAD_CHUNK_SIZE)
+        }
+
+    @staticmethod
+    def new_upload_id():
+        return uuid.uuid4().hex
+
+    @staticmethod
+    def _session_dir(upload):
+        return os.path.join(UPLOAD_SESSION_DIR, upload.upload_id)
+
+    @staticmethod
+    def _chunk_path(upload, index):
+        return os.path.join(ChunkedUploadService._session_dir(upload), f"{index:06d}.part")
+
+    @staticmethod
+    def expected_chunk_size(upload, index):
+        """Tamaño exacto que debe tener la parte index (la última puede ser menor)"""
+        if index == upload.total_chunks - 1:
+            return upload.total_size - upload.chunk_size * (upload.total_chunks - 1)
+        return upload.chunk_size
+
+    @staticmethod
+    def write_chunk(upload, index, stream):
+        """
+        Copia una parte del stream del request a disco por bloques pequeños
+
+        Raises:
+            ValueError: Si el índice no existe o el tamaño recibido no es el esperado
+        """
+        if index < 0 or index >= upload.total_chunks:
+            raise ValueError(f"La parte {index} no existe (total: {upload.total_chunks})")
+
+        expected = ChunkedUploadService.expected_chunk_size(upload, index)
+        os.makedirs(ChunkedUploadService._session_dir(upload), exist_ok=True)
+
+        final_path = ChunkedUploadService._chunk_path(upload, index)
+        temp_path = f"{final_path}.{uuid.uuid4().hex[:8]}.tmp"
+        received = 0
+
+        try:
+            with open(temp_path, 'wb') as target:
+                while received <= expected:
+                    block = stream.read(min(STREAM_BLOCK_SIZE, expected + 1 - received))
+                    if not block:
+                        break
+                    target.write(block)
+                    received += len(block)
+
+            if received != expected:
+                raise ValueError(f"La parte {index} debe tener {expected} bytes, se recibieron {received}")
+
+            # El rename es atómico: una parte solo cuenta como recibida si llegó completa
+            os.replace(temp_path, final_path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+        return received
+
+    @staticmethod
+    def received_chunks(upload):
+        """Lista ordenada de índices de las partes ya recibidas"""
+        session_dir = ChunkedUploadService._session_dir(upload)
+        if not os.path.isdir(session_dir):
+            return []
+
+        return sorted(
+            int(name.split('.')[0])
+            for name in os.listdir(session_dir)
+            if name.endswith('.part')
+        )
+
+    @staticmethod
+    def missing_chunks(upload):
+        received = set(ChunkedUploadService.received_chunks(upload))
+        return [index for index in range(upload.total_chunks) if index not in received]
+
+    @staticmethod
+    def assemble(upload):
+        """
+        Une las partes en un único archivo dentro del directorio de la cola de multimedia
+
+        Returns:
+            str: Ruta del archivo ensamblado
+        """
+        os.makedirs(MEDIA_SPOOL_DIR, exist_ok=True)
+        path = os.path.join(MEDIA_SPOOL_DIR, f"{upload.upload_id}_{secure_filename(upload.filename)}")
+
+        with open(path, 'wb') as target:
+            for index in range(upload.total_chunks):
+                with open(ChunkedUploadService._chunk_path(upload, index), 'rb') as part:
+                    shutil.copyfileobj(part, target, STREAM_BLOCK_SIZE)
+
+        return path
+
+    @staticmethod
+    def claim(upload):
+        """
+        Pasa la subida de 'uploading' a 'completed' con un UPDATE condicional y hace commit.
+        Si llegan dos /complete a la vez solo uno la reclama y ensambla
+
+        Returns:
+            bool: True si esta llamada reclamó la subida
+        """
+        result = db.session.execute(
+            db.update(UploadSessions)
+            .where(UploadSessions.upload_id == upload.upload_id, UploadSessions.status == 'uploading')
+            .values(status='completed', completed_at=datetime.now(timezone.utc))
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        return result.rowcount == 1
+
+    @staticmethod
+    def release(upload):
+        """Devuelve a 'uploading' una subida reclamada que no se pudo encolar (permite reintentar)"""
+        db.session.execute(
+            db.update(UploadSessions)
+            .where(UploadSessions.upload_id == upload.upload_id, UploadSessions.job_id.is_(None))
+            .values(status='uploading', completed_at=None)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+
+    @staticmethod
+    def _last_activity(upload_id):
+        # Cada parte nueva crea un archivo en el directorio de la subida y actualiza su mtime
+        session_dir = os.path.join(UPLOAD_SESSION_DIR, upload_id)
+        return os.path.getmtime(session_dir) if os.path.isdir(session_dir) else 0
+
+    @staticmethod
+    def expire_abandoned(max_age_hours=None):
+        """
+        Cancela las subidas 'uploading' sin actividad desde hace max_age_hours y borra sus partes.
+        También borra los directorios antiguos que ya no tienen una subida abierta
+        (p. ej. el proceso cayó tras reclamarla y antes de borrar las partes)
+
+        Returns:
+            dict: Subidas canceladas y directorios huérfanos eliminados
+        """
+        max_age_hours = UPLOAD_SESSION_TTL_HOURS if max_age_hours is None else max_age_hours
+        cutoff = datetime.now(timezone.utc) - timedelta(hours=max_age_hours)
+
+        candidates = db.session.execute(
+            db.select(UploadSessions.upload_id)
+            .where(UploadSessions.status == 'uploading', UploadSessions.created_at < cutoff)
+        ).scalars().all()
+
+        expired = []
+        for upload_id in candidates:
+            # Una subida lenta que sigue recibiendo partes no se cancela
+            if ChunkedUploadService._last_activity(upload_id) >= cutoff.timestamp():
+                continue
+
+            # Condicional: si un /complete la reclamó entretanto, no se toca
+            result = db.session.execute(
+                db.update(UploadSessions)
+                .where(UploadSessions.upload_id == upload_id, UploadSessions.status == 'uploading')
+                .values(status='cancelled')
+                .execution_options(synchronize_session=False)
+            )
+            if result.rowcount == 1:
+                expired.append(upload_id)
+        db.session.commit()
+
+        for upload_id in expired:
+            shutil.rmtree(os.path.join(UPLOAD_SESSION_DIR, upload_id), ignore_errors=True)
+
+        orphaned = 0
+        if os.path.isdir(UPLOAD_SESSION_DIR):
+            old_dirs = [
+                name for name in os.listdir(UPLOAD_SESSION_DIR)
+                if os.path.isdir(os.path.join(UPLOAD_SESSION_DIR, name))
+                and ChunkedUploadService._last_activity(name) < cutoff.timestamp()
+            ]
+            open_ids = set(db.session.execute(
+                db.select(UploadSessions.upload_id)
+                .where(UploadSessions.upload_id.in_(old_dirs), UploadSessions.status == 'uploading')
+            ).scalars()) if old_dirs else set()
+            db.session.commit()
+
+            for name in old_dirs:
+                if name not in open_ids:
+                    shutil.rmtree(os.path.join(UPLOAD_SESSION_DIR, name), ignore_errors=True)
+                    orphaned += 1
+
+        return {'expired': len(expired), 'orphaned_dirs': orphaned}
+
+    @staticmethod
+    def discard(upload):
+        """Elimina las partes guardadas de una subida"""
+        shutil.rmtree(ChunkedUploadService._session_dir(upload), ignore_errors=True)
+
+
+# Instancia global del servicio
+chunked_upload_service = ChunkedUploadService()
@@ -2,12 +2,63 @@ import cloudinary
 import cloudinary.uploader
 import os
 import re
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from flask import current_app
 from werkzeug.utils import secure_filename
 from dotenv import load_dotenv
 
+from .metrics import external_call
+
 load_dotenv()
 
+class LocalFakeUploader:
+    """Sustituto local de cloudinary.uploader para desarrollo y pruebas sin red"""
+
+    def __init__(self, base_dir=None):
+        self.base_dir = base_dir or os.getenv(
+            'CLOUDINARY_FAKE_DIR', os.path.join(tempfile.gettempdir(), 'fake_cloudinary')
+        )
+
+    def _path_for(self, public_id):
+        return os.path.join(self.base_dir, *public_id.split('/'))
+
+    def upload(self, file, **options):
+        folder = options.get('folder')
+        public_id = options.get('public_id') or os.path.basename(getattr(file, 'name', 'stream'))
+        if folder and not public_id.startswith(folder):
+            public_id = f"{folder}/{public_id}"
+
+        path = self._path_for(public_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        if hasattr(file, 'read'):
+            with open(path, 'wb') as target:
+                shutil.copyfileobj(file, target, 1024 * 1024)
+        else:
+            shutil.copyfile(file, path)
+
+        return {
+            'secure_url': f"file://{path}",
+            'public_id': public_id,
+            'resource_type': options.get('resource_type', 'image'),
+            'bytes': os.path.getsize(path),
+            'format': public_id.rsplit('.', 1)[-1] if '.' in public_id else None,
+            'duration': None,
+        }
+
+    def upload_large(self, file, **options):
+        return self.upload(file, **options)
+
+    def destroy(self, public_id, resource_type='image'):
+        path = self._path_for(public_id)
+        if os.path.exists(path):
+            os.remove(path)
+            return {'result': 'ok'}
+        return {'result': 'not found'}
+
+
 class CloudinaryService:
     """Servicio para manejar uploads a Cloudinary específico para LSE"""
     
@@ -46,6 +97,15 @@ class CloudinaryService:
     }
     
     def __init__(self):
+        self.upload_workers = int(os.getenv('CLOUDINARY_UPLOAD_WORKERS', '4'))
+        self.chunk_size = int(os.getenv('CLOUDINARY_CHUNK_SIZE', str(6 * 1024 * 1024)))
+        
+        if os.getenv('CLOUDINARY_FAKE_UPLOADS') == '1':
+            self.uploader = LocalFakeUploader()
+            self.upload_folder = os.getenv('CLOUDINARY_UPLOAD_FOLDER', 'lse_lessons')
+            return
+        
+        self.uploader = cloudinary.uploader
         self._configure()
     
     def _configure(self):
@@ -139,7 +199,8 @@ class CloudinaryService:
             upload_params.update(config['transformations'])
         
         try:
-            result = cloudinary.uploader.upload(file, **upload_params)
+            with external_call('cloudinary', 'upload'):
+                result = self.uploader.upload(file, **upload_params)
             
             return {
                 'url': result['secure_url'],
@@ -158,10 +219,62 @@ class CloudinaryService:
         except Exception as e:
             raise Exception(f"Error subiendo archivo: {str(e)}")
     
+    def upload_stream(self, stream, **upload_params):
+        """Subir un archivo leyéndolo del stream por bloques (sin cargarlo entero en memoria)"""
+        upload_params.setdefault('chunk_size', self.chunk_size)
+        with external_call('cloudinary', 'upload_large'):
+            return self.uploader.upload_large(stream, **upload_params)
+    
+    def upload_many(self, uploads, max_workers=None):
+        """
+        Subir varios archivos en paralelo con un pool de hilos acotado.
+        Si alguno falla se eliminan los ya subidos y se relanza el error
+        
+        Args:
+            uploads (list): Lista de tuplas (stream, upload_params)
+            max_workers (int): Máximo de subidas simultáneas
+            
+        Returns:
+            list: Resultados de Cloudinary en el mismo orden que uploads
+        """
+        if not uploads:
+            return []
+        
+        workers = min(max_workers or self.upload_workers, len(uploads))
+        results = [None] * len(uploads)
+        errors = []
+        
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(self.upload_stream, stream, **params): index
+                for index, (stream, params) in enumerate(uploads)
+            }
+            for future in as_completed(futures):
+                try:
+                    results[futures[future]] = future.result()
+                except Exception as e:
+                    errors.append(e)
+                    # No empezar subidas que aún estén en cola
+                    for pending in futures:
+                        pending.cancel()
+        
+        if errors:
+            self.delete_results(results)
+            raise Exception(f"Error subiendo archivo: {str(errors[0])}")
+        
+        return results
+    
+    def delete_results(self, results):
+        """Eliminar de Cloudinary los archivos de una lista de resultados de subida"""
+        for result in results:
+            if result:
+                self.delete_file(result['public_id'], result.get('resource_type', 'image'))
+    
     def delete_file(self, public_id, resource_type='image'):
         """Eliminar archivo de Cloudinary"""
         try:
-            result = cloudinary.uploader.destroy(public_id, resource_type=resource_type)
+            with external_call('cloudinary', 'destroy'):
+                result = self.uploader.destroy(public_id, resource_type=resource_type)
             return result.get('result') == 'ok'
         except Exception as e:
             current_app.logger.error(f"Error eliminando Cloudinary: {str(e)}")
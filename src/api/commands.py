@@ -3,8 +3,75 @@ In this file, you can add as many commands as you want using the @app.cli.comman
 Flask commands are usefull to run cronjobs or tasks outside of the API but sill in integration 
 with youy database, for example: Import the price of bitcoin every night as 12am
 """
+import json
+import sys
+import time
 import click
-from api.models import db, Users
+from api.models import (db, Users, Courses, Lessons, MultimediaResources, Purchases,
+                        UserPoints, UserPointsTotals, UserProgress)
+from api.points_service import points_service
+from api.password_service import password_service
+from api.media_job_service import media_job_service
+from api.chunked_upload_service import chunked_upload_service, UPLOAD_SESSION_TTL_HOURS
+from api.stripe_webhook_service import stripe_webhook_service, STRIPE_WEBHOOK_BATCH_SIZE
+from api.seed_service import DatasetSeeder
+from api.reconciliation_service import PurchaseReconciler
+from api.achievement_service import achievement_service
+from api.stripe_service import use_local_stripe
+from api import benchmark
+
+
+def hot_route_queries():
+    """ Consultas de routes.py que filtran u ordenan por columnas calientes """
+    return [
+        ('ranking de usuarios activos',
+         db.select(Users).where(Users.is_active == True).order_by(Users.current_points.desc()).limit(20)),
+        ('usuarios por rol',
+         db.select(Users.user_id).where(Users.role == 'student', Users.is_active == True)),
+        ('cursos públicos activos',
+         db.select(Courses).where(Courses.is_active == True).order_by(Courses.course_id).limit(20)),
+        ('cursos de un profesor',
+         db.select(Courses.course_id).where(Courses.created_by == 1)),
+        ('compras de un usuario',
+         db.select(Purchases).where(Purchases.user_id == 1, Purchases.status == 'paid')),
+        ('compras por fecha',
+         db.select(Purchases).order_by(Purchases.purchase_date.desc(), Purchases.purchase_id.desc()).limit(20)),
+        ('compra por PaymentIntent',
+         db.select(Purchases).where(Purchases.stripe_payment_intent_id == 'pi_check')),
+        ('compras pendientes',
+         db.select(Purchases).where(Purchases.status == 'pending').order_by(Purchases.purchase_id).limit(100)),
+        ('multimedia de una página de lecciones',
+         db.select(MultimediaResources).where(MultimediaResources.lesson_id.in_([1, 2, 3]))
+         .order_by(MultimediaResources.lesson_id, MultimediaResources.order)),
+        ('lecciones de un módulo',
+         db.select(Lessons).where(Lessons.module_id == 1)),
+        ('historial de puntos de un usuario',
+         db.select(UserPoints).where(UserPoints.user_id == 1).order_by(UserPoints.date)),
+        ('totales de puntos ordenados',
+         db.select(UserPointsTotals).order_by(UserPointsTotals.total_points.desc()).limit(20)),
+        ('progreso de un usuario',
+         db.select(UserProgress).where(UserProgress.user_id == 1)),
+        ('progreso de las lecciones de un módulo',
+         db.select(UserProgress).join(Lessons, Lessons.lesson_id == UserProgress.lesson_id)
+         .where(Lessons.module_id == 1)),
+    ]
+
+
+def explain_hot_queries():
+    """
+    EXPLAIN de las consultas calientes (solo PostgreSQL). Con enable_seqscan desactivado
+    el planificador solo elige Seq Scan si no hay índice utilizable
+
+    Returns:
+        list: (nombre, plan) por consulta
+    """
+    plans = []
+    db.session.execute(db.text("SET LOCAL enable_seqscan = off"))
+    for name, statement in hot_route_queries():
+        sql = str(statement.compile(dialect=db.engine.dialect, compile_kwargs={'literal_binds': True}))
+        plans.append((name, "\n".join(row[0] for row in db.session.execute(db.text("EXPLAIN " + sql)))))
+    db.session.rollback()
+    return plans
 
 
 def setup_commands(app):
@@ -17,16 +84,181 @@ def setup_commands(app):
     @click.argument("count")  # Argument of out command
     def insert_test_users(count):
         print("Creating test users")
+        # Un único hash para todos: generarlo por usuario es lo más lento del comando
+        password_hash = password_service.hash_password("123456")
+        users = []
         for x in range(1, int(count) + 1):
             user = Users()
+            user.first_name = "Test"
+            user.last_name = "User " + str(x)
             user.email = "test_user" + str(x) + "@test.com"
-            user.password = "123456"
+            user.password_hash = password_hash
             user.is_active = True
-            db.session.add(user)
-            db.session.commit()
+            users.append(user)
+        db.session.add_all(users)
+        db.session.commit()
+        for user in users:
             print("User: ", user.email, " created.")
         print("All test users created")
 
     @app.cli.command("insert-test-data")
-    def insert_test_data():
-        pass
+    @click.option("--seed", default=42, help="Semilla para generar siempre los mismos datos")
+    def insert_test_data(seed):
+        """ Dataset pequeño (50 usuarios) para desarrollo local """
+        inserted = DatasetSeeder(users=50, courses=5, seed=seed).run()
+        print(f"Test data created: {sum(inserted.values())} rows")
+
+    @app.cli.command("seed-dataset")
+    @click.option("--users", default=1000, help="Número de usuarios")
+    @click.option("--courses", default=None, type=int, help="Número de cursos (por defecto usuarios / 100)")
+    @click.option("--modules-per-course", default=5)
+    @click.option("--lessons-per-module", default=8)
+    @click.option("--media-per-lesson", default=2)
+    @click.option("--purchases-per-student", default=3, help="Media de cursos comprados por estudiante")
+    @click.option("--seed", default=42, help="Semilla para generar siempre los mismos datos")
+    @click.option("--batch-size", default=5000, help="Filas por INSERT/COPY")
+    def seed_dataset(users, courses, modules_per_course, lessons_per_module, media_per_lesson,
+                     purchases_per_student, seed, batch_size):
+        """ Genera un dataset coherente a escala de producción (COPY en PostgreSQL) """
+        started = time.monotonic()
+        seeder = DatasetSeeder(
+            users=users,
+            courses=courses,
+            modules_per_course=modules_per_course,
+            lessons_per_module=lessons_per_module,
+            media_per_lesson=media_per_lesson,
+            purchases_per_student=purchases_per_student,
+            seed=seed,
+            batch_size=batch_size
+        )
+        inserted = seeder.run()
+        for table, rows in inserted.items():
+            print(f"  {table}: {rows}")
+        print(f"Seeded {sum(inserted.values())} rows in {time.monotonic() - started:.1f}s")
+
+    @app.cli.command("rebuild-points-totals")
+    def rebuild_points_totals():
+        """ Reconstruye user_points_totals a partir del historial user_points """
+        print("Rebuilding user points totals")
+        rebuilt = points_service.rebuild_totals()
+        db.session.commit()
+        print(f"Totals rebuilt for {rebuilt} users")
+
+    @app.cli.command("check-query-plans")
+    def check_query_plans():
+        """ EXPLAIN de las consultas calientes; falla si alguna cae en Seq Scan (solo PostgreSQL) """
+        if db.engine.dialect.name != 'postgresql':
+            print("check-query-plans requires PostgreSQL, skipping")
+            return
+
+        failures = []
+        for name, plan in explain_hot_queries():
+            if "Seq Scan" in plan:
+                failures.append(name)
+                print(f"SEQ SCAN  {name}\n{plan}\n")
+            else:
+                print(f"ok        {name}")
+
+        if failures:
+            print(f"{len(failures)} queries fall back to a sequential scan")
+            sys.exit(1)
+        print("All hot queries use an index")
+
+    @app.cli.command("media-worker")
+    @click.option("--poll-interval", default=2.0, help="Segundos de espera cuando la cola está vacía")
+    @click.option("--once", is_flag=True, help="Procesar la cola pendiente y terminar")
+    def media_worker(poll_interval, once):
+        """ Worker que sube a Cloudinary la multimedia encolada por las lecciones """
+        print("Media worker started")
+        processed = media_job_service.run_worker(poll_interval=poll_interval, once=once)
+        print(f"Media worker finished, {processed} jobs processed")
+
+    @app.cli.command("expire-uploads")
+    @click.option("--max-age-hours", default=UPLOAD_SESSION_TTL_HOURS, help="Horas sin partes nuevas para dar una subida por abandonada")
+    def expire_uploads(max_age_hours):
+        """ Cancela las subidas por partes abandonadas y borra sus partes de UPLOAD_SESSION_DIR """
+        stats = chunked_upload_service.expire_abandoned(max_age_hours=max_age_hours)
+        print(f"Expired {stats['expired']} uploads, removed {stats['orphaned_dirs']} orphaned directories")
+
+    @app.cli.command("process-stripe-webhooks")
+    @click.option("--batch-size", default=STRIPE_WEBHOOK_BATCH_SIZE, help="Eventos por lote")
+    @click.option("--poll-interval", default=1.0, help="Segundos de espera cuando la bandeja está vacía")
+    @click.option("--once", is_flag=True, help="Procesar los eventos pendientes y terminar")
+    def process_stripe_webhooks(batch_size, poll_interval, once):
+        """ Worker que procesa por lotes los eventos de Stripe guardados por /api/stripe-webhook """
+        print("Stripe webhook worker started")
+        processed = stripe_webhook_service.run_worker(batch_size=batch_size, poll_interval=poll_interval, once=once)
+        print(f"Stripe webhook worker finished, {processed} events processed")
+
+    @app.cli.command("reconcile-stripe-purchases")
+    @click.option("--batch-size", default=500, help="Compras pendientes por lote (un commit por lote)")
+    @click.option("--workers", default=8, help="Consultas simultáneas a Stripe")
+    @click.option("--older-than-minutes", default=30, help="Ignorar compras más recientes que esto")
+    @click.option("--fake-stripe", is_flag=True, help="Usar el sustituto local de Stripe (sin red)")
+    @click.option("--fake-latency-ms", default=0.0, help="Latencia simulada por llamada con --fake-stripe")
+    def reconcile_stripe_purchases(batch_size, workers, older_than_minutes, fake_stripe, fake_latency_ms):
+        """ Concilia con Stripe las compras que siguen en 'pending' """
+        if fake_stripe:
+            use_local_stripe(fake_latency_ms)
+
+        print("Reconciling pending purchases with Stripe...")
+        stats = PurchaseReconciler(
+            batch_size=batch_size,
+            workers=workers,
+            older_than_minutes=older_than_minutes
+        ).run()
+        print(f"Reconciled {stats['scanned']} purchases in {stats['seconds']}s: {stats['paid']} paid, "
+              f"{stats['cancelled']} cancelled, {stats['awarded_users']} users awarded points, "
+              f"{stats['errors']} Stripe errors")
+
+    @app.cli.command("backfill-achievements")
+    @click.option("--chunk-size", default=5000, help="Rango de user_id por sentencia (un commit por rango)")
+    @click.option("--achievement-id", "achievement_ids", multiple=True, type=int,
+                  help="Limitar a estos logros (repetible; por defecto todos)")
+    def backfill_achievements(chunk_size, achievement_ids):
+        """ Otorga los logros a los usuarios que ya cumplen sus required_points """
+        print("Backfilling user achievements...")
+        stats = achievement_service.backfill(chunk_size=chunk_size, achievement_ids=list(achievement_ids))
+        print(f"Awarded {stats['inserted']} achievements in {stats['chunks']} chunks ({stats['seconds']}s)")
+
+    @app.cli.command("load-test")
+    @click.option("--requests", "request_count", default=200, help="Peticiones medidas por endpoint")
+    @click.option("--concurrency", default=1, help="Hilos lanzando peticiones en paralelo")
+    @click.option("--warmup", default=10, help="Peticiones de calentamiento por hilo (no se miden)")
+    @click.option("--base-url", default=None, help="Probar un servidor arrancado (p. ej. gunicorn) en lugar del proceso actual")
+    @click.option("--endpoint", "endpoints", multiple=True, help="Limitar a estos endpoints (repetible)")
+    @click.option("--baselines", default=benchmark.BASELINES_PATH, help="Archivo JSON con los presupuestos")
+    @click.option("--update-baselines", is_flag=True, help="Guardar las mediciones como nuevos presupuestos")
+    @click.option("--output", default=None, help="Guardar los resultados en este archivo JSON")
+    @click.option("--latency-tolerance", default=benchmark.LATENCY_TOLERANCE,
+                  help="Factor sobre el presupuesto de p95 antes de fallar")
+    def load_test(request_count, concurrency, warmup, base_url, endpoints, baselines, update_baselines, output,
+                  latency_tolerance):
+        """ Pruebas de carga de los endpoints calientes; falla si se supera algún presupuesto """
+        results = benchmark.LoadTest(
+            app,
+            requests=request_count,
+            concurrency=concurrency,
+            warmup=warmup,
+            base_url=base_url,
+            only=set(endpoints)
+        ).run()
+
+        if output:
+            with open(output, 'w') as f:
+                json.dump(results, f, indent=2)
+
+        if update_baselines:
+            benchmark.save_baselines(results, baselines)
+            print(f"Baselines updated in {baselines}")
+            return
+
+        budgets = benchmark.load_baselines(baselines)
+        if not benchmark.latency_budgets_apply(budgets):
+            print("Baselines were measured in another environment: checking SQL budgets only")
+        failures = benchmark.compare_to_baselines(results, budgets, latency_tolerance)
+        if failures:
+            for failure in failures:
+                print(f"OVER BUDGET  {failure}")
+            sys.exit(1)
+        print("All endpoints within budget")
@@ -0,0 +1,192 @@
+"""
+leaderboard_service.py
+Ranking de puntos mantenido en memoria y actualizado de forma incremental
+"""
+import os
+import threading
+import time
+from bisect import bisect_left, insort
+from datetime import datetime, timedelta, timezone
+
+from api.models import db, Users
+
+# Cada worker recarga el ranking completo pasado este tiempo (cambios de nombre o estado hechos
+# por otros procesos de gunicorn)
+LEADERBOARD_TTL_SECONDS = int(os.getenv("LEADERBOARD_TTL_SECONDS", "300"))
+# Cada cuánto se leen los cambios de puntos de otros procesos (otros workers de gunicorn, el worker
+# de webhooks de Stripe, la conciliación) con una consulta por users.points_updated_at
+LEADERBOARD_SYNC_SECONDS = float(os.getenv("LEADERBOARD_SYNC_SECONDS", "5"))
+# Margen hacia atrás de cada lectura: cubre las transacciones que hacen commit después de fijar
+# points_updated_at y pequeñas diferencias de reloj entre máquinas
+LEADERBOARD_SYNC_OVERLAP_SECONDS = int(os.getenv("LEADERBOARD_SYNC_OVERLAP_SECONDS", "60"))
+
+
+class Leaderboard:
+    """Ranking ordenado de usuarios activos por current_points (desc) y user_id (asc)"""
+
+    def __init__(self, ttl_seconds=LEADERBOARD_TTL_SECONDS, sync_seconds=LEADERBOARD_SYNC_SECONDS,
+                 sync_overlap_seconds=LEADERBOARD_SYNC_OVERLAP_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self.sync_seconds = sync_seconds
+        self.sync_overlap = timedelta(seconds=sync_overlap_seconds)
+        self._lock = threading.RLock()
+        self._keys = []      # Lista ordenada de claves (-puntos, user_id)
+        self._entries = {}   # user_id -> {'key': clave, 'name': nombre completo}
+        self._loaded_at = None
+        self._synced_at = None    # Instante (monotonic) de la última lectura de cambios
+        self._synced_from = None  # Hora (UTC) desde la que se leerán los cambios en la siguiente
+
+    def reload(self):
+        """Reconstruye el ranking completo desde la tabla users"""
+        started = datetime.now(timezone.utc)
+        rows = db.session.execute(
+            db.select(Users.user_id, Users.first_name, Users.last_name, Users.current_points)
+            .where(Users.is_active == True)
+        ).all()
+
+        entries = {}
+        for user_id, first_name, last_name, points in rows:
+            entries[user_id] = {
+                'key': (-(points or 0), user_id),
+                'name': f"{first_name} {last_name}"
+            }
+        keys = sorted(entry['key'] for entry in entries.values())
+
+        with self._lock:
+            self._entries = entries
+            self._keys = keys
+            self._loaded_at = self._synced_at = time.monotonic()
+            self._synced_from = started
+
+    def sync(self):
+        """
+        Aplica los cambios de puntos hechos desde la última lectura en cualquier proceso: una consulta
+        por el índice de users.points_updated_at que solo devuelve los usuarios que cambiaron
+        """
+        started = datetime.now(timezone.utc)
+        since = self._synced_from - self.sync_overlap
+        rows = db.session.execute(
+            db.select(Users.user_id, Users.first_name, Users.last_name, Users.current_points, Users.is_active)
+            .where(Users.points_updated_at >= since)
+        ).all()
+
+        with self._lock:
+            for row in rows:
+                self._place(row.user_id, f"{row.first_name} {row.last_name}", row.current_points, row.is_active)
+            self._synced_at = time.monotonic()
+            self._synced_from = started
+
+    def _ensure_loaded(self):
+        now = time.monotonic()
+        if self._loaded_at is None or now - self._loaded_at > self.ttl_seconds:
+            self.reload()
+        elif now - self._synced_at > self.sync_seconds:
+            self.sync()
+
+    def _remove_key(self, key):
+        index = bisect_left(self._keys, key)
+        if index < len(self._keys) and self._keys[index] == key:
+            del self._keys[index]
+
+    def update_user(self, user):
+        """
+        Inserta o reubica a un usuario tras cambiar sus puntos, nombre o estado
+
+        Args:
+            user (Users): Usuario ya guardado en la base de datos
+        """
+        with self._lock:
+            # Si aún no se ha cargado, la primera lectura ya traerá el valor actualizado
+            if self._loaded_at is None:
+                return
+
+            self._place(user.user_id, f"{user.first_name} {user.last_name}", user.current_points, user.is_active)
+
+    def _place(self, user_id, name, points, is_active):
+        """Inserta, reubica o quita (si no está activo) a un usuario; se llama con el lock tomado"""
+        if not is_active:
+            self.remove_user(user_id)
+            return
+
+        entry = self._entries.get(user_id)
+        if entry:
+            self._remove_key(entry['key'])
+
+        key = (-(points or 0), user_id)
+        self._entries[user_id] = {'key': key, 'name': name}
+        insort(self._keys, key)
+
+    def remove_user(self, user_id):
+        """Quita a un usuario del ranking (desactivado o eliminado)"""
+        with self._lock:
+            entry = self._entries.pop(user_id, None)
+            if entry:
+                self._remove_key(entry['key'])
+
+    def _serialize(self, rank, key):
+        points, user_id = key
+        return {
+            'rank': rank,
+            'user_id': user_id,
+            'name': self._entries[user_id]['name'],
+            'points': -points
+        }
+
+    def page(self, offset, limit):
+        """
+        Devuelve una página del ranking general
+
+        Returns:
+            tuple: (lista de posiciones, total de usuarios en el ranking)
+        """
+        self._ensure_loaded()
+        with self._lock:
+            keys = self._keys[offset:offset + limit]
+            results = [self._serialize(offset + index + 1, key) for index, key in enumerate(keys)]
+            return results, len(self._keys)
+
+    def page_for(self, user_ids, offset, limit):
+        """
+        Devuelve una página del ranking restringido a un grupo de usuarios
+
+        Returns:
+            tuple: (lista de posiciones dentro del grupo, total del grupo)
+        """
+        self._ensure_loaded()
+        with self._lock:
+            keys = sorted(self._entries[user_id]['key'] for user_id in user_ids if user_id in self._entries)
+            page_keys = keys[offset:offset + limit]
+            results = [self._serialize(offset + index + 1, key) for index, key in enumerate(page_keys)]
+            return results, len(keys)
+
+    def rank_of(self, user_id):
+        """Posición del usuario (1 = más puntos) o None si no está en el ranking"""
+        self._ensure_loaded()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if not entry:
+                return None
+            return bisect_left(self._keys, entry['key']) + 1
+
+    def around(self, user_id, radius):
+        """
+        Devuelve la posición del usuario y sus N vecinos por arriba y por abajo
+
+        Returns:
+            tuple: (posición del usuario o None, lista de posiciones, total)
+        """
+        self._ensure_loaded()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if not entry:
+                return None, [], len(self._keys)
+
+            index = bisect_left(self._keys, entry['key'])
+            start = max(index - radius, 0)
+            keys = self._keys[start:index + radius + 1]
+            neighbours = [self._serialize(start + offset + 1, key) for offset, key in enumerate(keys)]
+            return index + 1, neighbours, len(self._keys)
+
+
+# Instancia global del ranking
+leaderboard = Leaderboard()
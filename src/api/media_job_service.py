@@ -0,0 +1,332 @@
+"""
+media_job_service.py
+Cola de trabajos para subir a Cloudinary la multimedia de las lecciones en segundo plano
+"""
+import os
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from flask import current_app
+from werkzeug.utils import secure_filename
+
+from api.models import db, Lessons, Modules, MultimediaResources, MediaJobs, MediaJobFiles
+from .cloudinary_service import cloudinary_service
+from .catalog_cache_service import catalog_cache
+
+# Directorio compartido entre los workers web y el worker de multimedia
+MEDIA_SPOOL_DIR = os.getenv("MEDIA_SPOOL_DIR", os.path.join(tempfile.gettempdir(), "media_jobs"))
+MEDIA_JOB_MAX_ATTEMPTS = int(os.getenv("MEDIA_JOB_MAX_ATTEMPTS", "3"))
+# Un trabajo 'running' sin señal de vida durante este tiempo se da por abandonado (worker caído)
+MEDIA_JOB_LEASE_SECONDS = int(os.getenv("MEDIA_JOB_LEASE_SECONDS", "900"))
+
+
+def classify_media_file(filename):
+    """
+    Clasifica un archivo por su extensión
+
+    Returns:
+        tuple: (tipo multimedia, tipo Cloudinary, carpeta) o None si no se admite
+    """
+    filename = (filename or "").lower()
+
+    if filename.endswith((".jpg", ".jpeg", ".png")):
+        return "image", "image", "images"
+
+    if filename.endswith(".gif"):
+        return "gif", "video", "gifs"
+
+    if filename.endswith((".mp4", ".mov", ".avi")):
+        return "video", "video", "videos"
+
+    if filename.endswith((".pdf", ".docx", ".xlsx")):
+        return "document", "raw", "documents"
+
+    return None
+
+
+class MediaJobService:
+    """Servicio para encolar y procesar trabajos de subida de multimedia"""
+
+    @staticmethod
+    def spool_files(files, descriptions):
+        """
+        Guarda en disco los archivos del request (por bloques, sin cargarlos en memoria)
+
+        Args:
+            files (list): Lista de FileStorage del request
+            descriptions (list): Descripciones en el mismo orden que files
+
+        Returns:
+            list: Diccionarios con path, nombre, tipo, descripción y posición de cada archivo
+        """
+        os.makedirs(MEDIA_SPOOL_DIR, exist_ok=True)
+
+        spooled = []
+        for index, file in enumerate(files, start=1):
+            media_info = classify_media_file(file.filename)
+
+            if not media_info:
+                continue
+
+            path = os.path.join(MEDIA_SPOOL_DIR, f"{uuid.uuid4().hex}_{secure_filename(file.filename)}")
+            file.save(path)
+
+            spooled.append({
+                'path': path,
+                'original_filename': file.filename,
+                'type': media_info[0],
+                'description': descriptions[index - 1] if index - 1 < len(descriptions) else None,
+                'position': index
+            })
+
+        return spooled
+
+    @staticmethod
+    def enqueue(lesson_id, user_id, spooled):
+        """
+        Crea el trabajo y sus archivos en la sesión actual (no hace commit)
+
+        Returns:
+            MediaJobs: Trabajo creado
+        """
+        job = MediaJobs(
+            lesson_id=lesson_id,
+            created_by=user_id,
+            status='pending',
+            total_files=len(spooled),
+            processed_files=0
+        )
+        db.session.add(job)
+
+        for item in spooled:
+            job.files.append(MediaJobFiles(
+                path=item['path'],
+                original_filename=item['original_filename'],
+                type=item['type'],
+                description=item['description'],
+                position=item['position'],
+                status='pending'
+            ))
+
+        return job
+
+    @staticmethod
+    def discard_spooled(spooled):
+        """Elimina del disco archivos guardados que ya no se van a procesar"""
+        for item in spooled:
+            if os.path.exists(item['path']):
+                os.remove(item['path'])
+
+    @staticmethod
+    def claim_next_job():
+        """
+        Toma el siguiente trabajo pendiente, o uno 'running' cuyo lease caducó, y lo marca como 'running'.
+        En PostgreSQL usa FOR UPDATE SKIP LOCKED para que varios workers no tomen el mismo
+
+        Returns:
+            MediaJobs: Trabajo tomado o None si no hay pendientes
+        """
+        while True:
+            now = datetime.now(timezone.utc)
+            job = db.session.execute(
+                db.select(MediaJobs)
+                .where(db.or_(
+                    MediaJobs.status == 'pending',
+                    db.and_(
+                        MediaJobs.status == 'running',
+                        db.or_(
+                            MediaJobs.locked_at.is_(None),
+                            MediaJobs.locked_at < now - timedelta(seconds=MEDIA_JOB_LEASE_SECONDS)
+                        )
+                    )
+                ))
+                .order_by(MediaJobs.job_id)
+                .limit(1)
+                .with_for_update(skip_locked=True)
+            ).scalar()
+
+            if not job:
+                db.session.rollback()
+                return None
+
+            # Un trabajo que ya tumbó a varios workers no se vuelve a intentar
+            if job.status == 'running' and (job.attempts or 0) >= MEDIA_JOB_MAX_ATTEMPTS:
+                MediaJobService._finish(job, 'failed', 'El worker se detuvo durante el procesamiento')
+                MediaJobService.discard_spooled([{'path': f.path} for f in job.files if f.status == 'pending'])
+                continue
+
+            job.status = 'running'
+            job.attempts = (job.attempts or 0) + 1
+            job.started_at = now
+            job.locked_at = now
+            job.error = None
+            db.session.commit()
+
+            return job
+
+    @staticmethod
+    def process_job(job, batch_size=None):
+        """
+        Sube los archivos pendientes del trabajo por lotes en paralelo e inserta
+        sus MultimediaResources, guardando el progreso tras cada lote
+
+        Returns:
+            bool: True si el trabajo terminó correctamente
+        """
+        batch_size = batch_size or cloudinary_service.upload_workers
+
+        lesson = db.session.get(Lessons, job.lesson_id)
+        module = db.session.get(Modules, lesson.module_id) if lesson else None
+
+        if not lesson or not module:
+            pending = [{'path': f.path} for f in job.files if f.status == 'pending']
+            MediaJobService._finish(job, 'failed', 'La lección o su módulo ya no existe')
+            MediaJobService.discard_spooled(pending)
+            return False
+
+        course_id = module.course_id
+        module_id = module.module_id
+        lesson_id = lesson.lesson_id
+        job_id = job.job_id
+
+        pending_files = [
+            {
+                'file_id': f.file_id,
+                'path': f.path,
+                'original_filename': f.original_filename,
+                'type': f.type,
+                'description': f.description,
+                'position': f.position
+            }
+            for f in job.files if f.status == 'pending'
+        ]
+        # Liberar la conexión mientras se sube a Cloudinary
+        db.session.commit()
+
+        for start in range(0, len(pending_files), batch_size):
+            batch = pending_files[start:start + batch_size]
+            streams = []
+            uploads = []
+
+            for job_file in batch:
+                _, cloudinary_type, folder_type = classify_media_file(job_file['original_filename'])
+                stream = open(job_file['path'], 'rb')
+                streams.append(stream)
+                uploads.append((stream, {
+                    'resource_type': cloudinary_type,
+                    'folder': f"courses/course_{course_id}/module_{module_id}/lesson_{lesson_id}/{folder_type}",
+                    'public_id': f"job_{job_id}_resource_{job_file['position']}",
+                    'overwrite': True,
+                    'filename': job_file['original_filename']
+                }))
+
+            try:
+                results = cloudinary_service.upload_many(uploads)
+            except Exception as e:
+                job = db.session.get(MediaJobs, job_id)
+                MediaJobService._retry_or_fail(job, str(e))
+                return False
+            finally:
+                for stream in streams:
+                    stream.close()
+
+            try:
+                max_order = db.session.execute(
+                    db.select(db.func.max(MultimediaResources.order))
+                    .where(MultimediaResources.lesson_id == lesson_id)
+                ).scalar() or 0
+
+                for offset, (job_file, result) in enumerate(zip(batch, results), start=1):
+                    resource = MultimediaResources(
+                        lesson_id=lesson_id,
+                        type=job_file['type'],
+                        url=result['secure_url'],
+                        duration_seconds=result.get('duration'),
+                        description=job_file['description'],
+                        order=max_order + offset
+                    )
+                    db.session.add(resource)
+                    db.session.flush()
+
+                    file_row = db.session.get(MediaJobFiles, job_file['file_id'])
+                    file_row.status = 'done'
+                    file_row.resource_id = resource.resource_id
+
+                job = db.session.get(MediaJobs, job_id)
+                job.processed_files = (job.processed_files or 0) + len(batch)
+                # Renovar el lease tras cada lote
+                job.locked_at = datetime.now(timezone.utc)
+                # Los árboles de curso cacheados por los procesos web incluyen la multimedia
+                catalog_cache.publish()
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                cloudinary_service.delete_results(results)
+                job = db.session.get(MediaJobs, job_id)
+                MediaJobService._retry_or_fail(job, str(e))
+                return False
+
+            MediaJobService.discard_spooled(batch)
+
+        job = db.session.get(MediaJobs, job_id)
+        MediaJobService._finish(job, 'done')
+        return True
+
+    @staticmethod
+    def _retry_or_fail(job, error):
+        if job.attempts < MEDIA_JOB_MAX_ATTEMPTS:
+            job.status = 'pending'
+            job.error = error[:500]
+            db.session.commit()
+            return
+
+        MediaJobService._finish(job, 'failed', error)
+        MediaJobService.discard_spooled([{'path': f.path} for f in job.files if f.status == 'pending'])
+
+    @staticmethod
+    def _finish(job, status, error=None):
+        job.status = status
+        job.error = error[:500] if error else None
+        job.finished_at = datetime.now(timezone.utc)
+        db.session.commit()
+
+    @staticmethod
+    def run_worker(poll_interval=2.0, once=False):
+        """
+        Procesa trabajos pendientes en bucle
+
+        Args:
+            poll_interval (float): Segundos de espera cuando no hay trabajos
+            once (bool): Terminar cuando la cola quede vacía
+
+        Returns:
+            int: Número de trabajos procesados
+        """
+        processed = 0
+        while True:
+            job_id = None
+            try:
+                job = MediaJobService.claim_next_job()
+
+                if not job:
+                    if once:
+                        return processed
+                    time.sleep(poll_interval)
+                    continue
+
+                job_id = job.job_id
+                ok = MediaJobService.process_job(job)
+                processed += 1
+                current_app.logger.info("Media job %s: %s", job_id, 'done' if ok else 'error')
+            except Exception:
+                # Un error inesperado no detiene el worker: el trabajo queda 'running'
+                # y se vuelve a tomar cuando caduque su lease
+                db.session.rollback()
+                current_app.logger.exception(f"Media worker: error inesperado (trabajo {job_id})")
+                time.sleep(poll_interval)
+
+
+# Instancia global del servicio
+media_job_service = MediaJobService()
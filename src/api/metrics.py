@@ -0,0 +1,118 @@
+"""
+metrics.py
+Métricas Prometheus: peticiones por ruta, latencias, pool de SQLAlchemy y llamadas a Stripe/Cloudinary.
+Con gunicorn se agregan entre workers mediante PROMETHEUS_MULTIPROC_DIR (ver gunicorn.conf.py)
+"""
+import os
+import time
+from contextlib import contextmanager
+
+from flask import Response, g, request
+
+try:
+    from prometheus_client import (CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram,
+                                   REGISTRY, generate_latest, multiprocess)
+except ImportError:
+    Counter = Gauge = Histogram = None
+
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+if Counter is not None:
+    HTTP_REQUESTS = Counter(
+        'http_requests_total', 'Peticiones HTTP atendidas',
+        ['method', 'endpoint', 'status']
+    )
+    HTTP_LATENCY = Histogram(
+        'http_request_duration_seconds', 'Latencia de las peticiones HTTP',
+        ['method', 'endpoint'], buckets=LATENCY_BUCKETS
+    )
+    DB_POOL_CHECKED_OUT = Gauge(
+        'db_pool_checked_out_connections', 'Conexiones del pool de SQLAlchemy en uso',
+        multiprocess_mode='livesum'
+    )
+    DB_POOL_OVERFLOW = Gauge(
+        'db_pool_overflow_connections', 'Conexiones abiertas por encima del tamaño del pool',
+        multiprocess_mode='livesum'
+    )
+    EXTERNAL_LATENCY = Histogram(
+        'external_call_duration_seconds', 'Latencia de las llamadas a servicios externos',
+        ['service', 'operation'], buckets=LATENCY_BUCKETS
+    )
+    EXTERNAL_ERRORS = Counter(
+        'external_call_errors_total', 'Errores en llamadas a servicios externos',
+        ['service', 'operation']
+    )
+
+
+@contextmanager
+def external_call(service, operation):
+    """
+    Mide una llamada a un servicio externo (Stripe, Cloudinary) y cuenta sus errores
+
+    Ejemplo:
+        with external_call('stripe', 'create_payment_intent'):
+            stripe.PaymentIntent.create(...)
+    """
+    if Counter is None:
+        yield
+        return
+
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        EXTERNAL_ERRORS.labels(service, operation).inc()
+        raise
+    finally:
+        EXTERNAL_LATENCY.labels(service, operation).observe(time.perf_counter() - started)
+
+
+def _update_pool_gauges(engine):
+    pool = engine.pool
+    if hasattr(pool, 'checkedout'):
+        DB_POOL_CHECKED_OUT.set(pool.checkedout())
+    if hasattr(pool, 'overflow'):
+        DB_POOL_OVERFLOW.set(max(pool.overflow(), 0))
+
+
+def setup_metrics(app, db):
+    """
+    Registra los hooks de métricas y el endpoint /metrics.
+    Si prometheus_client no está instalado no hace nada
+    """
+    if Counter is None:
+        app.logger.warning("prometheus_client no está instalado: /metrics desactivado")
+        return
+
+    @app.before_request
+    def start_request_timer():
+        g.metrics_started = time.perf_counter()
+
+    @app.after_request
+    def record_request_metrics(response):
+        started = g.pop('metrics_started', None)
+        if started is None:
+            return response
+
+        # La regla de la ruta (p. ej. /api/lessons/<int:lesson_id>) mantiene acotadas las etiquetas
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        HTTP_LATENCY.labels(request.method, endpoint).observe(time.perf_counter() - started)
+        HTTP_REQUESTS.labels(request.method, endpoint, str(response.status_code)).inc()
+        _update_pool_gauges(db.engine)
+
+        return response
+
+    @app.route('/metrics', methods=['GET'])
+    def metrics():
+        if METRICS_TOKEN and request.headers.get('Authorization') != f"Bearer {METRICS_TOKEN}":
+            return {'message': 'No autorizado', 'results': {}}, 401
+
+        if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+            registry = CollectorRegistry()
+            multiprocess.MultiProcessCollector(registry)
+        else:
+            registry = REGISTRY
+
+        return Response(generate_latest(registry), mimetype=CONTENT_TYPE_LATEST)
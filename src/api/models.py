@@ -1,10 +1,19 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime, timezone
 from sqlalchemy import UniqueConstraint
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 
 db = SQLAlchemy()
 
 
+def dialect_insert(model):
+    """INSERT con soporte de ON CONFLICT para el motor en uso (PostgreSQL o SQLite)"""
+    if db.engine.dialect.name == 'postgresql':
+        return postgresql_insert(model)
+    return sqlite_insert(model)
+
+
 class Users(db.Model):
     __tablename__ = "users"
     user_id = db.Column(db.Integer, primary_key=True)
@@ -14,6 +23,8 @@ class Users(db.Model):
     email = db.Column(db.String(100), unique=True, nullable=False)
     password_hash = db.Column(db.String(255), nullable=False)
     current_points = db.Column(db.Integer, default=0, nullable=False)
+    # Último cambio de current_points: el ranking de cada proceso lee desde aquí los cambios de los demás
+    points_updated_at = db.Column(db.DateTime, nullable=True)
     is_active = db.Column(db.Boolean(), default=True, nullable=False)
     is_admin = db.Column(db.Boolean(), default=False, nullable=False)
     registration_date = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
@@ -23,6 +34,13 @@ class Users(db.Model):
     original_email = db.Column(db.String(100), nullable=True)  # ✅ AGREGADO
     deletion_uuid = db.Column(db.String(36), nullable=True)  # ✅ AGREGADO
 
+    __table_args__ = (
+        db.Index('ix_users_active_points', 'current_points',
+                 postgresql_where=db.text('is_active'), sqlite_where=db.text('is_active')),
+        db.Index('ix_users_role_active', 'role', 'is_active'),
+        db.Index('ix_users_points_updated_at', 'points_updated_at'),
+    )
+
     def __repr__(self):
         return f'<User: {self.user_id} - {self.first_name} {self.last_name}>'
 
@@ -59,6 +77,12 @@ class Courses(db.Model):
     creator = db.relationship('Users', foreign_keys=[created_by],
                               backref=db.backref('courses_created', lazy='dynamic'))
 
+    __table_args__ = (
+        db.Index('ix_courses_created_by', 'created_by'),
+        db.Index('ix_courses_active', 'course_id',
+                 postgresql_where=db.text('is_active'), sqlite_where=db.text('is_active')),
+    )
+
     def __repr__(self):
         return f'<Course {self.course_id} - {self.title}>'
 
@@ -152,9 +176,18 @@ class Purchases(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('users.user_id', ondelete='RESTRICT'))
     user_to = db.relationship('Users', foreign_keys=[user_id],
                               backref=db.backref('users_to_purchases', lazy='select'))
+    stripe_payment_intent_id = db.Column(db.String(255), nullable=True)
+    # Se incrementa al reactivar una compra cancelada: forma parte de la clave de idempotencia
+    payment_attempt = db.Column(db.Integer, nullable=False, default=0, server_default='0')
 
     __table_args__ = (
         UniqueConstraint('user_id', 'course_id', name='uq_user_course_purchase'),
+        db.Index('ix_purchases_user_status', 'user_id', 'status'),
+        db.Index('ix_purchases_course_id', 'course_id'),
+        db.Index('ix_purchases_date', 'purchase_date', 'purchase_id'),
+        db.Index('ix_purchases_stripe_payment_intent_id', 'stripe_payment_intent_id', unique=True),
+        db.Index('ix_purchases_pending', 'purchase_id',
+                 postgresql_where=db.text("status = 'pending'"), sqlite_where=db.text("status = 'pending'")),
     )
 
     def __repr__(self):
@@ -180,10 +213,18 @@ class UserPoints(db.Model):
     type = db.Column(db.Enum('lesson', 'module', 'course', name='type_user_points'), nullable=False, default="course")
     event_description = db.Column(db.String(255), nullable=True)
     date = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
+    # Origen de los puntos (p. ej. 'purchase' + purchase_id): evita otorgarlos dos veces
+    source_type = db.Column(db.String(30), nullable=True)
+    source_id = db.Column(db.Integer, nullable=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.user_id', ondelete='CASCADE'))
     user_to = db.relationship('Users', foreign_keys=[user_id],
                               backref=db.backref('users_to_points', lazy='select'))
 
+    __table_args__ = (
+        db.Index('ix_user_points_user_date', 'user_id', 'date'),
+        UniqueConstraint('user_id', 'source_type', 'source_id', name='uq_user_points_source'),
+    )
+
     def __repr__(self):
         return f'<UserPoints {self.point_id} - {self.type}>'
 
@@ -194,10 +235,35 @@ class UserPoints(db.Model):
             "points": self.points,
             "type": self.type,
             "event_description": self.event_description,
+            "source_type": self.source_type,
+            "source_id": self.source_id,
             "date": self.date.isoformat() if self.date else None
         }
 
 
+class UserPointsTotals(db.Model):
+    __tablename__ = "user_points_totals"
+    user_id = db.Column(db.Integer, db.ForeignKey('users.user_id', ondelete='CASCADE'), primary_key=True)
+    total_points = db.Column(db.Integer, default=0, nullable=False)
+    updated_at = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
+    user_to = db.relationship('Users', foreign_keys=[user_id],
+                              backref=db.backref('points_total', lazy='select', uselist=False))
+
+    __table_args__ = (
+        db.Index('ix_user_points_totals_total_points', 'total_points'),
+    )
+
+    def __repr__(self):
+        return f'<UserPointsTotals {self.user_id} - {self.total_points}>'
+
+    def serialize(self):
+        return {
+            "user_id": self.user_id,
+            "total_points": self.total_points,
+            "updated_at": self.updated_at.isoformat() if self.updated_at else None
+        }
+
+
 class UserProgress(db.Model):
     __tablename__ = "user_progress"
     progress_id = db.Column(db.Integer, primary_key=True)
@@ -213,6 +279,7 @@ class UserProgress(db.Model):
 
     __table_args__ = (
         UniqueConstraint('user_id', 'lesson_id', name='uq_user_lesson_progress'),
+        db.Index('ix_user_progress_lesson_user', 'lesson_id', 'user_id'),
     )
 
     def __repr__(self):
@@ -289,6 +356,10 @@ class MultimediaResources(db.Model):
     lesson_to = db.relationship('Lessons', foreign_keys=[lesson_id],
                                 backref=db.backref('multimedia_resources', lazy='select'))
 
+    __table_args__ = (
+        db.Index('ix_multimedia_resources_lesson_order', 'lesson_id', 'order'),
+    )
+
     def __repr__(self):
         return f'<MultimediaResources {self.resource_id} - {self.url} - {self.description}>'
 
@@ -301,4 +372,158 @@ class MultimediaResources(db.Model):
             "duration_seconds": self.duration_seconds,
             "description": self.description,
             "order": self.order
-        }
\ No newline at end of file
+        }
+
+class MediaJobs(db.Model):
+    __tablename__ = "media_jobs"
+    job_id = db.Column(db.Integer, primary_key=True)
+    status = db.Column(db.Enum('pending', 'running', 'done', 'failed', name='status_media_jobs'), nullable=False, default='pending')
+    total_files = db.Column(db.Integer, default=0, nullable=False)
+    processed_files = db.Column(db.Integer, default=0, nullable=False)
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    error = db.Column(db.String(500), nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    locked_at = db.Column(db.DateTime, nullable=True)  # Última señal de vida del worker que lo procesa
+    lesson_id = db.Column(db.Integer, db.ForeignKey('lessons.lesson_id', ondelete='CASCADE'), nullable=False)
+    lesson_to = db.relationship('Lessons', foreign_keys=[lesson_id],
+                                backref=db.backref('media_jobs', lazy='select'))
+    created_by = db.Column(db.Integer, db.ForeignKey('users.user_id', ondelete='SET NULL'), nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_media_jobs_status', 'status', 'job_id'),
+    )
+
+    def __repr__(self):
+        return f'<MediaJobs {self.job_id} - {self.status}>'
+
+    def serialize(self):
+        return {
+            "job_id": self.job_id,
+            "status": self.status,
+            "lesson_id": self.lesson_id,
+            "created_by": self.created_by,
+            "total_files": self.total_files,
+            "processed_files": self.processed_files,
+            "progress": round(self.processed_files * 100 / self.total_files) if self.total_files else 100,
+            "attempts": self.attempts,
+            "error": self.error,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None
+        }
+
+
+class MediaJobFiles(db.Model):
+    __tablename__ = "media_job_files"
+    file_id = db.Column(db.Integer, primary_key=True)
+    path = db.Column(db.String(500), nullable=False)
+    original_filename = db.Column(db.String(255), nullable=False)
+    type = db.Column(db.Enum('video', 'image', 'gif', 'animation', 'document', name='type_media_job_files'), nullable=False)
+    description = db.Column(db.String(255), nullable=True)
+    position = db.Column(db.Integer, nullable=False)
+    status = db.Column(db.Enum('pending', 'done', 'failed', name='status_media_job_files'), nullable=False, default='pending')
+    job_id = db.Column(db.Integer, db.ForeignKey('media_jobs.job_id', ondelete='CASCADE'), nullable=False)
+    job_to = db.relationship('MediaJobs', foreign_keys=[job_id],
+                             backref=db.backref('files', lazy='select', order_by='MediaJobFiles.position'))
+    resource_id = db.Column(db.Integer, db.ForeignKey('multimedia_resources.resource_id', ondelete='SET NULL'), nullable=True)
+
+    def __repr__(self):
+        return f'<MediaJobFiles {self.file_id} - {self.original_filename}>'
+
+    def serialize(self):
+        return {
+            "file_id": self.file_id,
+            "job_id": self.job_id,
+            "original_filename": self.original_filename,
+            "type": self.type,
+            "description": self.description,
+            "position": self.position,
+            "status": self.status,
+            "resource_id": self.resource_id
+        }
+
+
+class UploadSessions(db.Model):
+    __tablename__ = "upload_sessions"
+    upload_id = db.Column(db.String(32), primary_key=True)
+    filename = db.Column(db.String(255), nullable=False)
+    type = db.Column(db.Enum('video', 'image', 'gif', 'animation', 'document', name='type_upload_sessions'), nullable=False)
+    description = db.Column(db.String(255), nullable=True)
+    total_size = db.Column(db.BigInteger, nullable=False)
+    chunk_size = db.Column(db.Integer, nullable=False)
+    total_chunks = db.Column(db.Integer, nullable=False)
+    status = db.Column(db.Enum('uploading', 'completed', 'cancelled', name='status_upload_sessions'), nullable=False, default='uploading')
+    created_at = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
+    completed_at = db.Column(db.DateTime, nullable=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.user_id', ondelete='CASCADE'), nullable=False)
+    lesson_id = db.Column(db.Integer, db.ForeignKey('lessons.lesson_id', ondelete='CASCADE'), nullable=False)
+    job_id = db.Column(db.Integer, db.ForeignKey('media_jobs.job_id', ondelete='SET NULL'), nullable=True)
+
+    def __repr__(self):
+        return f'<UploadSessions {self.upload_id} - {self.filename}>'
+
+    def serialize(self):
+        return {
+            "upload_id": self.upload_id,
+            "filename": self.filename,
+            "type": self.type,
+            "description": self.description,
+            "total_size": self.total_size,
+            "chunk_size": self.chunk_size,
+            "total_chunks": self.total_chunks,
+            "status": self.status,
+            "user_id": self.user_id,
+            "lesson_id": self.lesson_id,
+            "job_id": self.job_id,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "completed_at": self.completed_at.isoformat() if self.completed_at else None
+        }
+
+
+class StripeWebhookEvents(db.Model):
+    __tablename__ = "stripe_webhook_events"
+    event_id = db.Column(db.String(255), primary_key=True)
+    type = db.Column(db.String(100), nullable=False)
+    payload = db.Column(db.Text, nullable=False)
+    status = db.Column(db.Enum('pending', 'processed', 'failed', name='status_stripe_webhook_events'), nullable=False, default='pending')
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    error = db.Column(db.String(500), nullable=True)
+    received_at = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
+    processed_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_stripe_webhook_events_pending', 'received_at',
+                 postgresql_where=db.text("status = 'pending'"), sqlite_where=db.text("status = 'pending'")),
+    )
+
+    def __repr__(self):
+        return f'<StripeWebhookEvents {self.event_id} - {self.type}>'
+
+    def serialize(self):
+        return {
+            "event_id": self.event_id,
+            "type": self.type,
+            "status": self.status,
+            "attempts": self.attempts,
+            "error": self.error,
+            "received_at": self.received_at.isoformat() if self.received_at else None,
+            "processed_at": self.processed_at.isoformat() if self.processed_at else None
+        }
+
+
+class CatalogVersions(db.Model):
+    __tablename__ = "catalog_versions"
+    # Una fila por caché compartida ('catalog'): cada escritura del catálogo, en cualquier proceso, sube la versión
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<CatalogVersions {self.name} - {self.version}>'
+
+    def serialize(self):
+        return {
+            "name": self.name,
+            "version": self.version
+        }
@@ -0,0 +1,164 @@
+"""
+password_service.py
+Hash de contraseñas fuera del hilo de la petición: pool de procesos acotado,
+método configurable y rehash transparente al iniciar sesión
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, check_password_hash, generate_password_hash
+
+# Método y factor de trabajo en formato Werkzeug, p. ej. "scrypt:32768:8:1" o "pbkdf2:sha256:600000".
+# Queda guardado como prefijo de cada hash: al cambiarlo, los hashes antiguos se rehacen al iniciar sesión
+PASSWORD_HASH_METHOD = os.getenv("PASSWORD_HASH_METHOD", "scrypt")
+
+# 0 = calcular en el propio hilo de la petición. Es el valor por defecto con un solo núcleo: el pool no
+# puede añadir paralelismo (el rendimiento lo fija scrypt, ~7 req/s por núcleo) y solo suma un proceso
+# más y el envío de cada operación. Con varios núcleos el pool saca el hashing del GIL del worker
+PASSWORD_HASH_WORKERS = int(os.getenv(
+    "PASSWORD_HASH_WORKERS", str(min(os.cpu_count() or 1, 4) if (os.cpu_count() or 1) > 1 else 0)
+))
+
+# Operaciones en curso o en cola permitidas por proceso antes de responder 503
+PASSWORD_HASH_QUEUE_DEPTH = int(os.getenv("PASSWORD_HASH_QUEUE_DEPTH", str(max(PASSWORD_HASH_WORKERS, 1) * 4)))
+PASSWORD_HASH_TIMEOUT = float(os.getenv("PASSWORD_HASH_TIMEOUT", "10"))
+
+# "fork" evita que los procesos del pool vuelvan a importar el módulo principal (spawn/forkserver lo hacen)
+PASSWORD_HASH_MP_CONTEXT = os.getenv("PASSWORD_HASH_MP_CONTEXT", "fork")
+
+
+class PasswordHashBusy(Exception):
+    """La cola de hashing está llena o no respondió a tiempo: el cliente debe reintentar más tarde"""
+
+
+def method_prefix(method):
+    """
+    Prefijo que Werkzeug guarda en los hashes generados con method, sin calcular ningún hash
+    ("scrypt" -> "scrypt:32768:8:1", "pbkdf2" -> "pbkdf2:sha256:<iteraciones por defecto>")
+    """
+    name, *args = method.split(":")
+
+    if name == "scrypt" and not args:
+        return "scrypt:32768:8:1"
+
+    if name == "pbkdf2" and len(args) < 2:
+        hash_name = args[0] if args else "sha256"
+        return f"pbkdf2:{hash_name}:{DEFAULT_PBKDF2_ITERATIONS}"
+
+    return method
+
+
+class PasswordService:
+    """Servicio para generar y verificar hashes de contraseñas"""
+
+    def __init__(self, method=PASSWORD_HASH_METHOD, workers=PASSWORD_HASH_WORKERS,
+                 queue_depth=PASSWORD_HASH_QUEUE_DEPTH, timeout=PASSWORD_HASH_TIMEOUT):
+        self.method = method
+        self.workers = workers
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(queue_depth)
+        self._lock = threading.Lock()
+        self._executor = None
+        self._executor_pid = None
+        self._method_prefix = method_prefix(method)
+
+    def _pool(self):
+        # El pool se crea en cada worker de gunicorn (después del fork), no en el proceso maestro
+        with self._lock:
+            if self._executor is None or self._executor_pid != os.getpid():
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context(PASSWORD_HASH_MP_CONTEXT)
+                )
+                self._executor_pid = os.getpid()
+            return self._executor
+
+    def _discard_pool(self, executor):
+        """Descarta un pool roto (un proceso hijo murió) para que la siguiente operación cree otro"""
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def _submit(self, function, *args):
+        # Un pool roto se sustituye y se reintenta una vez
+        for attempt in range(2):
+            executor = self._pool()
+            try:
+                return executor, executor.submit(function, *args)
+            except BrokenProcessPool:
+                self._discard_pool(executor)
+                if attempt:
+                    raise
+
+    def _run(self, function, *args):
+        if not self._slots.acquire(blocking=False):
+            raise PasswordHashBusy("Demasiadas operaciones de contraseña en curso")
+
+        if self.workers <= 0:
+            try:
+                return function(*args)
+            finally:
+                self._slots.release()
+
+        try:
+            executor, future = self._submit(function, *args)
+        except BrokenProcessPool:
+            self._slots.release()
+            raise PasswordHashBusy("El pool de hashing no está disponible")
+
+        # El hueco se libera cuando el proceso hijo termina de verdad, no cuando se deja de esperar:
+        # así un timeout no permite más hashes simultáneos que PASSWORD_HASH_QUEUE_DEPTH
+        future.add_done_callback(lambda _: self._slots.release())
+
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            raise PasswordHashBusy("La operación de contraseña tardó demasiado")
+        except BrokenProcessPool:
+            self._discard_pool(executor)
+            raise PasswordHashBusy("El pool de hashing no está disponible")
+
+    def hash_password(self, password):
+        """
+        Genera el hash con el método configurado
+
+        Raises:
+            PasswordHashBusy: Si la cola de hashing está llena, no respondió a tiempo o el pool no está disponible
+        """
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify_password(self, password_hash, password):
+        """
+        Comprueba una contraseña contra su hash
+
+        Raises:
+            PasswordHashBusy: Si la cola de hashing está llena, no respondió a tiempo o el pool no está disponible
+        """
+        return self._run(check_password_hash, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        """True si el hash se generó con otro método o factor de trabajo distinto al configurado"""
+        return password_hash.split("$", 1)[0] != self._method_prefix
+
+    def verify_and_update(self, password_hash, password):
+        """
+        Comprueba la contraseña y, si es correcta pero el hash está desactualizado, genera uno nuevo
+
+        Returns:
+            tuple: (contraseña correcta, nuevo hash o None)
+        """
+        if not self.verify_password(password_hash, password):
+            return False, None
+
+        if self.needs_rehash(password_hash):
+            return True, self.hash_password(password)
+
+        return True, None
+
+
+# Instancia global del servicio
+password_service = PasswordService()
@@ -0,0 +1,218 @@
+"""
+points_service.py
+Servicio para registrar puntos de usuario y mantener el total acumulado por usuario
+"""
+from collections import defaultdict
+from datetime import datetime, timezone
+
+from api.models import db, dialect_insert, Users, UserPoints, UserPointsTotals
+from .achievement_service import achievement_service
+
+# Orígenes de los puntos: junto con source_id forman la clave única (user_id, source_type, source_id)
+SOURCE_PURCHASE = 'purchase'
+SOURCE_LESSON = 'lesson'
+SOURCE_MODULE = 'module'
+# Orígenes que solo otorga el sistema: un alta manual con esa clave bloquearía la real (ON CONFLICT DO NOTHING)
+SYSTEM_SOURCE_TYPES = frozenset({SOURCE_PURCHASE, SOURCE_LESSON, SOURCE_MODULE})
+
+
+class PointsService:
+    """Servicio para el historial de puntos (user_points) y sus totales (user_points_totals)"""
+
+    @staticmethod
+    def record(user_id, points, type='course', event_description=None, date=None):
+        """
+        Registra puntos sin clave de origen (p. ej. ajustes manuales), actualiza el total
+        y suma a users.current_points en la misma transacción, otorgando los logros alcanzados (no hace commit)
+
+        Args:
+            user_id (int): ID del usuario
+            points (int): Puntos a sumar (pueden ser negativos)
+            type (str): Tipo de evento ('lesson', 'module', 'course')
+            event_description (str): Descripción del evento
+            date (datetime): Fecha del evento (por defecto ahora)
+
+        Returns:
+            UserPoints: Registro creado
+        """
+        row = UserPoints(
+            user_id=user_id,
+            points=points,
+            type=type,
+            event_description=event_description,
+            date=date or datetime.now(timezone.utc)
+        )
+        db.session.add(row)
+
+        PointsService.apply_delta(user_id, points)
+
+        return row
+
+    @staticmethod
+    def apply_delta(user_id, delta):
+        """
+        Aplica un cambio de puntos ya reflejado en el historial (alta, edición o borrado de un registro):
+        total acumulado, users.current_points y logros alcanzados si el cambio es positivo (no hace commit)
+
+        Returns:
+            int: Nuevo current_points, o None si el usuario no existe
+        """
+        if not user_id or not delta:
+            return None
+
+        PointsService.add_to_total(user_id, delta)
+        current = PointsService.add_to_current(user_id, delta)
+        if current is not None and delta > 0:
+            achievement_service.award_crossed({user_id: (current - delta, current)})
+
+        return current
+
+    @staticmethod
+    def award(user_id, points, source_type, source_id, type='course', event_description=None, date=None):
+        """
+        Otorga puntos una sola vez por origen (no hace commit). Si ya existe un registro con la misma
+        clave (user_id, source_type, source_id) no hace nada: la comprobación la resuelve el índice único
+
+        Returns:
+            int: Nuevo current_points del usuario, o None si los puntos ya se habían otorgado
+        """
+        awarded = PointsService.award_batch([{
+            'user_id': user_id,
+            'points': points,
+            'source_type': source_type,
+            'source_id': source_id,
+            'type': type,
+            'event_description': event_description,
+            'date': date
+        }])
+        return awarded.get(user_id)
+
+    @staticmethod
+    def award_batch(awards):
+        """
+        Otorga varios premios con un único INSERT ... ON CONFLICT DO NOTHING y un UPDATE atómico
+        por usuario afectado, más un INSERT con los logros alcanzados (no hace commit)
+
+        Args:
+            awards (list): dicts con user_id, points, source_type, source_id y opcionalmente
+                type, event_description y date
+
+        Returns:
+            dict: user_id -> nuevo current_points, solo para los usuarios que recibieron puntos
+        """
+        if not awards:
+            return {}
+
+        now = datetime.now(timezone.utc)
+        rows = [{
+            'user_id': award['user_id'],
+            'points': award['points'],
+            'source_type': award['source_type'],
+            'source_id': award['source_id'],
+            'type': award.get('type') or 'course',
+            'event_description': award.get('event_description'),
+            'date': award.get('date') or now
+        } for award in awards]
+
+        # Sentencia fija + lista de parámetros: se compila una vez y SQLAlchemy la agrupa en INSERTs multi-fila
+        statement = dialect_insert(UserPoints).on_conflict_do_nothing(
+            index_elements=[UserPoints.user_id, UserPoints.source_type, UserPoints.source_id]
+        ).returning(UserPoints.user_id, UserPoints.points)
+        inserted = db.session.execute(statement, rows).all()
+
+        deltas = defaultdict(int)
+        for user_id, points in inserted:
+            deltas[user_id] += points or 0
+
+        totals = {}
+        for user_id, delta in deltas.items():
+            PointsService.add_to_total(user_id, delta)
+            totals[user_id] = PointsService.add_to_current(user_id, delta)
+
+        achievement_service.award_crossed({
+            user_id: (current - deltas[user_id], current)
+            for user_id, current in totals.items() if current is not None
+        })
+        return totals
+
+    @staticmethod
+    def add_to_current(user_id, delta):
+        """
+        Suma puntos a users.current_points en la base de datos (sin leer-modificar-escribir en Python)
+
+        Returns:
+            int: Nuevo current_points, o None si el usuario no existe
+        """
+        if not user_id:
+            return None
+
+        return db.session.execute(
+            db.update(Users)
+            .where(Users.user_id == user_id)
+            .values(
+                current_points=db.func.coalesce(Users.current_points, 0) + delta,
+                points_updated_at=datetime.now(timezone.utc)
+            )
+            .returning(Users.current_points)
+            .execution_options(synchronize_session=False)
+        ).scalar()
+
+    @staticmethod
+    def add_to_total(user_id, delta):
+        """
+        Suma (o resta) puntos al total acumulado con un único UPSERT atómico
+
+        Args:
+            user_id (int): ID del usuario
+            delta (int): Puntos a sumar
+        """
+        if not user_id or not delta:
+            return
+
+        now = datetime.now(timezone.utc)
+        statement = dialect_insert(UserPointsTotals).values(
+            user_id=user_id,
+            total_points=delta,
+            updated_at=now
+        )
+        statement = statement.on_conflict_do_update(
+            index_elements=[UserPointsTotals.user_id],
+            set_={
+                'total_points': UserPointsTotals.total_points + statement.excluded.total_points,
+                'updated_at': now
+            }
+        )
+        db.session.execute(statement)
+
+    @staticmethod
+    def rebuild_totals():
+        """
+        Reconstruye todos los totales desde el historial de puntos (no hace commit)
+
+        Returns:
+            int: Número de usuarios con total reconstruido
+        """
+        now = datetime.now(timezone.utc)
+
+        db.session.execute(db.delete(UserPointsTotals))
+
+        aggregate = db.select(
+            UserPoints.user_id,
+            db.func.sum(UserPoints.points),
+            db.literal(now)
+        ).where(UserPoints.user_id.isnot(None)).group_by(UserPoints.user_id)
+
+        db.session.execute(
+            db.insert(UserPointsTotals).from_select(
+                ['user_id', 'total_points', 'updated_at'],
+                aggregate
+            )
+        )
+
+        return db.session.execute(
+            db.select(db.func.count()).select_from(UserPointsTotals)
+        ).scalar()
+
+
+# Instancia global del servicio
+points_service = PointsService()
@@ -0,0 +1,239 @@
+"""
+progress_service.py
+Listado filtrado del progreso de usuarios y resúmenes de avance por curso calculados en SQL,
+con caché por usuario que se descarta en cada escritura de su progreso
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from api.models import db, dialect_insert, Courses, Lessons, Modules, UserProgress
+from .serializers import progress_serializer
+
+PROGRESS_SUMMARY_TTL_SECONDS = int(os.getenv("PROGRESS_SUMMARY_TTL_SECONDS", "300"))
+PROGRESS_SUMMARY_MAX_SIZE = int(os.getenv("PROGRESS_SUMMARY_MAX_SIZE", "10000"))
+PROGRESS_BATCH_MAX_EVENTS = int(os.getenv("PROGRESS_BATCH_MAX_EVENTS", "500"))
+
+
+def _earliest(current, incoming):
+    """CASE portable (PostgreSQL y SQLite) equivalente a LEAST ignorando NULL"""
+    return db.case(
+        (current.is_(None), incoming),
+        (incoming.is_(None), current),
+        (incoming < current, incoming),
+        else_=current
+    )
+
+
+def _latest(current, incoming):
+    """CASE portable (PostgreSQL y SQLite) equivalente a GREATEST ignorando NULL"""
+    return db.case(
+        (current.is_(None), incoming),
+        (incoming.is_(None), current),
+        (incoming > current, incoming),
+        else_=current
+    )
+
+
+class ProgressService:
+    """Servicio de consultas de progreso y caché TTL + LRU de resúmenes por user_id"""
+
+    def __init__(self, ttl_seconds=PROGRESS_SUMMARY_TTL_SECONDS, max_size=PROGRESS_SUMMARY_MAX_SIZE):
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._summaries = OrderedDict()  # user_id -> (instante de carga, lista de cursos)
+        # Generación de la última invalidación de cada usuario (acotado a max_size): un resumen calculado
+        # antes de una invalidación no se guarda. Las que se descartan por tamaño suben _evicted_generation
+        self._generation = 0
+        self._invalidated = OrderedDict()  # user_id -> generación
+        self._evicted_generation = 0
+
+    @staticmethod
+    def filter_query(query, user_id=None, course_id=None, module_id=None):
+        """
+        Aplica los filtros del listado a una consulta sobre UserProgress.
+        Curso y módulo se resuelven con JOIN a Lessons/Modules (índices por lesson_id y module_id)
+        """
+        if user_id is not None:
+            query = query.where(UserProgress.user_id == user_id)
+
+        if course_id is not None or module_id is not None:
+            query = query.join(Lessons, Lessons.lesson_id == UserProgress.lesson_id)
+            if module_id is not None:
+                query = query.where(Lessons.module_id == module_id)
+            if course_id is not None:
+                query = query.join(Modules, Modules.module_id == Lessons.module_id) \
+                             .where(Modules.course_id == course_id)
+
+        return query
+
+    @staticmethod
+    def _load_summaries(user_ids):
+        """
+        Una sola consulta agregada: lecciones completadas/empezadas por usuario y curso,
+        con el total de lecciones activas del curso como subconsulta correlacionada
+
+        Returns:
+            dict: user_id -> lista de resúmenes por curso
+        """
+        total_lessons = (
+            db.select(db.func.count(Lessons.lesson_id))
+            .join(Modules, Modules.module_id == Lessons.module_id)
+            .where(Modules.course_id == Courses.course_id, Lessons.is_active == True)
+            .correlate(Courses)
+            .scalar_subquery()
+        )
+
+        rows = db.session.execute(
+            db.select(
+                UserProgress.user_id,
+                Courses.course_id,
+                Courses.title,
+                db.func.sum(db.case((UserProgress.completed == True, 1), else_=0)).label('completed_lessons'),
+                db.func.count(UserProgress.progress_id).label('started_lessons'),
+                total_lessons.label('total_lessons')
+            )
+            .join(Lessons, Lessons.lesson_id == UserProgress.lesson_id)
+            .join(Modules, Modules.module_id == Lessons.module_id)
+            .join(Courses, Courses.course_id == Modules.course_id)
+            .where(UserProgress.user_id.in_(user_ids), Lessons.is_active == True)
+            .group_by(UserProgress.user_id, Courses.course_id, Courses.title)
+            .order_by(UserProgress.user_id, Courses.course_id)
+        ).all()
+
+        summaries = {user_id: [] for user_id in user_ids}
+        for row in rows:
+            completed = row.completed_lessons or 0
+            total = row.total_lessons or 0
+            summaries[row.user_id].append({
+                'course_id': row.course_id,
+                'course_title': row.title,
+                'completed_lessons': completed,
+                'started_lessons': row.started_lessons,
+                'total_lessons': total,
+                'completion_percent': round(completed * 100 / total, 1) if total else 0.0
+            })
+        return summaries
+
+    @staticmethod
+    def merge_events(events):
+        """
+        Junta los eventos repetidos de un mismo (user_id, lesson_id): un INSERT ... ON CONFLICT
+        no puede actualizar la misma fila dos veces
+
+        Args:
+            events (list): dicts con user_id, lesson_id, completed, start_date, completion_date
+
+        Returns:
+            list: Un evento por (user_id, lesson_id), en el orden de su primera aparición
+        """
+        merged = {}
+        for event in events:
+            key = (event['user_id'], event['lesson_id'])
+            current = merged.get(key)
+            if current is None:
+                merged[key] = dict(event)
+                continue
+
+            current['completed'] = current['completed'] or event['completed']
+            for field, pick in (('start_date', min), ('completion_date', max)):
+                values = [value for value in (current[field], event[field]) if value is not None]
+                current[field] = pick(values) if values else None
+
+        return list(merged.values())
+
+    @staticmethod
+    def upsert_many(events):
+        """
+        Aplica los eventos con un único INSERT ... ON CONFLICT (user_id, lesson_id) DO UPDATE (no hace commit).
+        Una lección completada no vuelve a 'no completada'; se conserva el start_date más antiguo
+        y el completion_date más reciente
+
+        Args:
+            events (list): Eventos ya combinados con merge_events
+
+        Returns:
+            dict: (user_id, lesson_id) -> fila resultante (columnas de progress_serializer)
+        """
+        if not events:
+            return {}
+
+        statement = dialect_insert(UserProgress)
+        excluded = statement.excluded
+        statement = statement.on_conflict_do_update(
+            index_elements=[UserProgress.user_id, UserProgress.lesson_id],
+            set_={
+                'completed': db.or_(UserProgress.completed, excluded.completed),
+                'start_date': _earliest(UserProgress.start_date, excluded.start_date),
+                'completion_date': _latest(UserProgress.completion_date, excluded.completion_date)
+            }
+        ).returning(*progress_serializer.columns)
+
+        # render_nulls: con completion_date a NULL en unas filas y no en otras, el bulk INSERT del ORM
+        # partiría la lista en grupos con columnas distintas (una sentencia por grupo)
+        rows = db.session.execute(statement, events, execution_options={'render_nulls': True}).all()
+        return {(row.user_id, row.lesson_id): row for row in rows}
+
+    def summaries(self, user_ids, course_id=None):
+        """
+        Resumen de avance por curso de uno o varios usuarios. Los que no están en caché
+        se calculan juntos en una sola consulta
+
+        Returns:
+            dict: user_id -> lista de resúmenes por curso (filtrada por course_id si se indica)
+        """
+        now = time.monotonic()
+        result = {}
+        missing = []
+
+        with self._lock:
+            started = self._generation
+            for user_id in user_ids:
+                cached = self._summaries.get(user_id)
+                if cached and now - cached[0] <= self.ttl_seconds:
+                    self._summaries.move_to_end(user_id)
+                    result[user_id] = cached[1]
+                else:
+                    missing.append(user_id)
+
+        if missing:
+            loaded = self._load_summaries(missing)
+            with self._lock:
+                for user_id, courses in loaded.items():
+                    # Invalidado mientras se calculaba: el resumen puede ser anterior a la escritura
+                    if self._invalidated.get(user_id, self._evicted_generation) > started:
+                        continue
+                    self._summaries[user_id] = (now, courses)
+                    self._summaries.move_to_end(user_id)
+                while len(self._summaries) > self.max_size:
+                    self._summaries.popitem(last=False)
+            result.update(loaded)
+
+        if course_id is not None:
+            result = {user_id: [course for course in courses if course['course_id'] == course_id]
+                      for user_id, courses in result.items()}
+        return result
+
+    def invalidate(self, user_id):
+        """Descarta el resumen de un usuario tras escribir su progreso"""
+        with self._lock:
+            self._summaries.pop(user_id, None)
+            self._generation += 1
+            self._invalidated[user_id] = self._generation
+            self._invalidated.move_to_end(user_id)
+            while len(self._invalidated) > self.max_size:
+                _, generation = self._invalidated.popitem(last=False)
+                self._evicted_generation = max(self._evicted_generation, generation)
+
+    def clear(self):
+        with self._lock:
+            self._summaries.clear()
+            self._generation += 1
+            self._invalidated.clear()
+            self._evicted_generation = self._generation
+
+
+# Instancia global del servicio
+progress_service = ProgressService()
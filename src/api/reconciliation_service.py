@@ -0,0 +1,129 @@
+"""
+reconciliation_service.py
+Conciliación con Stripe de las compras que se quedaron en 'pending' (p. ej. por un webhook perdido)
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+from api.models import db, Courses, Purchases
+from .points_service import points_service, SOURCE_PURCHASE
+from .stripe_service import stripe_service
+
+# Estado del PaymentIntent en Stripe -> estado de la compra
+PAYMENT_INTENT_TRANSITIONS = {
+    'succeeded': 'paid',
+    'canceled': 'cancelled',
+}
+
+
+class PurchaseReconciler:
+    """
+    Recorre las compras pendientes por páginas (keyset sobre purchase_id), consulta sus PaymentIntents
+    en paralelo y aplica los cambios con un UPDATE por estado y un commit por lote
+    """
+
+    def __init__(self, batch_size=500, workers=8, older_than_minutes=30):
+        self.batch_size = batch_size
+        self.workers = workers
+        # Las compras recientes pueden estar aún en el formulario de pago
+        self.cutoff = datetime.now(timezone.utc) - timedelta(minutes=older_than_minutes)
+
+    def _next_page(self, after_id):
+        return db.session.execute(
+            db.select(Purchases.purchase_id, Purchases.stripe_payment_intent_id, Purchases.user_id,
+                      Courses.points, Courses.title)
+            .outerjoin(Courses, Courses.course_id == Purchases.course_id)
+            .where(
+                Purchases.status == 'pending',
+                Purchases.purchase_id > after_id,
+                Purchases.purchase_date <= self.cutoff
+            )
+            .order_by(Purchases.purchase_id)
+            .limit(self.batch_size)
+        ).all()
+
+    @staticmethod
+    def _retrieve_status(payment_intent_id):
+        result = stripe_service.retrieve_payment_intent(payment_intent_id)
+        return result['status'] if result['success'] else None
+
+    @staticmethod
+    def _transition(purchase_ids, status, now):
+        """UPDATE de todo el grupo; solo cambia las que siguen pendientes (el webhook pudo adelantarse)"""
+        if not purchase_ids:
+            return set()
+
+        values = {'status': status}
+        if status == 'paid':
+            values['start_date'] = now
+
+        return set(db.session.execute(
+            db.update(Purchases)
+            .where(Purchases.purchase_id.in_(purchase_ids), Purchases.status == 'pending')
+            .values(**values)
+            .returning(Purchases.purchase_id)
+            .execution_options(synchronize_session=False)
+        ).scalars().all())
+
+    def _reconcile_page(self, rows, executor, stats):
+        with_intent = [row for row in rows if row.stripe_payment_intent_id]
+        # Sin PaymentIntent pasado el margen: la creación en Stripe nunca terminó
+        targets = {'paid': [], 'cancelled': [row.purchase_id for row in rows if not row.stripe_payment_intent_id]}
+
+        # La conexión vuelve al pool mientras se consulta a Stripe
+        db.session.commit()
+        statuses = executor.map(self._retrieve_status, [row.stripe_payment_intent_id for row in with_intent])
+
+        for row, status in zip(with_intent, statuses):
+            if status is None:
+                stats['errors'] += 1
+                continue
+            target = PAYMENT_INTENT_TRANSITIONS.get(status)
+            if target:
+                targets[target].append(row.purchase_id)
+
+        now = datetime.now(timezone.utc)
+        paid = self._transition(targets['paid'], 'paid', now)
+        cancelled = self._transition(targets['cancelled'], 'cancelled', now)
+
+        awards = [{
+            'user_id': row.user_id,
+            'points': row.points,
+            'source_type': SOURCE_PURCHASE,
+            'source_id': row.purchase_id,
+            'type': 'course',
+            'event_description': f"Compra {row.purchase_id} del curso: {row.title}"
+        } for row in rows if row.purchase_id in paid and row.points and row.points > 0]
+        awarded = points_service.award_batch(awards)
+
+        db.session.commit()
+
+        stats['scanned'] += len(rows)
+        stats['paid'] += len(paid)
+        stats['cancelled'] += len(cancelled)
+        stats['awarded_users'] += len(awarded)
+
+    def run(self, echo=print):
+        """
+        Returns:
+            dict: Totales (revisadas, pagadas, canceladas, usuarios con puntos, errores de Stripe)
+        """
+        stats = {'scanned': 0, 'paid': 0, 'cancelled': 0, 'awarded_users': 0, 'errors': 0}
+        started = time.perf_counter()
+        after_id = 0
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            while True:
+                rows = self._next_page(after_id)
+                if not rows:
+                    break
+
+                after_id = rows[-1].purchase_id
+                self._reconcile_page(rows, executor, stats)
+                echo(f"  hasta purchase_id {after_id}: {stats['scanned']} revisadas, {stats['paid']} pagadas, "
+                     f"{stats['cancelled']} canceladas, {stats['errors']} errores")
+
+        db.session.commit()
+        stats['seconds'] = round(time.perf_counter() - started, 2)
+        return stats
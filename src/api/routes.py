@@ -1,23 +1,37 @@
 """
 This module takes care of starting the API Server, Loading the DB and Adding the endpoints
 """
+import base64
+import binascii
+import json
 import uuid
 from datetime import datetime, timezone, timedelta
 
-from sqlalchemy import func
-from werkzeug.security import (check_password_hash,generate_password_hash)
+from sqlalchemy import func, and_, or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import selectinload
 
 from flask import Blueprint, request, current_app
 from flask_cors import CORS
 from flask_jwt_extended import (create_access_token,get_jwt_identity,jwt_required,get_jwt)
 
-from api.models import (db,Users,Courses,Modules,Lessons,MultimediaResources,Purchases,Achievements,UserPoints,UserProgress,UserAchievements)
+from api.models import (db,Users,Courses,Modules,Lessons,MultimediaResources,Purchases,Achievements,UserPoints,UserPointsTotals,UserProgress,UserAchievements,MediaJobs,UploadSessions)
 
 
 from .cloudinary_service import cloudinary_service 
-import cloudinary.uploader
 
 from .stripe_service import stripe_service
+from .leaderboard_service import leaderboard
+from .points_service import points_service, SOURCE_PURCHASE, SYSTEM_SOURCE_TYPES
+from .stripe_webhook_service import stripe_webhook_service
+from .media_job_service import media_job_service
+from .chunked_upload_service import chunked_upload_service
+from .user_cache_service import user_cache
+from .catalog_cache_service import catalog_cache
+from .progress_service import progress_service, PROGRESS_BATCH_MAX_EVENTS
+from .achievement_service import achievement_service
+from .password_service import password_service, PasswordHashBusy
+from .serializers import user_serializer, student_serializer, purchase_serializer, multimedia_serializer, progress_serializer
 
 api = Blueprint('api', __name__)
 CORS(api)
@@ -35,6 +49,17 @@ def validate_active_user():
         }
         return None, response_body, 401
     
+    # HELPER: user_cache.get - Estado actual del usuario (los claims del token pueden estar desactualizados)
+    record = user_cache.get(user.get('user_id'))
+    
+    if record:
+        user['is_active'] = record['is_active']
+        user['role'] = record['role']
+        user['is_admin'] = record['is_admin']
+        user['trial_end_date'] = record['trial_end_date']
+    else:
+        user['is_active'] = False
+    
     if not user.get('is_active', False):
         response_body = {
             'message': 'Usuario no autorizado',
@@ -273,101 +298,138 @@ def _handle_json_create(request, user_id, user):
         'results': row.serialize()
     }, 201
 
-# Crea lección con archivos multimedia
-def _handle_multipart_upload(request, user_id, user):
+# Crea (o actualiza) una lección y encola la subida de sus archivos multimedia
+def _handle_multipart_upload(request, user_id, user, lesson=None):
     title = request.form.get("title")
     content = request.form.get("content")
     module_id = request.form.get("module_id", type=int)
     order = request.form.get("order", type=int)
     trial_visible = request.form.get("trial_visible", "false").lower() == "true"
+    is_new = lesson is None
+
+    if is_new:
+        if not all([title, content, module_id, order]):
+            return {
+                "message": "Faltan campos obligatorios",
+                "results": {}
+            }, 400
+
+        module = db.session.get(Modules, module_id)
+
+        if not module:
+            return {
+                "message": "El módulo especificado no existe",
+                "results": {}
+            }, 400
+
+    # HELPER: media_job_service.spool_files - Guardar archivos en disco para el worker
+    spooled = media_job_service.spool_files(
+        request.files.getlist("files"),
+        request.form.getlist("descriptions")
+    )
+
+    try:
+        if lesson is None:
+            lesson = Lessons(
+                title=title,
+                content=content,
+                module_id=module_id,
+                order=order,
+                trial_visible=trial_visible
+            )
+            db.session.add(lesson)
+        else:
+            if title:
+                lesson.title = title.strip()
+            if content:
+                lesson.content = content.strip()
+            if order is not None:
+                lesson.order = order
+            if "trial_visible" in request.form:
+                lesson.trial_visible = trial_visible
 
-    if not all([title, content, module_id, order]):
+        db.session.flush()
+
+        # Sin archivos admitidos no hay nada que encolar
+        job = media_job_service.enqueue(lesson.lesson_id, user_id, spooled) if spooled else None
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        media_job_service.discard_spooled(spooled)
         return {
-            "message": "Faltan campos obligatorios",
+            "message": f"Error guardando la lección: {str(e)}",
             "results": {}
         }, 400
 
-    lesson = Lessons(
-        title=title,
-        content=content,
-        module_id=module_id,
-        order=order,
-        trial_visible=trial_visible
-    )
-
-    db.session.add(lesson)
-    db.session.flush()
-
-    module = db.session.get(Modules, module_id)
-    course_id = module.course_id
-
-    files = request.files.getlist("files")
-    descriptions = request.form.getlist("descriptions")
+    if job is None:
+        return {
+            "message": "Lección guardada sin multimedia",
+            "results": {
+                "lesson": lesson.serialize(),
+                "job": None
+            }
+        }, 201 if is_new else 200
 
-    multimedia_list = []
+    return {
+        "message": "Lección guardada, multimedia en proceso",
+        "results": {
+            "lesson": lesson.serialize(),
+            "job": job.serialize(),
+            "status_url": f"/api/media-jobs/{job.job_id}"
+        }
+    }, 202
 
-    for index, file in enumerate(files, start=1):
-        filename = file.filename.lower()
+# Carga el árbol completo de un curso (módulos → lecciones → multimedia) con una consulta por nivel
+def load_course_outline(course_id):
+    course = db.session.execute(
+        db.select(Courses)
+        .where(Courses.course_id == course_id)
+        .options(
+            selectinload(Courses.modules_to)
+            .selectinload(Modules.lessons_list)
+            .selectinload(Lessons.multimedia_resources)
+        )
+    ).scalar()
 
-        if filename.endswith((".jpg", ".jpeg", ".png")):
-            media_type = "image"
-            cloudinary_type = "image"
-            folder_type = "images"
+    if not course:
+        return None
 
-        elif filename.endswith(".gif"):
-            media_type = "gif"
-            cloudinary_type = "video"
-            folder_type = "gifs"
+    outline = course.serialize()
+    outline['modules'] = []
 
-        elif filename.endswith((".mp4", ".mov", ".avi")):
-            media_type = "video"
-            cloudinary_type = "video"
-            folder_type = "videos"
+    for module in sorted(course.modules_to, key=lambda m: (m.order, m.module_id)):
+        module_data = module.serialize()
+        module_data['lessons'] = []
 
-        elif filename.endswith((".pdf", ".docx", ".xlsx")):
-            media_type = "document"
-            cloudinary_type = "raw"
-            folder_type = "documents"
+        for lesson in sorted(module.lessons_list, key=lambda l: (l.order, l.lesson_id)):
+            lesson_data = lesson.serialize()
+            lesson_data['multimedia_resources'] = [
+                m.serialize()
+                for m in sorted(lesson.multimedia_resources, key=lambda m: (m.order, m.resource_id))
+            ]
+            module_data['lessons'].append(lesson_data)
 
-        else:
-            continue
+        outline['modules'].append(module_data)
 
-        folder = (
-            f"courses/course_{course_id}/"
-            f"module_{module_id}/"
-            f"lesson_{lesson.lesson_id}/"
-            f"{folder_type}"
-        )
+    return outline
 
-        result = cloudinary.uploader.upload(
-            file,
-            resource_type=cloudinary_type,
-            folder=folder,
-            public_id=f"resource_{index}",
-            overwrite=True
-        )
+# Carga la multimedia de varias lecciones con un solo SELECT ... IN (...) agrupada por lesson_id
+def load_multimedia_by_lesson(lesson_ids):
+    multimedia_by_lesson = {}
 
-        media = MultimediaResources(
-            lesson_id=lesson.lesson_id,
-            type=media_type,
-            url=result["secure_url"],
-            duration_seconds=result.get("duration"),
-            description=descriptions[index - 1] if index - 1 < len(descriptions) else None,
-            order=index
-        )
+    if not lesson_ids:
+        return multimedia_by_lesson
 
-        db.session.add(media)
-        multimedia_list.append(media)
+    rows = db.session.execute(
+        db.select(MultimediaResources)
+        .where(MultimediaResources.lesson_id.in_(lesson_ids))
+        .order_by(MultimediaResources.lesson_id, MultimediaResources.order)
+    ).scalars()
 
-    db.session.commit()
+    for resource in rows:
+        multimedia_by_lesson.setdefault(resource.lesson_id, []).append(resource)
 
-    return {
-        "message": "Lección creada con multimedia",
-        "results": {
-            "lesson": lesson.serialize(),
-            "multimedia": [m.serialize() for m in multimedia_list]
-        }
-    }, 201
+    return multimedia_by_lesson
 
 """ --- HELPERS PARA PAGINACIÓN Y RESPUESTAS --- """
 
@@ -411,6 +473,125 @@ def build_pagination_response(results, total_count, page, per_page, message=""):
     
     return response_body, 200
 
+# Codifica los valores de la clave de orden de la última fila en un cursor opaco
+def encode_cursor(values):
+    encoded_values = []
+    for value in values:
+        if isinstance(value, datetime):
+            encoded_values.append({'dt': value.isoformat()})
+        else:
+            encoded_values.append(value)
+
+    raw = json.dumps(encoded_values, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+# Decodifica un cursor generado por encode_cursor (ValueError si es inválido)
+def decode_cursor(cursor):
+    try:
+        padding = '=' * (-len(cursor) % 4)
+        encoded_values = json.loads(base64.urlsafe_b64decode(cursor + padding))
+    except (binascii.Error, UnicodeDecodeError, json.JSONDecodeError):
+        raise ValueError('Cursor inválido')
+
+    if not isinstance(encoded_values, list) or not encoded_values:
+        raise ValueError('Cursor inválido')
+
+    # Solo los tipos que genera encode_cursor: enteros, cadenas y fechas etiquetadas {'dt': iso}
+    values = []
+    for value in encoded_values:
+        if isinstance(value, dict) and list(value) == ['dt'] and isinstance(value['dt'], str):
+            try:
+                values.append(datetime.fromisoformat(value['dt']))
+            except ValueError:
+                raise ValueError('Cursor inválido')
+        elif isinstance(value, (int, str)) and not isinstance(value, bool):
+            values.append(value)
+        else:
+            raise ValueError('Cursor inválido')
+    return values
+
+# Toma los parámetros de paginación por cursor del URL como ?cursor=&per_page=20&include_total=false
+def build_cursor_params(request):
+    if 'cursor' not in request.args:
+        return None, None, 200
+
+    per_page = request.args.get('per_page', default=20, type=int)
+
+    if per_page < 1:
+        per_page = 20
+    elif per_page > 100:
+        per_page = 100
+
+    cursor = request.args.get('cursor', '').strip()
+    after = None
+
+    if cursor:
+        try:
+            after = decode_cursor(cursor)
+        except ValueError as e:
+            response_body = {
+                'message': str(e),
+                'results': {}
+            }
+            return None, response_body, 400
+
+    include_total = request.args.get('include_total', 'true').lower() not in ['false', '0', 'no']
+
+    return {
+        'per_page': per_page,
+        'after': after,
+        'include_total': include_total
+    }, None, 200
+
+# Avanza (seek) sobre la clave de orden en vez de usar OFFSET: (k1, k2) > (v1, v2)
+def paginate_by_cursor(query, order_columns, cursor_params, descending=False, as_rows=False):
+    after = cursor_params['after']
+    per_page = cursor_params['per_page']
+
+    if after is not None:
+        if len(after) != len(order_columns):
+            raise ValueError('Cursor inválido')
+        # Cada valor debe ser del tipo de su columna (un '1' contra un entero falla en PostgreSQL)
+        if any(not isinstance(value, column.type.python_type) for value, column in zip(after, order_columns)):
+            raise ValueError('Cursor inválido')
+
+        conditions = []
+        for index, column in enumerate(order_columns):
+            equal_prefix = [order_columns[i] == after[i] for i in range(index)]
+            beyond = column < after[index] if descending else column > after[index]
+            conditions.append(and_(*equal_prefix, beyond))
+        query = query.where(or_(*conditions))
+
+    ordering = [column.desc() if descending else column for column in order_columns]
+
+    result = db.session.execute(query.order_by(*ordering).limit(per_page + 1))
+    # as_rows: la consulta proyecta columnas (serializers) en lugar de modelos completos
+    rows = result.all() if as_rows else result.scalars().all()
+
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        last_row = rows[-1]
+        next_cursor = encode_cursor([getattr(last_row, column.key) for column in order_columns])
+
+    return rows, next_cursor
+
+# Crea la respuesta con paginación por cursor lista para enviar al cliente
+def build_cursor_response(results, next_cursor, per_page, total_count=None, message=""):
+    response_body = {
+        'results': results,
+        'message': message if message else f'Listado ({len(results)} items)',
+        'count': len(results),
+        'pagination': {
+            'per_page': per_page,
+            'next_cursor': next_cursor,
+            'has_more': next_cursor is not None,
+            'total': total_count
+        }
+    }
+
+    return response_body, 200
+
 # Respuesta para métodos no permitidos
 def method_not_allowed_response():
     response_body = {
@@ -427,6 +608,14 @@ def simple_success_response(data, message=""):
     }
     return response_body, 200
 
+# Respuesta cuando la cola de hashing de contraseñas está llena
+def password_busy_response():
+    response_body = {
+        'message': 'Servidor ocupado, inténtalo de nuevo en unos segundos',
+        'results': {}
+    }
+    return response_body, 503, {'Retry-After': '1'}
+
 # Respuesta cuando hay un error
 def simple_error_response(message, status_code=400):
     response_body = {
@@ -435,6 +624,13 @@ def simple_error_response(message, status_code=400):
     }
     return response_body, status_code
 
+# Propaga un cambio de puntos ya confirmado a la caché de usuarios y al ranking en memoria
+def refresh_user_points(user_id):
+    user_cache.invalidate(user_id)
+    user_obj = db.session.get(Users, user_id, populate_existing=True)
+    if user_obj:
+        leaderboard.update_user(user_obj)
+
 """ --- RUTAS --- """
 
 # POST: Login de usuario
@@ -455,14 +651,39 @@ def login():
             'results': {}
         }, 400
     
-    row = db.session.execute(db.select(Users).where(Users.email == email,Users.is_active == True)).scalar()
+    row = db.session.execute(
+        db.select(Users.user_id, Users.password_hash, Users.is_active, Users.role, Users.is_admin, Users.trial_end_date)
+        .where(Users.email == email, Users.is_active == True)
+    ).first()
+    # Liberar la conexión antes de calcular el hash: scrypt no debe ocupar el pool de la base de datos
+    db.session.commit()
     
-    if not row or not check_password_hash(row.password_hash, password):
+    valid = False
+    if row:
+        try:
+            # HELPER: password_service.verify_and_update - Verificar fuera del hilo y rehacer el hash si cambió el método
+            valid, new_hash = password_service.verify_and_update(row.password_hash, password)
+        except PasswordHashBusy:
+            # HELPER: password_busy_response - Cola de hashing llena
+            return password_busy_response()
+    
+    if not valid:
         return {
             'message': "Correo o contraseña incorrectos, o usuario inactivo",
             'results': {}
         }, 401
     
+    if new_hash:
+        # Solo si nadie cambió la contraseña mientras se verificaba
+        db.session.execute(
+            db.update(Users)
+            .where(Users.user_id == row.user_id, Users.password_hash == row.password_hash)
+            .values(password_hash=new_hash)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        user_cache.invalidate(row.user_id)
+    
     user_data = {
         'user_id': row.user_id,
         'is_active': row.is_active,
@@ -568,7 +789,12 @@ def register():
     now = datetime.now(timezone.utc)
     trial_end_date = now + timedelta(days=7)
     
-    password_hash = generate_password_hash(password)
+    try:
+        # HELPER: password_service.hash_password - Generar el hash en el pool de hashing
+        password_hash = password_service.hash_password(password)
+    except PasswordHashBusy:
+        # HELPER: password_busy_response - Cola de hashing llena
+        return password_busy_response()
     
     row = Users(
         email=email,
@@ -588,6 +814,8 @@ def register():
     db.session.add(row)
     db.session.commit() 
     
+    leaderboard.update_user(row)
+    
     return {
         'message': 'Usuario demo creado exitosamente. Trial de 7 días activado.',
         'results': {
@@ -624,15 +852,45 @@ def get_users():
     is_admin = user.get('is_admin', False)
     teacher_id = user.get('user_id')
     
+    # HELPER: build_cursor_params - Paginación por cursor opcional (?cursor=)
+    cursor_params, error_response, status = build_cursor_params(request)
+    if error_response:
+        return error_response, status
+    
     # HELPER: build_pagination_params - Obtener parámetros de paginación
     page, per_page, offset = build_pagination_params(request)
     
+    if is_admin and cursor_params:
+        total_query = None
+        if cursor_params['include_total']:
+            total_query = db.session.execute(db.select(db.func.count()).select_from(Users)).scalar()
+        
+        try:
+            rows, next_cursor = paginate_by_cursor(
+                user_serializer.select(), [Users.user_id], cursor_params, as_rows=True
+            )
+        except ValueError as e:
+            # HELPER: simple_error_response - Cursor inválido
+            return simple_error_response(str(e), 400)
+        
+        # HELPER: build_cursor_response - Enviar respuesta paginada por cursor
+        return build_cursor_response(
+            results=user_serializer.many(rows),
+            next_cursor=next_cursor,
+            per_page=cursor_params['per_page'],
+            total_count=total_query,
+            message='Listado completo de usuarios (vista admin)'
+        )
+    
     if is_admin:
         total_query = db.session.execute(db.select(db.func.count()).select_from(Users)).scalar()
         
-        rows = db.session.execute(db.select(Users).order_by(Users.user_id).limit(per_page).offset(offset)).scalars()
+        # HELPER: user_serializer - Solo las columnas necesarias, sin instanciar modelos
+        rows = db.session.execute(
+            user_serializer.select().order_by(Users.user_id).limit(per_page).offset(offset)
+        ).all()
         
-        results = [row.serialize() for row in rows]
+        results = user_serializer.many(rows)
         
         # HELPER: build_pagination_response - Enviar respuesta paginada
         return build_pagination_response(
@@ -645,7 +903,7 @@ def get_users():
     
     elif user_role == 'teacher':
         students_query = db.session.execute(
-            db.select(Users)
+            student_serializer.select()
             .join(Purchases, Users.user_id == Purchases.user_id)
             .join(Courses, Purchases.course_id == Courses.course_id)
             .where(Courses.created_by == teacher_id, Users.role == 'student')
@@ -653,7 +911,7 @@ def get_users():
             .order_by(Users.user_id)
             .limit(per_page)
             .offset(offset)
-        ).scalars()
+        ).all()
         
         total_count_query = db.session.execute(
             db.select(db.func.count()).select_from(Users)
@@ -663,18 +921,7 @@ def get_users():
             .distinct()
         ).scalar()
         
-        students = list(students_query)
-        
-        results = []
-        for student in students:
-            results.append({
-                'user_id': student.user_id,
-                'first_name': student.first_name,
-                'last_name': student.last_name,
-                'email': student.email,
-                'current_points': student.current_points,
-                'role': student.role,
-            })
+        results = student_serializer.many(students_query)
         
         # HELPER: simple_success_response - Enviar respuesta simple
         return simple_success_response(
@@ -800,15 +1047,18 @@ def user(user_id):
         if 'email' in data:
             target_user.email = data['email'].strip().lower()
         
+        points_change = None
         if is_admin:
             if 'role' in data:
                 target_user.role = data['role']
             if 'current_points' in data:
                 points = data['current_points']
-                if not isinstance(points, int) or points < 0:
+                if not isinstance(points, int) or isinstance(points, bool) or points < 0:
                     # HELPER: simple_error_response - Puntos inválidos
                     return simple_error_response('Los puntos deben ser un número entero no negativo', 400)
+                points_change = (target_user.current_points, points)
                 target_user.current_points = points
+                target_user.points_updated_at = datetime.now(timezone.utc)
             if 'is_active' in data:
                 target_user.is_active = bool(data['is_active'])
             if 'is_admin' in data:
@@ -821,8 +1071,17 @@ def user(user_id):
                     # HELPER: simple_error_response - Fecha inválida
                     return simple_error_response('Formato de fecha inválido para trial_end_date', 400)
         
+        if points_change:
+            # Con toda la edición ya validada y escrita: los logros salen de los puntos guardados
+            db.session.flush()
+            # HELPER: achievement_service.award_crossed - Logros alcanzados con el ajuste manual
+            achievement_service.award_crossed({target_user.user_id: points_change})
+        
         db.session.commit()
         
+        user_cache.invalidate(user_id)
+        leaderboard.update_user(target_user)
+        
         if is_admin:
             response_data = target_user.serialize()
         else:
@@ -853,12 +1112,23 @@ def user(user_id):
         db.session.delete(target_user)
         db.session.commit()
         
+        user_cache.invalidate(user_id)
+        leaderboard.remove_user(user_id)
+        
         # HELPER: simple_success_response - Usuario eliminado
         return simple_success_response({}, f'Usuario {user_id} eliminado')
     
     # HELPER: method_not_allowed_response - Método no permitido
     return method_not_allowed_response()
 
+# Lee email y password_hash actuales del usuario; libera la conexión antes de calcular el hash
+def load_password_hash(user_id):
+    row = db.session.execute(
+        db.select(Users.email, Users.password_hash).where(Users.user_id == user_id)
+    ).first()
+    db.session.commit()
+    return row
+
 # POST: Cambiar contraseña de usuario
 @api.route('/change-password', methods=['POST'])
 @jwt_required()
@@ -875,7 +1145,8 @@ def change_password():
     if error_response:
         return error_response, status
     
-    db_user = db.session.execute(db.select(Users).where(Users.user_id == user_id)).scalar()
+    # HELPER: load_password_hash - Hash actual desde la base de datos (nunca desde la caché)
+    db_user = load_password_hash(user_id)
     
     if not db_user:
         # HELPER: simple_error_response - Usuario no encontrado
@@ -884,7 +1155,14 @@ def change_password():
     current_password = data.get('current_password', '')
     new_password = data.get('new_password', '')
     
-    if not check_password_hash(db_user.password_hash, current_password):
+    try:
+        # HELPER: password_service.verify_password - Verificar en el pool de hashing
+        valid = password_service.verify_password(db_user.password_hash, current_password)
+    except PasswordHashBusy:
+        # HELPER: password_busy_response - Cola de hashing llena
+        return password_busy_response()
+    
+    if not valid:
         # HELPER: simple_error_response - Contraseña incorrecta
         return simple_error_response('Contraseña actual incorrecta', 401)
     
@@ -896,13 +1174,32 @@ def change_password():
         # HELPER: simple_error_response - Contraseña muy corta
         return simple_error_response('La nueva contraseña debe tener al menos 8 caracteres', 400)
     
-    if check_password_hash(db_user.password_hash, new_password):
+    # La actual ya se verificó contra el hash: basta compararlas sin volver a calcularlo
+    if new_password == current_password:
         # HELPER: simple_error_response - Contraseña igual a la actual
         return simple_error_response('La nueva contraseña no puede ser igual a la actual', 400)
     
-    db_user.password_hash = generate_password_hash(new_password)
+    try:
+        # HELPER: password_service.hash_password - Generar el hash en el pool de hashing
+        new_hash = password_service.hash_password(new_password)
+    except PasswordHashBusy:
+        # HELPER: password_busy_response - Cola de hashing llena
+        return password_busy_response()
+    
+    # Solo si el hash no cambió mientras se verificaba (otro cambio de contraseña simultáneo)
+    updated = db.session.execute(
+        db.update(Users)
+        .where(Users.user_id == user_id, Users.password_hash == db_user.password_hash)
+        .values(password_hash=new_hash)
+    ).rowcount
     db.session.commit()
     
+    if not updated:
+        # HELPER: simple_error_response - La contraseña cambió durante la verificación
+        return simple_error_response('Contraseña actual incorrecta', 401)
+    
+    user_cache.invalidate(user_id)
+    
     # HELPER: simple_success_response - Contraseña actualizada
     return simple_success_response(
         {
@@ -928,7 +1225,8 @@ def delete_my_account():
     if error_response:
         return error_response, status
     
-    db_user = db.session.execute(db.select(Users).where(Users.user_id == user_id)).scalar()
+    # HELPER: load_password_hash - Hash actual desde la base de datos (nunca desde la caché)
+    db_user = load_password_hash(user_id)
     
     if not db_user:
         # HELPER: simple_error_response - Usuario no encontrado
@@ -937,7 +1235,14 @@ def delete_my_account():
     password = data.get('password', '')
     confirmation = data.get('confirmation', '').strip().lower()
     
-    if not check_password_hash(db_user.password_hash, password):
+    try:
+        # HELPER: password_service.verify_password - Verificar en el pool de hashing
+        valid = password_service.verify_password(db_user.password_hash, password)
+    except PasswordHashBusy:
+        # HELPER: password_busy_response - Cola de hashing llena
+        return password_busy_response()
+    
+    if not valid:
         # HELPER: simple_error_response - Contraseña incorrecta
         return simple_error_response('Contraseña incorrecta', 401)
     
@@ -945,20 +1250,33 @@ def delete_my_account():
         # HELPER: simple_error_response - Confirmación incorrecta
         return simple_error_response('Debes escribir "eliminar mi cuenta" para confirmar', 400)
     
-    db_user.is_active = False
-    db_user.original_email = db_user.email
     deletion_uuid = uuid.uuid4().hex[:8]
     new_email = f"deleted_{deletion_uuid}_{user_id}@deleted.local"
     
     if len(new_email) > 100:
         new_email = f"deleted_{deletion_uuid}@deleted.local"
     
-    db_user.email = new_email
-    db_user.deletion_uuid = deletion_uuid
-    db_user.deleted_at = datetime.now(timezone.utc)
-    
+    # Solo si el hash verificado sigue siendo el actual (la contraseña pudo cambiar mientras tanto)
+    updated = db.session.execute(
+        db.update(Users)
+        .where(Users.user_id == user_id, Users.password_hash == db_user.password_hash)
+        .values(
+            is_active=False,
+            original_email=db_user.email,
+            email=new_email,
+            deletion_uuid=deletion_uuid,
+            deleted_at=datetime.now(timezone.utc)
+        )
+    ).rowcount
     db.session.commit()
     
+    if not updated:
+        # HELPER: simple_error_response - La contraseña cambió durante la verificación
+        return simple_error_response('Contraseña incorrecta', 401)
+    
+    user_cache.invalidate(user_id)
+    leaderboard.remove_user(user_id)
+    
     # HELPER: simple_success_response - Cuenta eliminada
     return simple_success_response(
         {
@@ -973,6 +1291,7 @@ def delete_my_account():
 
 # GET: Listar cursos públicos (sin autenticación)
 @api.route('/courses-public', methods=['GET'])
+@catalog_cache.cached
 def courses_public():
     
     # HELPER: method_not_allowed_response - Verificar método
@@ -1012,6 +1331,7 @@ def courses_public():
 # GET/POST: Operaciones CRUD de cursos (privado, requiere autenticación)
 @api.route('/courses-private', methods=['GET', 'POST'])
 @jwt_required()
+@catalog_cache.invalidates
 def courses_private():
     # HELPER: validate_user_role - Verificar usuario autenticado
     user, response_body_validation, status = validate_user_role()
@@ -1023,6 +1343,31 @@ def courses_private():
     user_id = user.get('user_id')
     
     if request.method == 'GET':
+        # HELPER: build_cursor_params - Paginación por cursor opcional (?cursor=)
+        cursor_params, error_response, status = build_cursor_params(request)
+        if error_response:
+            return error_response, status
+        
+        if cursor_params:
+            total_query = None
+            if cursor_params['include_total']:
+                total_query = db.session.execute(db.select(db.func.count()).select_from(Courses)).scalar()
+            
+            try:
+                rows, next_cursor = paginate_by_cursor(db.select(Courses), [Courses.course_id], cursor_params)
+            except ValueError as e:
+                # HELPER: simple_error_response - Cursor inválido
+                return simple_error_response(str(e), 400)
+            
+            # HELPER: build_cursor_response - Enviar respuesta paginada por cursor
+            return build_cursor_response(
+                results=[row.serialize() for row in rows],
+                next_cursor=next_cursor,
+                per_page=cursor_params['per_page'],
+                total_count=total_query,
+                message='Listado de cursos (privado)'
+            )
+        
         # HELPER: build_pagination_params - Obtener parámetros de paginación
         page, per_page, offset = build_pagination_params(request)
         
@@ -1071,8 +1416,11 @@ def courses_private():
         db.session.add(row)
         db.session.commit()
 
-        # HELPER: simple_success_response - Curso creado
-        return simple_success_response(row.serialize(), 'Curso creado exitosamente'), 201
+        # Curso creado
+        return {
+            'message': 'Curso creado exitosamente',
+            'results': row.serialize()
+        }, 201
     
     # HELPER: method_not_allowed_response - Método no permitido
     return method_not_allowed_response()
@@ -1080,6 +1428,7 @@ def courses_private():
 # GET/PUT/DELETE: Operaciones CRUD para curso específico
 @api.route('/courses-private/<int:course_id>', methods=['GET', 'PUT', 'DELETE'])
 @jwt_required()
+@catalog_cache.invalidates
 def course_private(course_id):
     # HELPER: validate_user_role - Verificar usuario autenticado
     user, response_body_validation, status = validate_user_role()
@@ -1158,8 +1507,35 @@ def course_private(course_id):
     # HELPER: method_not_allowed_response - Método no permitido
     return method_not_allowed_response()
 
+# GET: Árbol completo de un curso (módulos, lecciones y multimedia) en una sola llamada
+@api.route('/courses-private/<int:course_id>/outline', methods=['GET'])
+@jwt_required()
+def course_outline(course_id):
+    # HELPER: validate_user_role - Verificar usuario autenticado
+    user, response_body_validation, status = validate_user_role()
+    if response_body_validation:
+        return response_body_validation, status
+
+    key = ('outline', course_id)
+    outline = catalog_cache.get(key)
+
+    if outline is None:
+        version = catalog_cache.version
+        # HELPER: load_course_outline - Como máximo 4 consultas sea cual sea el tamaño del curso
+        outline = load_course_outline(course_id)
+
+        if not outline:
+            # HELPER: simple_error_response - Curso no encontrado
+            return simple_error_response(f'Curso {course_id} no encontrado', 404)
+
+        catalog_cache.set(key, version, outline)
+
+    # HELPER: simple_success_response - Árbol del curso
+    return simple_success_response(outline, f'Estructura del curso {course_id}')
+
 # GET: Listar módulos públicos (sin autenticación)
 @api.route('/modules-public', methods=['GET'])
+@catalog_cache.cached
 def modules_public():
     
     # HELPER: method_not_allowed_response - Verificar método
@@ -1197,6 +1573,7 @@ def modules_public():
 # GET/POST: Operaciones CRUD de módulos (privado, requiere autenticación)
 @api.route('/modules-private', methods=['GET', 'POST'])
 @jwt_required()
+@catalog_cache.invalidates
 def modules_private():
     # HELPER: validate_user_role - Verificar usuario autenticado
     user, response_body_validation, status = validate_user_role()
@@ -1278,8 +1655,11 @@ def modules_private():
         db.session.add(row)
         db.session.commit()
 
-        # HELPER: simple_success_response - Módulo creado
-        return simple_success_response(row.serialize(), 'Módulo creado exitosamente'), 201
+        # Módulo creado
+        return {
+            'message': 'Módulo creado exitosamente',
+            'results': row.serialize()
+        }, 201
     
     # HELPER: method_not_allowed_response - Método no permitido
     return method_not_allowed_response()
@@ -1287,6 +1667,7 @@ def modules_private():
 # GET/PUT/DELETE: Operaciones CRUD para módulo específico
 @api.route('/modules/<int:module_id>', methods=['GET', 'PUT', 'DELETE'])
 @jwt_required()
+@catalog_cache.invalidates
 def module_private(module_id):
 
     # HELPER: validate_user_role - Verificar usuario autenticado
@@ -1378,6 +1759,7 @@ def module_private(module_id):
 
 # GET: Listar lecciones públicas (sin autenticación)
 @api.route('/lessons-public', methods=['GET'])
+@catalog_cache.cached
 def lessons_public():
     
     # HELPER: method_not_allowed_response - Verificar método
@@ -1415,6 +1797,7 @@ def lessons_public():
 # GET/POST: Operaciones CRUD de lecciones (privado, requiere autenticación)
 @api.route('/lessons-private', methods=['GET', 'POST'])
 @jwt_required()
+@catalog_cache.invalidates
 def lessons_private():
     # HELPER: validate_user_role - Verificar usuario autenticado
     user, response_body_validation, status = validate_user_role()
@@ -1426,33 +1809,56 @@ def lessons_private():
     user_id = user.get('user_id')
 
     if request.method == 'GET':
+        # HELPER: build_cursor_params - Paginación por cursor opcional (?cursor=)
+        cursor_params, error_response, status = build_cursor_params(request)
+        if error_response:
+            return error_response, status
+
         # HELPER: build_pagination_params - Obtener parámetros de paginación
         page, per_page, offset = build_pagination_params(request)
 
-        total = db.session.execute(
-            db.select(db.func.count()).select_from(Lessons)
-        ).scalar()
+        total = None
+        if not cursor_params or cursor_params['include_total']:
+            total = db.session.execute(
+                db.select(db.func.count()).select_from(Lessons)
+            ).scalar()
 
-        lessons = db.session.execute(
-            db.select(Lessons)
-            .order_by(Lessons.lesson_id)
-            .limit(per_page)
-            .offset(offset)
-        ).scalars()
+        next_cursor = None
+        if cursor_params:
+            try:
+                lessons, next_cursor = paginate_by_cursor(db.select(Lessons), [Lessons.lesson_id], cursor_params)
+            except ValueError as e:
+                # HELPER: simple_error_response - Cursor inválido
+                return simple_error_response(str(e), 400)
+        else:
+            lessons = db.session.execute(
+                db.select(Lessons)
+                .order_by(Lessons.lesson_id)
+                .limit(per_page)
+                .offset(offset)
+            ).scalars().all()
+
+        # HELPER: load_multimedia_by_lesson - Multimedia de toda la página en una sola consulta
+        multimedia_by_lesson = load_multimedia_by_lesson([lesson.lesson_id for lesson in lessons])
 
         results = []
         for lesson in lessons:
             data = lesson.serialize()
-
-            multimedia = db.session.execute(
-                db.select(MultimediaResources)
-                .where(MultimediaResources.lesson_id == lesson.lesson_id)
-                .order_by(MultimediaResources.order)
-            ).scalars()
-
-            data["multimedia_resources"] = [m.serialize() for m in multimedia]
+            data["multimedia_resources"] = [
+                m.serialize() for m in multimedia_by_lesson.get(lesson.lesson_id, [])
+            ]
             results.append(data)
 
+        if cursor_params:
+            # HELPER: build_cursor_response - Enviar respuesta paginada por cursor
+            return build_cursor_response(
+                results=results,
+                next_cursor=next_cursor,
+                per_page=cursor_params['per_page'],
+                total_count=total,
+                message="Listado de lecciones"
+            )
+
         # HELPER: build_pagination_response - Enviar respuesta paginada
         return build_pagination_response(
             results=results,
@@ -1480,6 +1886,7 @@ def lessons_private():
 # GET/PUT/DELETE: Operaciones CRUD para lección específica
 @api.route('/lessons/<int:lesson_id>', methods=['GET', 'PUT', 'DELETE'])
 @jwt_required()
+@catalog_cache.invalidates
 def lesson_detail(lesson_id):
     # HELPER: validate_user_role - Verificar usuario autenticado
     user, response_body_validation, status = validate_user_role()
@@ -1534,7 +1941,7 @@ def lesson_detail(lesson_id):
         content_type = request.content_type or ""
 
         if "multipart/form-data" in content_type:
-            return _handle_multipart_upload(request, user_id, user)
+            return _handle_multipart_upload(request, user_id, user, lesson=lesson)
 
         # HELPER: validate_request_json - Validar datos de actualización
         data, error_response, status = validate_request_json()
@@ -1589,6 +1996,220 @@ def lesson_detail(lesson_id):
     # HELPER: method_not_allowed_response - Método no permitido
     return method_not_allowed_response()
 
+# GET: Estado de un trabajo de subida de multimedia
+@api.route('/media-jobs/<int:job_id>', methods=['GET'])
+@jwt_required()
+def media_job(job_id):
+    # HELPER: validate_user_role - Verificar usuario autenticado
+    user, response_body_validation, status = validate_user_role()
+    if response_body_validation:
+        return response_body_validation, status
+
+    job = db.session.get(MediaJobs, job_id)
+
+    if not job:
+        # HELPER: simple_error_response - Trabajo no encontrado
+        return simple_error_response(f"Trabajo {job_id} no encontrado", 404)
+
+    if not user.get('is_admin', False) and job.created_by != user.get('user_id'):
+        # HELPER: simple_error_response - Sin permisos para ver
+        return simple_error_response("No autorizado para ver este trabajo", 403)
+
+    job_data = job.serialize()
+    job_data['files'] = [f.serialize() for f in job.files]
+
+    # HELPER: simple_success_response - Estado del trabajo
+    return simple_success_response(job_data, f"Estado del trabajo {job_id}")
+
+# Carga una subida por partes y comprueba que pertenece al usuario
+def _get_upload_session(upload_id, user):
+    upload = db.session.get(UploadSessions, upload_id)
+
+    if not upload:
+        # HELPER: simple_error_response - Subida no encontrada
+        return None, simple_error_response(f"Subida {upload_id} no encontrada", 404)
+
+    if not user.get('is_admin', False) and upload.user_id != user.get('user_id'):
+        # HELPER: simple_error_response - Sin permisos sobre la subida
+        return None, simple_error_response("No autorizado para esta subida", 403)
+
+    return upload, None
+
+# POST: Iniciar una subida por partes (reanudable) de un archivo grande de una lección
+@api.route('/uploads', methods=['POST'])
+@jwt_required()
+def uploads():
+    # HELPER: validate_user_role - Solo profesores (o administradores)
+    user, response_body_validation, status = validate_user_role(allowed_roles=['teacher'])
+    if response_body_validation:
+        return response_body_validation, status
+
+    # HELPER: validate_request_json - Validar datos de la subida
+    data, error_response, status = validate_request_json(['filename', 'total_size', 'lesson_id'])
+    if error_response:
+        return error_response, status
+
+    lesson = db.session.get(Lessons, data.get('lesson_id'))
+
+    if not lesson:
+        # HELPER: simple_error_response - Lección no encontrada
+        return simple_error_response("La lección especificada no existe", 404)
+
+    if not user.get('is_admin', False):
+        course = db.session.execute(
+            db.select(Courses)
+            .join(Modules, Modules.course_id == Courses.course_id)
+            .where(Modules.module_id == lesson.module_id)
+        ).scalar()
+
+        if not course or course.created_by != user.get('user_id'):
+            # HELPER: simple_error_response - No es el creador del curso
+            return simple_error_response("No autorizado para subir archivos a lecciones de otros profesores", 403)
+
+    try:
+        # HELPER: chunked_upload_service.plan_upload - Validar tipo y tamaño, calcular partes
+        plan = chunked_upload_service.plan_upload(data.get('filename'), data.get('total_size'))
+    except ValueError as e:
+        # HELPER: simple_error_response - Archivo no válido
+        return simple_error_response(str(e), 400)
+
+    upload = UploadSessions(
+        upload_id=chunked_upload_service.new_upload_id(),
+        filename=data.get('filename'),
+        type=plan['type'],
+        description=data.get('description'),
+        total_size=data.get('total_size'),
+        chunk_size=plan['chunk_size'],
+        total_chunks=plan['total_chunks'],
+        status='uploading',
+        user_id=user.get('user_id'),
+        lesson_id=lesson.lesson_id
+    )
+    db.session.add(upload)
+    db.session.commit()
+
+    return {
+        'message': 'Subida iniciada',
+        'results': upload.serialize()
+    }, 201
+
+# GET: Estado de una subida (partes recibidas y pendientes para reanudar)
+@api.route('/uploads/<string:upload_id>', methods=['GET'])
+@jwt_required()
+def upload_status(upload_id):
+    # HELPER: validate_user_role - Solo profesores (o administradores)
+    user, response_body_validation, status = validate_user_role(allowed_roles=['teacher'])
+    if response_body_validation:
+        return response_body_validation, status
+
+    upload, error = _get_upload_session(upload_id, user)
+    if error:
+        return error
+
+    upload_data = upload.serialize()
+    upload_data['received_chunks'] = chunked_upload_service.received_chunks(upload)
+    upload_data['missing_chunks'] = chunked_upload_service.missing_chunks(upload)
+
+    # HELPER: simple_success_response - Estado de la subida
+    return simple_success_response(upload_data, f"Estado de la subida {upload_id}")
+
+# PUT: Recibir la parte N de una subida (cuerpo binario, se escribe a disco por bloques)
+@api.route('/uploads/<string:upload_id>/chunks/<int:chunk_index>', methods=['PUT'])
+@jwt_required()
+def upload_chunk(upload_id, chunk_index):
+    # HELPER: validate_user_role - Solo profesores (o administradores)
+    user, response_body_validation, status = validate_user_role(allowed_roles=['teacher'])
+    if response_body_validation:
+        return response_body_validation, status
+
+    upload, error = _get_upload_session(upload_id, user)
+    if error:
+        return error
+
+    if upload.status != 'uploading':
+        # HELPER: simple_error_response - La subida ya no admite partes
+        return simple_error_response(f"La subida está en estado '{upload.status}'", 409)
+
+    try:
+        # No se usa request.data: el cuerpo se lee del stream sin cargarlo entero en memoria
+        received = chunked_upload_service.write_chunk(upload, chunk_index, request.stream)
+    except ValueError as e:
+        # HELPER: simple_error_response - Parte no válida
+        return simple_error_response(str(e), 400)
+
+    # HELPER: simple_success_response - Parte guardada
+    return simple_success_response({
+        'upload_id': upload.upload_id,
+        'chunk': chunk_index,
+        'size': received
+    }, f"Parte {chunk_index} recibida")
+
+# POST: Completar una subida: unir las partes y encolar su envío a Cloudinary
+@api.route('/uploads/<string:upload_id>/complete', methods=['POST'])
+@jwt_required()
+def upload_complete(upload_id):
+    # HELPER: validate_user_role - Solo profesores (o administradores)
+    user, response_body_validation, status = validate_user_role(allowed_roles=['teacher'])
+    if response_body_validation:
+        return response_body_validation, status
+
+    upload, error = _get_upload_session(upload_id, user)
+    if error:
+        return error
+
+    if upload.status != 'uploading':
+        # HELPER: simple_error_response - La subida ya fue completada o cancelada
+        return simple_error_response(f"La subida está en estado '{upload.status}'", 409)
+
+    missing = chunked_upload_service.missing_chunks(upload)
+    if missing:
+        return {
+            'message': 'Faltan partes por subir',
+            'results': {'missing_chunks': missing}
+        }, 409
+
+    # HELPER: chunked_upload_service.claim - Solo una llamada concurrente ensambla y encola
+    if not chunked_upload_service.claim(upload):
+        # HELPER: simple_error_response - Otra petición ya completó la subida
+        return simple_error_response("La subida ya se está completando", 409)
+
+    spooled = []
+    try:
+        # HELPER: chunked_upload_service.assemble - Unir las partes en el directorio de la cola
+        path = chunked_upload_service.assemble(upload)
+        spooled = [{
+            'path': path,
+            'original_filename': upload.filename,
+            'type': upload.type,
+            'description': upload.description,
+            'position': 1
+        }]
+
+        # HELPER: media_job_service.enqueue - El worker lo sube a Cloudinary por partes (upload_large)
+        job = media_job_service.enqueue(upload.lesson_id, upload.user_id, spooled)
+        db.session.flush()
+
+        upload.job_id = job.job_id
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        media_job_service.discard_spooled(spooled)
+        # HELPER: chunked_upload_service.release - Volver a 'uploading' para poder reintentar
+        chunked_upload_service.release(upload)
+        # HELPER: simple_error_response - Error encolando la subida
+        return simple_error_response(f"Error completando la subida: {str(e)}", 500)
+
+    chunked_upload_service.discard(upload)
+
+    return {
+        "message": "Subida completada, multimedia en proceso",
+        "results": {
+            "upload": upload.serialize(),
+            "job": job.serialize(),
+            "status_url": f"/api/media-jobs/{job.job_id}"
+        }
+    }, 202
+
 # POST: Verificar curso para compra (público)
 @api.route('/purchases-public', methods=['POST'])
 def purchases_public():
@@ -1683,9 +2304,14 @@ def purchases_private():
     user_email = user.get('email', '')
     
     if request.method == 'GET':
+        cursor_params, error_response, status = build_cursor_params(request)
+        if error_response:
+            return error_response, status
+        
         page, per_page, offset = build_pagination_params(request)
         
-        data_query = db.select(Purchases)
+        # HELPER: purchase_serializer - Solo las columnas necesarias, sin instanciar modelos
+        data_query = purchase_serializer.select()
         count_query = db.select(db.func.count()).select_from(Purchases)
         
         if not is_admin:
@@ -1699,15 +2325,41 @@ def purchases_private():
                 data_query = data_query.where(Purchases.user_id == user_id)
                 count_query = count_query.where(Purchases.user_id == user_id)
         
+        if cursor_params:
+            total_count = None
+            if cursor_params['include_total']:
+                total_count = db.session.execute(count_query).scalar() or 0
+            
+            try:
+                rows, next_cursor = paginate_by_cursor(
+                    data_query,
+                    [Purchases.purchase_date, Purchases.purchase_id],
+                    cursor_params,
+                    descending=True,
+                    as_rows=True
+                )
+            except ValueError as e:
+                return simple_error_response(str(e), 400)
+            
+            results = purchase_serializer.many(rows)
+            
+            return build_cursor_response(
+                results=results,
+                next_cursor=next_cursor,
+                per_page=cursor_params['per_page'],
+                total_count=total_count,
+                message='Listado de compras' if results else 'No hay compras registradas'
+            )
+        
         total_count = db.session.execute(count_query).scalar() or 0
         
         rows = db.session.execute(
             data_query.order_by(Purchases.purchase_date.desc())
             .limit(per_page)
             .offset(offset)
-        ).scalars()
+        ).all()
         
-        results = [row.serialize() for row in rows]
+        results = purchase_serializer.many(rows)
         
         return build_pagination_response(
             results=results,
@@ -1763,73 +2415,123 @@ def purchases_private():
             db.session.add(purchase)
             db.session.flush()
             
+            awarded = None
             if course.points > 0:
-                user_point = UserPoints(
+                # HELPER: points_service.award - Suma atómica, una sola vez por compra
+                awarded = points_service.award(
                     user_id=user_id,
                     points=course.points,
+                    source_type=SOURCE_PURCHASE,
+                    source_id=purchase.purchase_id,
                     type='course',
-                    event_description=f"Curso gratuito: {course.title}",
-                    date=datetime.now(timezone.utc)
+                    event_description=f"Curso gratuito: {course.title}"
                 )
-                db.session.add(user_point)
-                
-                user_obj = db.session.get(Users, user_id)
-                if user_obj:
-                    current = user_obj.current_points or 0
-                    user_obj.current_points = current + course.points
             
             db.session.commit()
             
-            return simple_success_response(
-                purchase.serialize(),
-                '¡Curso gratuito activado exitosamente!'
-            ), 201
-        
-        purchase = Purchases(
-            purchase_date=datetime.now(timezone.utc),
-            price=course.price,
-            total=course.price,
-            status='pending',
-            start_date=None,
-            course_id=course_id,
-            user_id=user_id
-        )
+            if awarded is not None:
+                refresh_user_points(user_id)
+            
+            return {
+                'message': '¡Curso gratuito activado exitosamente!',
+                'results': purchase.serialize()
+            }, 201
         
-        db.session.add(purchase)
-        db.session.flush()
+        amount_cents = stripe_service.format_amount_for_stripe(course.price)
+        
+        if amount_cents < 50:
+            return simple_error_response("Monto muy bajo para pago con tarjeta. Mínimo: $0.50 USD", 400)
         
+        # Solo puede haber una compra por usuario y curso: se reutiliza la pendiente (o cancelada)
+        # para que repetir el POST devuelva el mismo PaymentIntent
+        purchase = db.session.execute(
+            db.select(Purchases).where(
+                Purchases.user_id == user_id,
+                Purchases.course_id == course_id
+            )
+        ).scalar()
+        created = purchase is None
+        
+        if created:
+            purchase = Purchases(
+                purchase_date=datetime.now(timezone.utc),
+                price=course.price,
+                total=course.price,
+                status='pending',
+                start_date=None,
+                course_id=course_id,
+                user_id=user_id
+            )
+            db.session.add(purchase)
+        else:
+            if purchase.status == 'cancelled':
+                # Nuevo intento de pago: otra clave de idempotencia (Stripe devolvería el PaymentIntent
+                # cancelado) y nueva fecha para que el conciliador respete el margen de este intento
+                purchase.payment_attempt = (purchase.payment_attempt or 0) + 1
+                purchase.purchase_date = datetime.now(timezone.utc)
+                purchase.stripe_payment_intent_id = None
+            purchase.price = course.price
+            purchase.total = course.price
+            purchase.status = 'pending'
+        
+        try:
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            # HELPER: simple_error_response - Otra petición creó la compra a la vez
+            return simple_error_response('Ya hay una compra en curso para este curso, inténtalo de nuevo', 409)
+        
+        purchase_id = purchase.purchase_id
+        payment_attempt = purchase.payment_attempt
         metadata = stripe_service.create_metadata_for_purchase(
-            purchase_id=purchase.purchase_id,
+            purchase_id=purchase_id,
             user_id=user_id,
             course_id=course.course_id,
-            course_title=course.title
+            course_title=course.title,
+            created_at=purchase.purchase_date
         )
+        description = f"Compra del curso: {course.title}"
         
-        amount_cents = stripe_service.format_amount_for_stripe(course.price)
-        
-        if amount_cents < 50:
-            db.session.rollback()
-            return simple_error_response("Monto muy bajo para pago con tarjeta. Mínimo: $0.50 USD", 400)
+        # Liberar la conexión antes de llamar a Stripe: una respuesta lenta no ocupa el pool de la base de datos
+        db.session.close()
         
         payment_result = stripe_service.create_payment_intent(
             amount_cents=amount_cents,
             currency='usd',
             metadata=metadata,
-            description=f"Compra del curso: {course.title}",
-            customer_email=user_email
+            description=description,
+            customer_email=user_email,
+            idempotency_key=stripe_service.purchase_idempotency_key(purchase_id, amount_cents, payment_attempt)
         )
         
         if not payment_result['success']:
-            db.session.rollback()
+            if created:
+                # La compra recién creada no llegó a tener pago: no dejarla huérfana
+                db.session.execute(
+                    db.delete(Purchases).where(
+                        Purchases.purchase_id == purchase_id,
+                        Purchases.status == 'pending',
+                        Purchases.stripe_payment_intent_id.is_(None)
+                    )
+                )
+                db.session.commit()
             return simple_error_response(payment_result.get('error', 'Error de Stripe'), 500)
         
-        purchase.stripe_payment_intent_id = payment_result['id']
+        db.session.execute(
+            db.update(Purchases)
+            .where(Purchases.purchase_id == purchase_id)
+            .values(stripe_payment_intent_id=payment_result['id'])
+        )
         db.session.commit()
         
+        purchase = db.session.get(Purchases, purchase_id)
+        course = db.session.get(Courses, course_id)
+        
         stripe_config = stripe_service.get_stripe_config()
         
-        return simple_success_response(
-            {
+        return {
+            'message': 'Pago preparado exitosamente',
+            'results': {
                 'purchase': purchase.serialize(),
                 'stripe_payment': {
                     'client_secret': payment_result['client_secret'],
@@ -1846,9 +2548,8 @@ def purchases_private():
                     'price': float(course.price),
                     'points': course.points
                 }
-            },
-            'Pago preparado exitosamente'
-        ), 201
+            }
+        }, 201
     
     return method_not_allowed_response()
 
@@ -2064,29 +2765,19 @@ def purchase_detail(purchase_id):
                 ).scalar()
                 
                 if course and course.points > 0:
-                    existing_points = db.session.execute(
-                        db.select(UserPoints).where(
-                            UserPoints.user_id == purchase.user_id,
-                            UserPoints.event_description.contains(f"purchase_id:{purchase_id}")
-                        )
-                    ).scalar()
+                    # HELPER: points_service.award - Suma atómica, una sola vez por compra
+                    awarded = points_service.award(
+                        user_id=purchase.user_id,
+                        points=course.points,
+                        source_type=SOURCE_PURCHASE,
+                        source_id=purchase_id,
+                        type='course',
+                        event_description=f"Compra #{purchase_id} del curso: {course.title}"
+                    )
+                    db.session.commit()
                     
-                    if not existing_points:
-                        user_point = UserPoints(
-                            user_id=purchase.user_id,
-                            points=course.points,
-                            type='course',
-                            event_description=f"Compra #{purchase_id} del curso: {course.title} | purchase_id:{purchase_id}",
-                            date=datetime.now(timezone.utc)
-                        )
-                        db.session.add(user_point)
-                        
-                        buyer = db.session.get(Users, purchase.user_id)
-                        if buyer:
-                            current = buyer.current_points or 0
-                            buyer.current_points = current + course.points
-                        
-                        db.session.commit()
+                    if awarded is not None:
+                        refresh_user_points(purchase.user_id)
             
             purchase_data = purchase.serialize()
             
@@ -2162,35 +2853,13 @@ def points_ranking():
     page, per_page, offset = build_pagination_params(request)
     
     if is_admin:
-        query = db.select(Users).where(Users.is_active == True)
-        total = db.session.execute(db.select(db.func.count()).select_from(Users).where(Users.is_active == True)).scalar() or 0
-        users = db.session.execute(query.order_by(Users.current_points.desc()).limit(per_page).offset(offset)).scalars()
-        
-        results = []
-        for rank, user_obj in enumerate(users, 1):
-            results.append({
-                'rank': rank,
-                'user_id': user_obj.user_id,
-                'name': f"{user_obj.first_name} {user_obj.last_name}",
-                'points': user_obj.current_points or 0
-            })
+        results, total = leaderboard.page(offset, per_page)
         
         return build_pagination_response(results, total, page, per_page, 'Ranking general')
     
     elif user_role == 'teacher':
-        query = db.select(Users).distinct() \
-            .join(Purchases, Users.user_id == Purchases.user_id) \
-            .join(Courses, Purchases.course_id == Courses.course_id) \
-            .where(
-                Courses.created_by == user_id,
-                Users.role == 'student',
-                Users.is_active == True,
-                Purchases.status == 'paid'
-            )
-        
-        total = db.session.execute(
-            db.select(db.func.count(db.distinct(Users.user_id))) \
-            .select_from(Users) \
+        student_ids = db.session.execute(
+            db.select(Users.user_id).distinct() \
             .join(Purchases, Users.user_id == Purchases.user_id) \
             .join(Courses, Purchases.course_id == Courses.course_id) \
             .where(
@@ -2199,25 +2868,40 @@ def points_ranking():
                 Users.is_active == True,
                 Purchases.status == 'paid'
             )
-        ).scalar() or 0
+        ).scalars().all()
         
-        students = db.session.execute(query.order_by(Users.current_points.desc()).limit(per_page).offset(offset)).scalars()
+        ranking, total = leaderboard.page_for(student_ids, offset, per_page)
         
         results = []
-        for rank, student in enumerate(students, 1):
+        for position in ranking:
             results.append({
-                'rank': rank,
-                'student_id': student.user_id,
-                'name': f"{student.first_name} {student.last_name}",
-                'points': student.current_points or 0
+                'rank': position['rank'],
+                'student_id': position['user_id'],
+                'name': position['name'],
+                'points': position['points']
             })
         
         return build_pagination_response(results, total, page, per_page, 'Tus estudiantes')
     
     else:
-        user_obj = db.session.execute(db.select(Users).where(Users.user_id == user_id)).scalar()
+        around = request.args.get('around', default=2, type=int)
+        around = min(max(around, 0), 10)
+        
+        rank, neighbours, total = leaderboard.around(user_id, around)
+        
+        # Los puntos propios salen de la base de datos (una lectura por clave primaria): el ranking en memoria
+        # puede ir unos segundos por detrás de un cambio hecho en otro proceso
+        points = db.session.execute(
+            db.select(Users.current_points).where(Users.user_id == user_id)
+        ).scalar() or 0
+        
         return simple_success_response(
-            {'points': user_obj.current_points if user_obj else 0},
+            {
+                'points': points,
+                'rank': rank,
+                'total': total,
+                'neighbours': neighbours
+            },
             'Tus puntos'
         )
 
@@ -2235,26 +2919,30 @@ def user_points():
     user_role = user.get('role')
     
     if request.method == 'GET':
-        points_query = db.session.execute(db.select(UserPoints.user_id,
-                                          func.sum(UserPoints.points).label('total_points'))
-                                          .group_by(UserPoints.user_id)
-                                          .order_by(func.sum(UserPoints.points).desc())).all()
-
-        user_ids = [user_id for user_id, _ in points_query]
-        users = db.session.execute(db.select(Users)
-                                   .where(Users.user_id.in_(user_ids))).scalars()
-
-        serialized_users = {user.user_id: user.serialize() for user in users}
-
+        # HELPER: build_pagination_params - Obtener parámetros de paginación
+        page, per_page, offset = build_pagination_params(request)
+        
+        total = db.session.execute(
+            db.select(db.func.count()).select_from(UserPointsTotals)
+        ).scalar()
+        
+        rows = db.session.execute(
+            db.select(UserPointsTotals, Users)
+            .join(Users, UserPointsTotals.user_id == Users.user_id)
+            .order_by(UserPointsTotals.total_points.desc(), UserPointsTotals.user_id)
+            .limit(per_page)
+            .offset(offset)
+        ).all()
+        
         results = []
-        for rank, (user_id, total_points) in enumerate(points_query, 1):
-            user_data = serialized_users.get(user_id, {})
+        for rank, (points_total, user_obj) in enumerate(rows, offset + 1):
+            user_data = user_obj.serialize()
             user_data['rank'] = rank
-            user_data['total_points'] = float(total_points) if total_points else 0
+            user_data['total_points'] = points_total.total_points or 0
             results.append(user_data)
         
-        # HELPER: simple_success_response - Lista de puntos
-        return simple_success_response(results, 'User points list')
+        # HELPER: build_pagination_response - Enviar respuesta paginada
+        return build_pagination_response(results, total, page, per_page, 'User points list')
     
     if request.method == 'POST':
         if not is_admin and user_role != 'teacher':
@@ -2282,18 +2970,67 @@ def user_points():
         if not user_exists:
             # HELPER: simple_error_response - Usuario no encontrado
             return simple_error_response('Usuario no encontrado', 400)
+
+        if not isinstance(data.get('points'), int) or isinstance(data.get('points'), bool):
+            # HELPER: simple_error_response - Puntos inválidos
+            return simple_error_response('Los puntos deben ser un número entero', 400)
+
+        source_type = data.get('source_type')
+        source_id = data.get('source_id')
+        if (source_type is None) != (source_id is None) or (
+                source_id is not None and (not isinstance(source_id, int) or isinstance(source_id, bool))):
+            # HELPER: simple_error_response - Clave de origen incompleta
+            return simple_error_response('source_type y source_id deben indicarse juntos (source_id entero)', 400)
+
+        if source_type is not None and (
+                not isinstance(source_type, str) or not source_type.strip()
+                or len(source_type) > UserPoints.source_type.type.length):
+            # HELPER: simple_error_response - Clave de origen inválida
+            return simple_error_response(
+                f'source_type debe ser un texto de 1 a {UserPoints.source_type.type.length} caracteres', 400)
+
+        if source_type in SYSTEM_SOURCE_TYPES:
+            # HELPER: simple_error_response - Orígenes reservados a compras, lecciones y módulos
+            return simple_error_response(f"source_type '{source_type}' lo asigna el sistema, no se puede indicar a mano", 400)
+
+        if source_type is not None:
+            # HELPER: points_service.award - Puntos con clave de origen (idempotente)
+            awarded = points_service.award(
+                user_id=user_exists.user_id,
+                points=data.get('points'),
+                source_type=source_type,
+                source_id=source_id,
+                type=data.get('type', 'course'),
+                event_description=data.get('event_description'),
+                date=data.get('date'))
+            if awarded is None:
+                db.session.rollback()
+                # HELPER: simple_error_response - Puntos ya otorgados
+                return simple_error_response('Estos puntos ya se habían otorgado', 409)
+            row = db.session.execute(
+                db.select(UserPoints).where(
+                    UserPoints.user_id == user_exists.user_id,
+                    UserPoints.source_type == source_type,
+                    UserPoints.source_id == source_id
+                )
+            ).scalar()
+        else:
+            # HELPER: points_service.record - Historial, total y current_points en la misma transacción
+            row = points_service.record(
+                user_id=user_exists.user_id,
+                points=data.get('points'),
+                type=data.get('type', 'course'),
+                event_description=data.get('event_description'),
+                date=data.get('date'))
         
-        row = UserPoints(
-            user_id=data.get('user_id'),
-            points=data.get('points'),
-            type=data.get('type', 'course'),
-            event_description=data.get('event_description'),
-            date=data.get('date'))
-        db.session.add(row)
         db.session.commit()
         
-        # HELPER: simple_success_response - Puntos creados
-        return simple_success_response(row.serialize(), 'Puntos de usuario creados'), 201
+        refresh_user_points(user_exists.user_id)
+        
+        return {
+            'message': 'Puntos de usuario creados',
+            'results': row.serialize()
+        }, 201
     
     # HELPER: method_not_allowed_response - Método no permitido
     return method_not_allowed_response()
@@ -2339,15 +3076,32 @@ def user_point(point_id):
             if not user_exists:
                 # HELPER: simple_error_response - Usuario no encontrado
                 return simple_error_response('Usuario no encontrado', 400)
-            
+        
+        if 'points' in data and (not isinstance(data['points'], int) or isinstance(data['points'], bool)):
+            # HELPER: simple_error_response - Puntos inválidos
+            return simple_error_response('Los puntos deben ser un número entero', 400)
+        
+        old_user_id = row.user_id
+        old_points = row.points or 0
+        
         row.points = data.get('points', row.points)
         row.type = data.get('type', row.type)
         row.event_description = data.get(
             'event_description', row.event_description)
         row.date = data.get('date', row.date)
         row.user_id = data.get('user_id', row.user_id)
+        
+        # HELPER: points_service.apply_delta - Total, current_points y logros con la diferencia del registro
+        if row.user_id == old_user_id:
+            points_service.apply_delta(row.user_id, (row.points or 0) - old_points)
+        else:
+            points_service.apply_delta(old_user_id, -old_points)
+            points_service.apply_delta(row.user_id, row.points or 0)
         db.session.commit()
         
+        for affected_user_id in {old_user_id, row.user_id} - {None}:
+            refresh_user_points(affected_user_id)
+        
         # HELPER: simple_success_response - Punto actualizado
         return simple_success_response(row.serialize(), f'Punto {point_id} actualizado')
     
@@ -2356,9 +3110,15 @@ def user_point(point_id):
             # HELPER: simple_error_response - Sin permisos para eliminar
             return simple_error_response('No eres un Admin ni Teacher, no puedes eliminar puntos', 403)
         
+        user_id = row.user_id
+        # HELPER: points_service.apply_delta - Descontar el registro del total y de current_points
+        points_service.apply_delta(user_id, -(row.points or 0))
         db.session.delete(row)
         db.session.commit()
         
+        if user_id:
+            refresh_user_points(user_id)
+        
         # HELPER: simple_success_response - Punto eliminado
         return simple_success_response({}, f'Punto {point_id} eliminado')
     
@@ -2379,16 +3139,70 @@ def user_progress():
     user_role = user.get('role')
     
     if request.method == 'GET':
-        query = db.select(UserProgress)
+        cursor_params, error_response, status = build_cursor_params(request)
+        if error_response:
+            return error_response, status
+        
+        page, per_page, offset = build_pagination_params(request)
         
+        filter_user_id = request.args.get('user_id', type=int)
         if not is_admin and user_role in ['student', 'demo']:
-            query = query.where(UserProgress.user_id == user_id)
+            filter_user_id = user_id
         
-        rows = db.session.execute(query).scalars()
-        results = [row.serialize() for row in rows]
+        filters = {
+            'user_id': filter_user_id,
+            'course_id': request.args.get('course_id', type=int),
+            'module_id': request.args.get('module_id', type=int)
+        }
+        
+        # HELPER: progress_service.filter_query - Filtros por usuario, curso y módulo
+        data_query = progress_service.filter_query(progress_serializer.select(), **filters)
+        count_query = progress_service.filter_query(
+            db.select(db.func.count()).select_from(UserProgress), **filters
+        )
         
-        # HELPER: simple_success_response - Lista de progreso
-        return simple_success_response(results, 'Listado de progreso de usuarios')
+        if cursor_params:
+            total_count = None
+            if cursor_params['include_total']:
+                total_count = db.session.execute(count_query).scalar() or 0
+            
+            try:
+                rows, next_cursor = paginate_by_cursor(
+                    data_query,
+                    [UserProgress.progress_id],
+                    cursor_params,
+                    as_rows=True
+                )
+            except ValueError as e:
+                return simple_error_response(str(e), 400)
+            
+            results = progress_serializer.many(rows)
+            
+            return build_cursor_response(
+                results=results,
+                next_cursor=next_cursor,
+                per_page=cursor_params['per_page'],
+                total_count=total_count,
+                message='Listado de progreso de usuarios' if results else 'No hay progreso registrado'
+            )
+        
+        total_count = db.session.execute(count_query).scalar() or 0
+        
+        rows = db.session.execute(
+            data_query.order_by(UserProgress.progress_id)
+            .limit(per_page)
+            .offset(offset)
+        ).all()
+        
+        results = progress_serializer.many(rows)
+        
+        return build_pagination_response(
+            results=results,
+            total_count=total_count,
+            page=page,
+            per_page=per_page,
+            message='Listado de progreso de usuarios' if results else 'No hay progreso registrado'
+        )
     
     if request.method == 'POST':
         if not is_admin and user_role != 'teacher':
@@ -2411,14 +3225,188 @@ def user_progress():
         )
         
         db.session.add(row)
-        db.session.commit()
+        try:
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            # HELPER: simple_error_response - Ya existe progreso para esa lección
+            return simple_error_response('Ya existe progreso de ese usuario para la lección; usa PUT o /userprogress/batch', 409)
+        
+        # HELPER: progress_service.invalidate - El resumen del usuario ya no es válido
+        progress_service.invalidate(row.user_id)
         
-        # HELPER: simple_success_response - Progreso creado
-        return simple_success_response(row.serialize(), 'Progreso de usuario creado'), 201
+        return {
+            'message': 'Progreso de usuario creado',
+            'results': row.serialize()
+        }, 201
     
     # HELPER: method_not_allowed_response - Método no permitido
     return method_not_allowed_response()
 
+# Convierte un evento de progreso del cliente en fila para el upsert; devuelve (evento, error)
+def _parse_progress_event(item, user_id, can_write_others):
+    if not isinstance(item, dict):
+        return None, 'El evento debe ser un objeto'
+    
+    lesson_id = item.get('lesson_id')
+    if not isinstance(lesson_id, int) or isinstance(lesson_id, bool) or lesson_id < 1:
+        return None, 'lesson_id inválido'
+    
+    target_user_id = item.get('user_id', user_id)
+    if target_user_id != user_id and not can_write_others:
+        return None, 'No autorizado para registrar progreso de otro usuario'
+    if not isinstance(target_user_id, int) or isinstance(target_user_id, bool):
+        return None, 'user_id inválido'
+    
+    completed = item.get('completed', False)
+    if not isinstance(completed, bool):
+        return None, 'completed debe ser booleano'
+    
+    dates = {}
+    for field in ('start_date', 'completion_date'):
+        value = item.get(field)
+        if value is None:
+            dates[field] = None
+            continue
+        try:
+            parsed = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+        except ValueError:
+            return None, f'Formato de fecha inválido para {field}'
+        # Fechas en UTC sin zona, como el resto de columnas DateTime
+        dates[field] = parsed.astimezone(timezone.utc).replace(tzinfo=None) if parsed.tzinfo else parsed
+    
+    if completed and dates['completion_date'] is None:
+        dates['completion_date'] = datetime.now(timezone.utc).replace(tzinfo=None)
+    if not completed:
+        dates['completion_date'] = None
+    if dates['start_date'] is None:
+        dates['start_date'] = dates['completion_date'] or datetime.now(timezone.utc).replace(tzinfo=None)
+    
+    return {
+        'user_id': target_user_id,
+        'lesson_id': lesson_id,
+        'completed': completed,
+        'start_date': dates['start_date'],
+        'completion_date': dates['completion_date']
+    }, None
+
+# POST: Sincroniza muchos eventos de progreso (clientes móviles sin conexión) con un solo upsert
+@api.route('/userprogress/batch', methods=['POST'])
+@jwt_required()
+def user_progress_batch():
+    # HELPER: validate_user_role - Verificar usuario autenticado
+    user, error_response, status = validate_user_role()
+    if error_response:
+        return error_response, status
+    
+    user_id = user.get('user_id')
+    can_write_others = user.get('is_admin', False) or user.get('role') == 'teacher'
+    
+    # HELPER: validate_request_json - Validar lista de eventos
+    data, error_response, status = validate_request_json(['events'])
+    if error_response:
+        return error_response, status
+    
+    items = data.get('events')
+    if not isinstance(items, list) or not items:
+        # HELPER: simple_error_response - Lista vacía o inválida
+        return simple_error_response('events debe ser una lista no vacía', 400)
+    
+    if len(items) > PROGRESS_BATCH_MAX_EVENTS:
+        # HELPER: simple_error_response - Demasiados eventos
+        return simple_error_response(f'Máximo {PROGRESS_BATCH_MAX_EVENTS} eventos por petición', 400)
+    
+    outcomes = []
+    events = []
+    for index, item in enumerate(items):
+        # HELPER: _parse_progress_event - Validar y normalizar cada evento
+        event, error = _parse_progress_event(item, user_id, can_write_others)
+        outcomes.append({'index': index, 'status': 'rejected', 'error': error} if error else None)
+        events.append(event)
+    
+    # Lecciones y usuarios inexistentes se rechazan antes del upsert (una consulta por tabla)
+    # para que una clave foránea inválida no haga fallar todo el lote
+    valid = [event for event in events if event]
+    lesson_ids = {event['lesson_id'] for event in valid}
+    user_ids = {event['user_id'] for event in valid}
+    existing_lessons = set(db.session.execute(
+        db.select(Lessons.lesson_id).where(Lessons.lesson_id.in_(lesson_ids))
+    ).scalars()) if lesson_ids else set()
+    existing_users = set(db.session.execute(
+        db.select(Users.user_id).where(Users.user_id.in_(user_ids))
+    ).scalars()) if user_ids - {user_id} else user_ids
+    
+    for index, event in enumerate(events):
+        if not event:
+            continue
+        if event['lesson_id'] not in existing_lessons:
+            outcomes[index] = {'index': index, 'status': 'rejected', 'error': 'Lección no encontrada'}
+            events[index] = None
+        elif event['user_id'] not in existing_users:
+            outcomes[index] = {'index': index, 'status': 'rejected', 'error': 'Usuario no encontrado'}
+            events[index] = None
+    
+    # HELPER: progress_service.upsert_many - Un único INSERT ... ON CONFLICT DO UPDATE
+    applied = progress_service.upsert_many(progress_service.merge_events([event for event in events if event]))
+    db.session.commit()
+    
+    for affected_user_id in {key[0] for key in applied}:
+        # HELPER: progress_service.invalidate - Los resúmenes de estos usuarios ya no son válidos
+        progress_service.invalidate(affected_user_id)
+    
+    for index, event in enumerate(events):
+        if event:
+            row = applied[(event['user_id'], event['lesson_id'])]
+            outcomes[index] = {'index': index, 'status': 'applied', 'progress': progress_serializer.convert(row)}
+    
+    applied_count = sum(1 for outcome in outcomes if outcome['status'] == 'applied')
+    
+    # HELPER: simple_success_response - Resultado por evento
+    return simple_success_response({
+        'applied': applied_count,
+        'rejected': len(outcomes) - applied_count,
+        'items': outcomes
+    }, f'{applied_count} de {len(outcomes)} eventos de progreso aplicados')
+
+# GET: Avance por curso (lecciones completadas / total) de un usuario o de un grupo
+@api.route('/userprogress/summary', methods=['GET'])
+@jwt_required()
+def user_progress_summary():
+    # HELPER: validate_user_role - Verificar usuario autenticado
+    user, error_response, status = validate_user_role()
+    if error_response:
+        return error_response, status
+    
+    user_id = user.get('user_id')
+    is_admin = user.get('is_admin', False)
+    user_role = user.get('role')
+    
+    requested = request.args.get('user_id', '').strip()
+    if requested:
+        try:
+            user_ids = list(dict.fromkeys(int(value) for value in requested.split(',') if value.strip()))
+        except ValueError:
+            # HELPER: simple_error_response - Lista de usuarios inválida
+            return simple_error_response('user_id debe ser un entero o una lista separada por comas', 400)
+    else:
+        user_ids = [user_id]
+    
+    if not is_admin and user_role != 'teacher' and user_ids != [user_id]:
+        # HELPER: simple_error_response - Solo el propio progreso
+        return simple_error_response('No autorizado para ver el progreso de otros usuarios', 403)
+    
+    if len(user_ids) > 100:
+        # HELPER: simple_error_response - Grupo demasiado grande
+        return simple_error_response('Máximo 100 usuarios por consulta', 400)
+    
+    # HELPER: progress_service.summaries - Una consulta agregada para los usuarios que no están en caché
+    summaries = progress_service.summaries(user_ids, course_id=request.args.get('course_id', type=int))
+    
+    results = [{'user_id': summary_user_id, 'courses': summaries[summary_user_id]} for summary_user_id in user_ids]
+    
+    # HELPER: simple_success_response - Resumen de progreso
+    return simple_success_response(results, 'Resumen de progreso por curso')
+
 # GET/PUT/DELETE: Operaciones CRUD para progreso específico
 @api.route('/userprogress/<int:progress_id>', methods=['GET', 'PUT', 'DELETE'])
 @jwt_required()
@@ -2474,6 +3462,9 @@ def user_progress_detail(progress_id):
         
         db.session.commit()
         
+        # HELPER: progress_service.invalidate - El resumen del usuario ya no es válido
+        progress_service.invalidate(row.user_id)
+        
         # HELPER: simple_success_response - Progreso actualizado
         return simple_success_response(row.serialize(), f'Progreso {progress_id} actualizado')
 
@@ -2482,9 +3473,13 @@ def user_progress_detail(progress_id):
             # HELPER: simple_error_response - Solo admin puede eliminar
             return simple_error_response('Solo administradores pueden eliminar progreso', 403)
         
+        progress_user_id = row.user_id
         db.session.delete(row)
         db.session.commit()
         
+        # HELPER: progress_service.invalidate - El resumen del usuario ya no es válido
+        progress_service.invalidate(progress_user_id)
+        
         # HELPER: simple_success_response - Progreso eliminado
         return simple_success_response({}, f'Progreso {progress_id} eliminado')
     
@@ -2531,8 +3526,11 @@ def achievements():
         db.session.add(row)
         db.session.commit()
         
+        # HELPER: achievement_service.refresh - Recargar umbrales de logros
+        achievement_service.refresh()
+        
         # HELPER: simple_success_response - Logro creado
-        return simple_success_response(row.serialize(), 'Logro creado'), 201
+        return {'message': 'Logro creado', 'results': row.serialize()}, 201
     
     # HELPER: method_not_allowed_response - Método no permitido
     return method_not_allowed_response()
@@ -2576,6 +3574,9 @@ def achievement(achievement_id):
         
         db.session.commit()
         
+        # HELPER: achievement_service.refresh - Recargar umbrales de logros
+        achievement_service.refresh()
+        
         # HELPER: simple_success_response - Logro actualizado
         return simple_success_response(row.serialize(), f'Logro {achievement_id} actualizado')
     
@@ -2587,6 +3588,9 @@ def achievement(achievement_id):
         db.session.delete(row)
         db.session.commit()
         
+        # HELPER: achievement_service.refresh - Recargar umbrales de logros
+        achievement_service.refresh()
+        
         # HELPER: simple_success_response - Logro eliminado
         return simple_success_response({}, f'Logro {achievement_id} eliminado')
     
@@ -2608,10 +3612,10 @@ def user_achievements():
     if request.method == 'GET':
 
         # Alumno solo puede ver sus propios logros
-        if user.get('role') == 'alumno':
+        if user_role != 'teacher' and not is_admin:
             rows = db.session.execute(
                 db.select(UserAchievements).where(
-                    UserAchievements.user_id == user.get('id') )).scalars().all()
+                    UserAchievements.user_id == user.get('user_id'))).scalars().all()
         else:
             # Admin y Teacher ven todos
             rows = db.session.execute(
@@ -2754,6 +3758,7 @@ def user_achievement(user_achievement_id):
 # GET/POST: Operaciones CRUD de recursos multimedia
 @api.route('/multimedia-resources', methods=['GET', 'POST'])
 @jwt_required()
+@catalog_cache.invalidates
 def multimedia_resources():
     # HELPER: validate_user_role - Verificar usuario autenticado
     user, error_response, status = validate_user_role()
@@ -2764,8 +3769,9 @@ def multimedia_resources():
     user_role = user.get('role')
     
     if request.method == 'GET':
-        rows = db.session.execute(db.select(MultimediaResources)).scalars()
-        results = [row.serialize() for row in rows]
+        # HELPER: multimedia_serializer - Solo las columnas necesarias, sin instanciar modelos
+        rows = db.session.execute(multimedia_serializer.select()).all()
+        results = multimedia_serializer.many(rows)
         
         # HELPER: simple_success_response - Lista de recursos multimedia
         return simple_success_response(results, 'Listado de recursos multimedia')
@@ -2833,6 +3839,7 @@ def multimedia_resources():
 # GET/PUT/DELETE: Operaciones CRUD para recurso multimedia específico
 @api.route('/multimedia-resources/<int:resource_id>', methods=['GET', 'PUT', 'DELETE'])
 @jwt_required()
+@catalog_cache.invalidates
 def multimedia_resource(resource_id):
     # HELPER: validate_user_role - Verificar usuario autenticado
     user, error_response, status = validate_user_role()
@@ -2932,100 +3939,19 @@ def stripe_webhook():
         event = verification_result['event']
         event_type = verification_result['type']
     
-    try:
-        if event_type == 'payment_intent.succeeded':
-            payment_intent = event['data']['object']
-            stripe_payment_id = payment_intent['id']
-            
-            purchase = db.session.execute(
-                db.select(Purchases).where(
-                    Purchases.stripe_payment_intent_id == stripe_payment_id
-                )
-            ).scalar()
-            
-            if purchase:
-                if purchase.status != 'pending':
-                    pass
-                
-                purchase.status = 'paid'
-                purchase.start_date = datetime.now(timezone.utc)
-                
-                user = db.session.execute(
-                    db.select(Users).where(Users.user_id == purchase.user_id)
-                ).scalar()
-                
-                if user:
-                    course = db.session.execute(
-                        db.select(Courses).where(Courses.course_id == purchase.course_id)
-                    ).scalar()
-                    
-                    if course and course.points > 0:
-                        existing_points = db.session.execute(
-                            db.select(UserPoints).where(
-                                UserPoints.user_id == purchase.user_id,
-                                UserPoints.event_description.like(f"%Compra {purchase.purchase_id}%")
-                            )
-                        ).scalar()
-                        
-                        if not existing_points:
-                            user_point = UserPoints(
-                                user_id=purchase.user_id,
-                                points=course.points,
-                                type='course_purchase',
-                                event_description=f"Compra {purchase.purchase_id} del curso: {course.title}",
-                                date=datetime.now(timezone.utc)
-                            )
-                            db.session.add(user_point)
-                            
-                            user.current_points = (user.current_points or 0) + course.points
-                
-                db.session.commit()
-                
-            else:
-                metadata = payment_intent.get('metadata', {})
-                purchase_id_from_meta = metadata.get('purchase_id')
-                
-                if purchase_id_from_meta:
-                    purchase = db.session.execute(
-                        db.select(Purchases).where(Purchases.purchase_id == int(purchase_id_from_meta))
-                    ).scalar()
-                    
-                    if purchase:
-                        purchase.status = 'paid'
-                        purchase.start_date = datetime.now(timezone.utc)
-                        purchase.stripe_payment_intent_id = stripe_payment_id
-                        db.session.commit()
-        
-        elif event_type == 'payment_intent.payment_failed':
-            payment_intent = event['data']['object']
-            stripe_payment_id = payment_intent['id']
-            
-            purchase = db.session.execute(
-                db.select(Purchases).where(
-                    Purchases.stripe_payment_intent_id == stripe_payment_id
-                )
-            ).scalar()
-            
-            if purchase:
-                purchase.status = 'cancelled'
-                db.session.commit()
-        
-        elif event_type == 'checkout.session.completed':
-            pass
-        
-        elif event_type == 'charge.refunded':
-            pass
+    event_id = event.get('id') if hasattr(event, 'get') else None
+    if not event_id:
+        # HELPER: simple_error_response - Evento sin id
+        return simple_error_response('El evento no tiene id', 400)
     
-    except Exception as e:
-        import traceback
-        traceback.print_exc()
-        
-        # HELPER: simple_error_response - Error al procesar webhook
-        return simple_error_response(str(e), 200)
+    # HELPER: stripe_webhook_service.enqueue - Guardar el evento y responder ya; lo procesa 'flask process-stripe-webhooks'
+    queued = stripe_webhook_service.enqueue(event_id, event_type, payload)
+    db.session.commit()
     
-    # HELPER: simple_success_response - Webhook procesado
+    # HELPER: simple_success_response - Webhook recibido
     return simple_success_response({
+        'event_id': event_id,
         'event_type': event_type,
-        'processed': True,
+        'queued': queued,
         'timestamp': datetime.now(timezone.utc).isoformat()
-    }, 'Webhook procesado exitosamente')
\ No newline at end of file
+    }, 'Webhook recibido' if queued else 'Webhook ya recibido anteriormente')
\ No newline at end of file
@@ -0,0 +1,351 @@
+"""
+seed_service.py
+Generador de datos masivos y coherentes para reproducir en local problemas de rendimiento
+"""
+import csv
+import io
+import random
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from api.models import (db, Users, Courses, Modules, Lessons, MultimediaResources, Purchases,
+                        UserPoints, UserPointsTotals, UserProgress, Achievements, UserAchievements)
+from api.password_service import password_service
+from api.points_service import SOURCE_LESSON, SOURCE_PURCHASE
+
+# Fecha fija de referencia: con la misma semilla se generan exactamente los mismos datos
+SEED_REFERENCE_DATE = datetime(2025, 1, 1)
+
+SEED_PASSWORD = "password123"
+
+FIRST_NAMES = ["Ana", "Luis", "María", "Carlos", "Lucía", "Javier", "Sofía", "Diego", "Elena", "Pablo",
+               "Laura", "Miguel", "Carmen", "Andrés", "Paula", "Jorge", "Marta", "Raúl", "Sara", "Hugo"]
+LAST_NAMES = ["García", "Martínez", "López", "Sánchez", "Pérez", "Gómez", "Martín", "Jiménez", "Ruiz",
+              "Hernández", "Díaz", "Moreno", "Álvarez", "Romero", "Navarro", "Torres", "Domínguez", "Gil"]
+
+ACHIEVEMENTS = [
+    ("Primeros pasos", "Consigue tus primeros 10 puntos", 10, "star"),
+    ("Aprendiz", "Alcanza 100 puntos", 100, "book"),
+    ("Constante", "Alcanza 250 puntos", 250, "calendar"),
+    ("Avanzado", "Alcanza 500 puntos", 500, "rocket"),
+    ("Experto", "Alcanza 1000 puntos", 1000, "trophy"),
+    ("Maestro", "Alcanza 2500 puntos", 2500, "crown"),
+]
+
+LESSON_POINTS = 10
+MODULE_POINTS = 50
+
+MEDIA_TYPES = [
+    ("video", "videos", ".mp4"),
+    ("image", "images", ".png"),
+    ("document", "documents", ".pdf"),
+]
+
+
+class DatasetSeeder:
+    """
+    Genera usuarios, catálogo, compras, historial de puntos, progreso y logros coherentes entre sí.
+    Usa COPY en PostgreSQL e INSERT de varias filas (executemany) en el resto de bases de datos
+    """
+
+    def __init__(self, users=1000, courses=None, modules_per_course=5, lessons_per_module=8,
+                 media_per_lesson=2, purchases_per_student=3, seed=42, batch_size=5000):
+        self.users = users
+        self.courses = courses or max(users // 100, 5)
+        self.modules_per_course = modules_per_course
+        self.lessons_per_module = lessons_per_module
+        self.media_per_lesson = media_per_lesson
+        self.purchases_per_student = purchases_per_student
+        self.batch_size = batch_size
+        self.rng = random.Random(seed)
+        self.use_copy = db.engine.dialect.name == 'postgresql'
+        self.inserted = {}
+
+    # ---------- escritura ----------
+
+    def _write(self, model, columns, rows):
+        """Inserta filas (tuplas en el orden de columns) en la tabla del modelo"""
+        if not rows:
+            return
+
+        table = model.__table__
+        if self.use_copy:
+            buffer = io.StringIO()
+            csv.writer(buffer).writerows(rows)
+            buffer.seek(0)
+            column_list = ", ".join(f'"{column}"' for column in columns)
+            cursor = db.session.connection().connection.dbapi_connection.cursor()
+            cursor.copy_expert(f'COPY "{table.name}" ({column_list}) FROM STDIN WITH (FORMAT csv)', buffer)
+            cursor.close()
+        else:
+            db.session.execute(table.insert(), [dict(zip(columns, row)) for row in rows])
+
+        self.inserted[table.name] = self.inserted.get(table.name, 0) + len(rows)
+
+    def _next_id(self, column):
+        return (db.session.execute(db.select(db.func.max(column))).scalar() or 0) + 1
+
+    def _reset_sequences(self):
+        """Tras insertar con IDs explícitos, PostgreSQL necesita ajustar las secuencias"""
+        if not self.use_copy:
+            return
+
+        for column in (Users.user_id, Courses.course_id, Modules.module_id, Lessons.lesson_id,
+                       MultimediaResources.resource_id, Purchases.purchase_id, UserPoints.point_id,
+                       UserProgress.progress_id, Achievements.achievement_id,
+                       UserAchievements.user_achievement_id):
+            table = column.table.name
+            db.session.execute(db.text(
+                f"SELECT setval(pg_get_serial_sequence('{table}', '{column.name}'), "
+                f"COALESCE((SELECT MAX(\"{column.name}\") FROM \"{table}\"), 1))"
+            ))
+
+    # ---------- generación ----------
+
+    def _random_date(self, start, end):
+        span = max(int((end - start).total_seconds()), 1)
+        return start + timedelta(seconds=self.rng.randrange(span))
+
+    def _seed_achievements(self):
+        existing = db.session.execute(
+            db.select(Achievements.achievement_id, Achievements.required_points)
+        ).all()
+        if existing:
+            return sorted(existing, key=lambda row: row[1])
+
+        next_id = self._next_id(Achievements.achievement_id)
+        rows = [(next_id + index, name, description, points, icon)
+                for index, (name, description, points, icon) in enumerate(ACHIEVEMENTS)]
+        self._write(Achievements, ['achievement_id', 'name', 'description', 'required_points', 'icon'], rows)
+        return [(row[0], row[3]) for row in rows]
+
+    def _plan_users(self, first_user_id):
+        """Decide el rol de cada usuario: 1 admin, ~2% profesores, ~3% demo y el resto estudiantes"""
+        teachers = max(self.users // 50, 1)
+        demos = self.users // 33
+        roles = []
+        for index in range(self.users):
+            if index == 0:
+                roles.append(('teacher', True))
+            elif index <= teachers:
+                roles.append(('teacher', False))
+            elif index <= teachers + demos:
+                roles.append(('demo', False))
+            else:
+                roles.append(('student', False))
+
+        teacher_ids = [first_user_id + index for index, (role, _) in enumerate(roles) if role == 'teacher']
+        return roles, teacher_ids
+
+    def _seed_catalog(self, teacher_ids):
+        """Cursos → módulos → lecciones → multimedia. Devuelve la estructura necesaria para el progreso"""
+        course_id = self._next_id(Courses.course_id)
+        module_id = self._next_id(Modules.module_id)
+        lesson_id = self._next_id(Lessons.lesson_id)
+        resource_id = self._next_id(MultimediaResources.resource_id)
+
+        catalog = []
+        courses, modules, lessons, media = [], [], [], []
+        columns = {
+            Courses: ['course_id', 'title', 'description', 'price', 'is_active', 'creation_date', 'points', 'created_by'],
+            Modules: ['module_id', 'title', 'order', 'points', 'is_active', 'course_id'],
+            Lessons: ['lesson_id', 'title', 'content', 'learning_objective', 'order', 'trial_visible', 'is_active', 'module_id'],
+            MultimediaResources: ['resource_id', 'type', 'url', 'duration_seconds', 'description', 'order', 'lesson_id'],
+        }
+
+        for _ in range(self.courses):
+            price = Decimal(self.rng.choice([0, 19, 29, 49, 79, 99])) + Decimal("0.99") \
+                if self.rng.random() > 0.1 else Decimal("0")
+            course_points = self.rng.choice([50, 100, 150, 200])
+            created = self._random_date(SEED_REFERENCE_DATE - timedelta(days=900), SEED_REFERENCE_DATE - timedelta(days=400))
+            courses.append((
+                course_id, f"Curso {course_id}", f"Curso de lengua de signos número {course_id}",
+                price, self.rng.random() > 0.05, created, course_points,
+                self.rng.choice(teacher_ids)
+            ))
+
+            course_modules = []
+            for module_order in range(1, self.modules_per_course + 1):
+                modules.append((module_id, f"Módulo {module_order}", module_order, MODULE_POINTS, True, course_id))
+
+                module_lessons = []
+                for lesson_order in range(1, self.lessons_per_module + 1):
+                    lessons.append((
+                        lesson_id, f"Lección {module_order}.{lesson_order}",
+                        f"Contenido de la lección {lesson_id}", f"Objetivo de la lección {lesson_id}",
+                        lesson_order, module_order == 1 and lesson_order <= 2, True, module_id
+                    ))
+
+                    for media_order in range(1, self.media_per_lesson + 1):
+                        media_type, folder, extension = self.rng.choice(MEDIA_TYPES)
+                        media.append((
+                            resource_id, media_type,
+                            f"https://res.cloudinary.com/seed/{folder}/lesson_{lesson_id}_{media_order}{extension}",
+                            self.rng.randint(30, 600) if media_type == 'video' else None,
+                            f"Recurso {media_order}", media_order, lesson_id
+                        ))
+                        resource_id += 1
+
+                    module_lessons.append(lesson_id)
+                    lesson_id += 1
+
+                course_modules.append(module_lessons)
+                module_id += 1
+
+            catalog.append({'course_id': course_id, 'price': price, 'points': course_points,
+                            'created': created, 'modules': course_modules})
+            course_id += 1
+
+        for model, rows in ((Courses, courses), (Modules, modules), (Lessons, lessons), (MultimediaResources, media)):
+            for start in range(0, len(rows), self.batch_size):
+                self._write(model, columns[model], rows[start:start + self.batch_size])
+
+        return catalog
+
+    def _student_activity(self, user_id, registered, catalog, ids, rows):
+        """Compras, progreso, historial de puntos de un estudiante. Devuelve sus puntos totales"""
+        total = 0
+        count = min(self.rng.randint(0, self.purchases_per_student * 2), len(catalog))
+
+        for course in self.rng.sample(catalog, count):
+            status = self.rng.choices(['paid', 'pending', 'cancelled'], weights=[85, 10, 5])[0]
+            purchased = self._random_date(max(registered, course['created']), SEED_REFERENCE_DATE)
+            purchase_id = ids['purchase']
+            rows['purchases'].append((
+                purchase_id, purchased, course['price'], course['price'], status, purchased,
+                course['course_id'], user_id
+            ))
+            ids['purchase'] += 1
+
+            if status != 'paid':
+                continue
+
+            rows['points'].append((ids['point'], course['points'], 'course',
+                                   f"Compra del curso {course['course_id']}", purchased,
+                                   SOURCE_PURCHASE, purchase_id, user_id))
+            ids['point'] += 1
+            total += course['points']
+
+            # Avance secuencial: se completan las primeras lecciones y queda una en curso
+            course_lessons = [lesson for module in course['modules'] for lesson in module]
+            completed_count = int(len(course_lessons) * self.rng.random() ** 2)
+            moment = purchased
+
+            for position, lesson in enumerate(course_lessons[:completed_count + 1]):
+                started = moment + timedelta(minutes=self.rng.randint(5, 60 * 48))
+                completed = position < completed_count
+                finished = started + timedelta(minutes=self.rng.randint(5, 90)) if completed else None
+                moment = finished or started
+
+                rows['progress'].append((ids['progress'], completed, started, finished, user_id, lesson))
+                ids['progress'] += 1
+
+                if completed:
+                    rows['points'].append((ids['point'], LESSON_POINTS, 'lesson',
+                                           f"Lección {lesson} completada", finished,
+                                           SOURCE_LESSON, lesson, user_id))
+                    ids['point'] += 1
+                    total += LESSON_POINTS
+
+            done = 0
+            for module_index, module in enumerate(course['modules']):
+                done += len(module)
+                if done > completed_count:
+                    break
+                rows['points'].append((ids['point'], MODULE_POINTS, 'module',
+                                       f"Módulo {module_index + 1} del curso {course['course_id']} completado",
+                                       moment, None, None, user_id))
+                ids['point'] += 1
+                total += MODULE_POINTS
+
+        return total
+
+    def run(self, echo=print):
+        """
+        Genera el dataset completo. Hace commit tras cada bloque de usuarios
+
+        Returns:
+            dict: Filas insertadas por tabla
+        """
+        started = time.monotonic()
+        password_hash = password_service.hash_password(SEED_PASSWORD)
+
+        first_user_id = self._next_id(Users.user_id)
+        roles, teacher_ids = self._plan_users(first_user_id)
+        achievements = self._seed_achievements()
+
+        # Los profesores deben existir antes que sus cursos
+        user_columns = ['user_id', 'first_name', 'last_name', 'role', 'email', 'password_hash', 'current_points',
+                        'is_active', 'is_admin', 'registration_date', 'trial_end_date']
+        teacher_rows = []
+        for index, (role, is_admin) in enumerate(roles):
+            if role != 'teacher':
+                continue
+            user_id = first_user_id + index
+            teacher_rows.append(self._user_row(user_id, role, is_admin, password_hash, 0))
+        self._write(Users, user_columns, teacher_rows)
+
+        catalog = self._seed_catalog(teacher_ids)
+        db.session.commit()
+        echo(f"Catalog: {len(catalog)} courses, {self.inserted.get('lessons', 0)} lessons "
+             f"({time.monotonic() - started:.1f}s)")
+
+        ids = {
+            'purchase': self._next_id(Purchases.purchase_id),
+            'point': self._next_id(UserPoints.point_id),
+            'progress': self._next_id(UserProgress.progress_id),
+            'user_achievement': self._next_id(UserAchievements.user_achievement_id),
+        }
+        chunk_users = max(self.batch_size // 50, 1)
+
+        for chunk_start in range(0, self.users, chunk_users):
+            rows = {'users': [], 'totals': [], 'purchases': [], 'points': [], 'progress': [], 'achievements': []}
+
+            for index in range(chunk_start, min(chunk_start + chunk_users, self.users)):
+                role, is_admin = roles[index]
+                if role == 'teacher':
+                    continue
+
+                user_id = first_user_id + index
+                registered = self._random_date(SEED_REFERENCE_DATE - timedelta(days=730), SEED_REFERENCE_DATE)
+                total = self._student_activity(user_id, registered, catalog, ids, rows) if role == 'student' else 0
+
+                rows['users'].append(self._user_row(user_id, role, is_admin, password_hash, total, registered))
+                if total:
+                    rows['totals'].append((user_id, total, SEED_REFERENCE_DATE))
+
+                for achievement_id, required_points in achievements:
+                    if required_points > total:
+                        break
+                    rows['achievements'].append((ids['user_achievement'], SEED_REFERENCE_DATE, user_id, achievement_id))
+                    ids['user_achievement'] += 1
+
+            self._write(Users, user_columns, rows['users'])
+            self._write(UserPointsTotals, ['user_id', 'total_points', 'updated_at'], rows['totals'])
+            self._write(Purchases, ['purchase_id', 'purchase_date', 'price', 'total', 'status', 'start_date',
+                                    'course_id', 'user_id'], rows['purchases'])
+            self._write(UserPoints, ['point_id', 'points', 'type', 'event_description', 'date', 'source_type',
+                                     'source_id', 'user_id'], rows['points'])
+            self._write(UserProgress, ['progress_id', 'completed', 'start_date', 'completion_date', 'user_id',
+                                       'lesson_id'], rows['progress'])
+            self._write(UserAchievements, ['user_achievement_id', 'obtained_date', 'user_id', 'achievement_id'],
+                        rows['achievements'])
+            db.session.commit()
+
+            echo(f"Users {min(chunk_start + chunk_users, self.users)}/{self.users}: "
+                 f"{sum(self.inserted.values())} rows ({time.monotonic() - started:.1f}s)")
+
+        self._reset_sequences()
+        db.session.commit()
+
+        return dict(self.inserted)
+
+    def _user_row(self, user_id, role, is_admin, password_hash, points, registered=None):
+        registered = registered or self._random_date(SEED_REFERENCE_DATE - timedelta(days=1000),
+                                                     SEED_REFERENCE_DATE - timedelta(days=900))
+        return (
+            user_id, self.rng.choice(FIRST_NAMES), self.rng.choice(LAST_NAMES), role,
+            f"seed_user{user_id}@example.com", password_hash, points, True, is_admin, registered,
+            registered + timedelta(days=7) if role == 'demo' else None
+        )
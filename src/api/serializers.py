@@ -0,0 +1,165 @@
+"""
+serializers.py
+Serializadores por proyección de columnas para los listados grandes: seleccionan solo
+las columnas necesarias como filas Core (sin instanciar modelos del ORM) y las convierten
+a diccionario con una función compilada una sola vez por modelo
+"""
+import os
+
+from flask.json.provider import DefaultJSONProvider
+
+from api.models import db, Users, Purchases, MultimediaResources, UserProgress
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def isoformat_or_none(value):
+    return value.isoformat() if value else None
+
+
+def float_or_none(value):
+    return float(value) if value else None
+
+
+class RowSerializer:
+    """
+    Convierte filas Core a diccionarios con las mismas claves y valores que serialize() del modelo
+
+    Args:
+        fields (list): Tuplas (clave, columna) o (clave, columna, conversor) en el orden de salida
+    """
+
+    def __init__(self, fields):
+        self.columns = [field[1] for field in fields]
+        self.convert = self._compile(fields)
+
+    @staticmethod
+    def _compile(fields):
+        # Se genera una función con un literal de diccionario por fila:
+        # evita bucles y llamadas por campo al serializar miles de filas
+        namespace = {}
+        items = []
+        for index, field in enumerate(fields):
+            key, converter = field[0], field[2] if len(field) > 2 else None
+            if converter is None:
+                items.append(f"{key!r}: row[{index}]")
+            else:
+                namespace[f"convert_{index}"] = converter
+                items.append(f"{key!r}: convert_{index}(row[{index}])")
+
+        source = "def convert(row):\n    return {" + ", ".join(items) + "}\n"
+        exec(source, namespace)
+        return namespace['convert']
+
+    def select(self):
+        """SELECT con solo las columnas del serializador"""
+        return db.select(*self.columns)
+
+    def many(self, rows):
+        convert = self.convert
+        return [convert(row) for row in rows]
+
+
+# Misma salida que Users.serialize()
+user_serializer = RowSerializer([
+    ('user_id', Users.user_id),
+    ('first_name', Users.first_name),
+    ('last_name', Users.last_name),
+    ('email', Users.email),
+    ('role', Users.role),
+    ('current_points', Users.current_points),
+    ('is_active', Users.is_active),
+    ('is_admin', Users.is_admin),
+    ('registration_date', Users.registration_date, isoformat_or_none),
+    ('trial_end_date', Users.trial_end_date, isoformat_or_none),
+    ('last_access', Users.last_access, isoformat_or_none),
+    ('deleted_at', Users.deleted_at, isoformat_or_none),
+    ('original_email', Users.original_email),
+])
+
+# Datos de estudiante que ve un profesor en /users
+student_serializer = RowSerializer([
+    ('user_id', Users.user_id),
+    ('first_name', Users.first_name),
+    ('last_name', Users.last_name),
+    ('email', Users.email),
+    ('current_points', Users.current_points),
+    ('role', Users.role),
+])
+
+# Misma salida que Purchases.serialize()
+purchase_serializer = RowSerializer([
+    ('purchase_id', Purchases.purchase_id),
+    ('purchase_date', Purchases.purchase_date, isoformat_or_none),
+    ('price', Purchases.price, float_or_none),
+    ('total', Purchases.total, float_or_none),
+    ('status', Purchases.status),
+    ('start_date', Purchases.start_date, isoformat_or_none),
+    ('course_id', Purchases.course_id),
+    ('user_id', Purchases.user_id),
+])
+
+# Misma salida que MultimediaResources.serialize()
+multimedia_serializer = RowSerializer([
+    ('resource_id', MultimediaResources.resource_id),
+    ('lesson_id', MultimediaResources.lesson_id),
+    ('type', MultimediaResources.type),
+    ('url', MultimediaResources.url),
+    ('duration_seconds', MultimediaResources.duration_seconds),
+    ('description', MultimediaResources.description),
+    ('order', MultimediaResources.order),
+])
+
+# Misma salida que UserProgress.serialize()
+progress_serializer = RowSerializer([
+    ('progress_id', UserProgress.progress_id),
+    ('user_id', UserProgress.user_id),
+    ('lesson_id', UserProgress.lesson_id),
+    ('completed', UserProgress.completed),
+    ('start_date', UserProgress.start_date, isoformat_or_none),
+    ('completion_date', UserProgress.completion_date, isoformat_or_none),
+])
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """
+    Proveedor JSON de Flask basado en orjson. Mantiene las claves ordenadas y delega
+    en el proveedor por defecto los tipos que orjson no conoce (Decimal, fechas, etc.)
+    """
+
+    def __init__(self, app):
+        super().__init__(app)
+        self.option = orjson.OPT_SORT_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=self.default, option=self.option).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        option = self.option
+        if self._app.debug:
+            option |= orjson.OPT_INDENT_2
+        return self._app.response_class(
+            orjson.dumps(obj, default=self.default, option=option) + b"\n",
+            mimetype=self.mimetype
+        )
+
+
+def setup_json_provider(app):
+    """
+    Usa orjson para las respuestas JSON si JSON_PROVIDER=orjson y el paquete está instalado
+    """
+    if os.getenv("JSON_PROVIDER", "").lower() != "orjson":
+        return
+
+    if orjson is None:
+        print("⚠️ ADVERTENCIA: JSON_PROVIDER=orjson pero orjson no está instalado, se usa el JSON por defecto")
+        return
+
+    app.json = OrjsonProvider(app)
@@ -0,0 +1,90 @@
+"""
+sql_instrumentation.py
+Instrumentación SQL por petición: número de sentencias, tiempo en base de datos,
+cabecera Server-Timing y aviso de posibles N+1
+"""
+import os
+import time
+from collections import Counter
+
+from flask import g, has_app_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+SQL_INSTRUMENTATION = os.getenv("SQL_INSTRUMENTATION", "1") == "1"
+
+# Una misma sentencia (mismo SQL, distintos parámetros) ejecutada más veces que esto
+# dentro de una petición se considera un N+1
+SQL_N_PLUS_ONE_THRESHOLD = int(os.getenv("SQL_N_PLUS_ONE_THRESHOLD", "5"))
+
+
+class RequestSqlStats:
+    """Estadísticas SQL de una petición"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.count = 0
+        self.duration = 0.0
+        self.shapes = Counter()
+
+    def repeated_shapes(self, threshold):
+        return [(statement, times) for statement, times in self.shapes.most_common() if times > threshold]
+
+
+def _current_stats():
+    if not has_app_context():
+        return None
+    return g.get('sql_stats')
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # El inicio va en el contexto de ejecución, que se descarta con la sentencia aunque falle;
+    # en conn.info quedaría en la conexión del pool y desajustaría las mediciones siguientes
+    if context is not None and _current_stats() is not None:
+        context._sql_timing_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current_stats()
+    started = getattr(context, '_sql_timing_start', None)
+    if stats is None or started is None:
+        return
+
+    stats.count += 1
+    stats.duration += time.perf_counter() - started
+    stats.shapes[statement] += 1
+
+
+def setup_sql_instrumentation(app):
+    """
+    Registra los eventos del engine y los hooks de la app. Se desactiva con SQL_INSTRUMENTATION=0
+    """
+    if not SQL_INSTRUMENTATION:
+        return
+
+    event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+
+    @app.before_request
+    def start_sql_stats():
+        g.sql_stats = RequestSqlStats()
+
+    @app.after_request
+    def report_sql_stats(response):
+        stats = g.pop('sql_stats', None)
+        if stats is None:
+            return response
+
+        total_ms = (time.perf_counter() - stats.started) * 1000
+        response.headers.add(
+            'Server-Timing',
+            f'db;dur={stats.duration * 1000:.2f};desc="{stats.count} queries", app;dur={total_ms:.2f}'
+        )
+
+        for statement, times in stats.repeated_shapes(SQL_N_PLUS_ONE_THRESHOLD):
+            app.logger.warning(
+                "Posible N+1 en %s %s: la misma consulta se ejecutó %d veces: %s",
+                request.method, request.path, times, " ".join(statement.split())[:300]
+            )
+
+        return response
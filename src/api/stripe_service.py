@@ -2,20 +2,125 @@
 stripe_service.py
 Servicio para manejar todas las operaciones con Stripe
 """
+import json
 import os
+import time
+import uuid
+import zlib
+import requests
 import stripe
 from datetime import datetime, timezone
 from flask import current_app
+from requests.adapters import HTTPAdapter
+
+from .metrics import external_call
 
 # Configurar Stripe
 stripe.api_key = os.getenv("STRIPE_SECRET_KEY")
 STRIPE_WEBHOOK_SECRET = os.getenv("STRIPE_WEBHOOK_SECRET", "")
 
+# Límites de las llamadas HTTP a Stripe: (conexión, lectura) en segundos
+STRIPE_CONNECT_TIMEOUT = float(os.getenv("STRIPE_CONNECT_TIMEOUT", "3"))
+STRIPE_READ_TIMEOUT = float(os.getenv("STRIPE_READ_TIMEOUT", "10"))
+STRIPE_MAX_NETWORK_RETRIES = int(os.getenv("STRIPE_MAX_NETWORK_RETRIES", "2"))
+STRIPE_HTTP_POOL_SIZE = int(os.getenv("STRIPE_HTTP_POOL_SIZE", "10"))
+
+
+def build_stripe_http_client():
+    """
+    Cliente HTTP compartido por todos los hilos del proceso: reutiliza conexiones TLS
+    con api.stripe.com y acota el tiempo de cada llamada
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=STRIPE_HTTP_POOL_SIZE)
+    session.mount("https://", adapter)
+    return stripe.RequestsClient(timeout=(STRIPE_CONNECT_TIMEOUT, STRIPE_READ_TIMEOUT), session=session)
+
+
+class LocalStripeClient(stripe.HTTPClient):
+    """
+    Sustituto local de la API de PaymentIntents para desarrollo y pruebas sin red.
+    El estado de cada PaymentIntent se deriva de su id, así las ejecuciones son reproducibles
+    """
+
+    name = "local"
+    # La librería exige una clave antes de llamar al cliente HTTP; con el sustituto no se envía a ningún sitio
+    api_key = "sk_test_local"
+
+    def __init__(self, latency_ms=None):
+        super().__init__()
+        self.latency = float(os.getenv("STRIPE_FAKE_LATENCY_MS", "0") if latency_ms is None else latency_ms) / 1000
+
+    @staticmethod
+    def status_for(payment_intent_id):
+        bucket = zlib.crc32(payment_intent_id.encode()) % 10
+        if bucket < 7:
+            return 'succeeded'
+        if bucket < 9:
+            return 'canceled'
+        return 'requires_payment_method'
+
+    @staticmethod
+    def _payment_intent(payment_intent_id, status):
+        return {
+            'id': payment_intent_id,
+            'object': 'payment_intent',
+            'status': status,
+            'client_secret': f"{payment_intent_id}_secret_local"
+        }
+
+    def request(self, method, url, headers, post_data=None):
+        if self.latency:
+            time.sleep(self.latency)
+
+        path = url.split('/v1/', 1)[-1].split('?', 1)[0].rstrip('/')
+        if method == 'post' and path == 'payment_intents':
+            key = (headers or {}).get('Idempotency-Key') or uuid.uuid4().hex
+            body = self._payment_intent(f"pi_local_{key}", 'requires_payment_method')
+        elif method == 'get' and path.startswith('payment_intents/'):
+            payment_intent_id = path.split('/', 1)[1]
+            body = self._payment_intent(payment_intent_id, self.status_for(payment_intent_id))
+        else:
+            return json.dumps({'error': {'type': 'invalid_request_error',
+                                         'message': f"No soportado en local: {method.upper()} /v1/{path}"}}).encode(), 404, {}
+
+        return json.dumps(body).encode(), 200, {}
+
+    def request_stream(self, method, url, headers, post_data=None):
+        return self.request(method, url, headers, post_data)
+
+    def close(self):
+        pass
+
+
+def use_local_stripe(latency_ms=None):
+    """Sustituye la API de Stripe por LocalStripeClient en este proceso"""
+    stripe.default_http_client = LocalStripeClient(latency_ms)
+
+
+def request_api_key():
+    """
+    Clave de cada llamada a Stripe. Con LocalStripeClient no depende de stripe.api_key,
+    que app.py vuelve a asignar desde STRIPE_SECRET_KEY (vacía en local) después de importar este módulo
+    """
+    if isinstance(stripe.default_http_client, LocalStripeClient):
+        return LocalStripeClient.api_key
+    return stripe.api_key
+
+
+if os.getenv("STRIPE_FAKE_API") == "1":
+    use_local_stripe()
+else:
+    stripe.default_http_client = build_stripe_http_client()
+# Los reintentos son seguros: las creaciones llevan clave de idempotencia
+stripe.max_network_retries = STRIPE_MAX_NETWORK_RETRIES
+
 class StripeService:
     """Servicio para operaciones con Stripe"""
     
     @staticmethod
-    def create_payment_intent(amount_cents, currency='usd', metadata=None, description="", customer_email=""):
+    def create_payment_intent(amount_cents, currency='usd', metadata=None, description="", customer_email="",
+                              idempotency_key=None):
         """
         Crea un PaymentIntent en Stripe
         
@@ -25,22 +130,26 @@ class StripeService:
             metadata (dict): Metadatos adicionales
             description (str): Descripción del pago
             customer_email (str): Email del cliente
+            idempotency_key (str): Repetir la llamada con la misma clave devuelve el mismo PaymentIntent
             
         Returns:
             dict: PaymentIntent creado
         """
         try:
-            payment_intent = stripe.PaymentIntent.create(
-                amount=amount_cents,
-                currency=currency,
-                metadata=metadata or {},
-                description=description[:300],  # Limitar longitud
-                receipt_email=customer_email if customer_email else None,
-                automatic_payment_methods={
-                    'enabled': True,
-                    'allow_redirects': 'never'
-                }
-            )
+            with external_call('stripe', 'create_payment_intent'):
+                payment_intent = stripe.PaymentIntent.create(
+                    amount=amount_cents,
+                    currency=currency,
+                    metadata=metadata or {},
+                    description=description[:300],  # Limitar longitud
+                    receipt_email=customer_email if customer_email else None,
+                    automatic_payment_methods={
+                        'enabled': True,
+                        'allow_redirects': 'never'
+                    },
+                    idempotency_key=idempotency_key,
+                    api_key=request_api_key()
+                )
             
             return {
                 'success': True,
@@ -76,7 +185,8 @@ class StripeService:
             dict: PaymentIntent recuperado o error
         """
         try:
-            payment_intent = stripe.PaymentIntent.retrieve(payment_intent_id)
+            with external_call('stripe', 'retrieve_payment_intent'):
+                payment_intent = stripe.PaymentIntent.retrieve(payment_intent_id, api_key=request_api_key())
             return {
                 'success': True,
                 'payment_intent': payment_intent,
@@ -128,7 +238,7 @@ class StripeService:
             }
     
     @staticmethod
-    def create_metadata_for_purchase(purchase_id, user_id, course_id, course_title):
+    def create_metadata_for_purchase(purchase_id, user_id, course_id, course_title, created_at=None):
         """
         Crea metadata estándar para pagos de cursos
         
@@ -137,6 +247,8 @@ class StripeService:
             user_id (int): ID del usuario
             course_id (int): ID del curso
             course_title (str): Título del curso
+            created_at (datetime): Fecha de la compra. Debe ser estable para que los reintentos
+                con la misma clave de idempotencia envíen los mismos parámetros
             
         Returns:
             dict: Metadata formateada para Stripe
@@ -146,9 +258,18 @@ class StripeService:
             'user_id': str(user_id),
             'course_id': str(course_id),
             'course_title': course_title[:100],  # Limitar longitud
-            'timestamp': datetime.now(timezone.utc).isoformat()
+            'timestamp': (created_at or datetime.now(timezone.utc)).isoformat()
         }
     
+    @staticmethod
+    def purchase_idempotency_key(purchase_id, amount_cents, attempt=0):
+        """
+        Clave de idempotencia de un PaymentIntent: una por compra, importe e intento.
+        El primer intento conserva el formato original para no cambiar la clave de las compras en curso
+        """
+        key = f"purchase_{purchase_id}_{amount_cents}"
+        return f"{key}_{attempt}" if attempt else key
+    
     @staticmethod
     def format_amount_for_stripe(amount):
         """
@@ -0,0 +1,274 @@
+"""
+stripe_webhook_service.py
+Bandeja de entrada de webhooks de Stripe: el endpoint solo guarda el evento (idempotente por event_id)
+y un worker los procesa por lotes
+"""
+import json
+import os
+import time
+from datetime import datetime, timezone
+
+from flask import current_app
+from sqlalchemy.orm import joinedload
+
+from api.models import db, dialect_insert, Purchases, StripeWebhookEvents
+from .points_service import points_service, SOURCE_PURCHASE
+
+STRIPE_WEBHOOK_BATCH_SIZE = int(os.getenv("STRIPE_WEBHOOK_BATCH_SIZE", "100"))
+STRIPE_WEBHOOK_MAX_ATTEMPTS = int(os.getenv("STRIPE_WEBHOOK_MAX_ATTEMPTS", "5"))
+
+
+class StripeWebhookService:
+    """Servicio para encolar y procesar eventos de webhook de Stripe"""
+
+    @staticmethod
+    def enqueue(event_id, event_type, payload):
+        """
+        Guarda el evento tal como llegó. Las reentregas del mismo event_id no hacen nada (no hace commit)
+
+        Returns:
+            bool: True si el evento es nuevo, False si ya estaba en la bandeja
+        """
+        statement = dialect_insert(StripeWebhookEvents).values(
+            event_id=event_id,
+            type=event_type,
+            payload=payload,
+            status='pending',
+            attempts=0,
+            received_at=datetime.now(timezone.utc)
+        ).on_conflict_do_nothing(
+            index_elements=[StripeWebhookEvents.event_id]
+        ).returning(StripeWebhookEvents.event_id)
+
+        return db.session.execute(statement).scalar() is not None
+
+    @staticmethod
+    def claim_batch(limit=STRIPE_WEBHOOK_BATCH_SIZE):
+        """
+        Toma los eventos pendientes más antiguos. En PostgreSQL quedan bloqueados (FOR UPDATE SKIP LOCKED)
+        hasta el commit del lote, así varios workers no procesan el mismo evento
+        """
+        return db.session.execute(
+            db.select(StripeWebhookEvents)
+            .where(StripeWebhookEvents.status == 'pending')
+            .order_by(StripeWebhookEvents.received_at, StripeWebhookEvents.event_id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        ).scalars().all()
+
+    @staticmethod
+    def _load_purchases(payment_intents):
+        """
+        Carga en una sola consulta las compras referenciadas por los payment intents del lote
+
+        Returns:
+            tuple: (compras por stripe_payment_intent_id, compras por purchase_id)
+        """
+        intent_ids = {intent.get('id') for intent in payment_intents if intent.get('id')}
+        purchase_ids = set()
+        for intent in payment_intents:
+            purchase_id = (intent.get('metadata') or {}).get('purchase_id')
+            if purchase_id and str(purchase_id).isdigit():
+                purchase_ids.add(int(purchase_id))
+
+        if not intent_ids and not purchase_ids:
+            return {}, {}
+
+        purchases = db.session.execute(
+            db.select(Purchases)
+            .options(joinedload(Purchases.course_to))
+            .where(db.or_(
+                Purchases.stripe_payment_intent_id.in_(intent_ids),
+                Purchases.purchase_id.in_(purchase_ids)
+            ))
+        ).scalars().all()
+
+        by_intent = {}
+        by_id = {}
+        for purchase in purchases:
+            if purchase.stripe_payment_intent_id:
+                by_intent[purchase.stripe_payment_intent_id] = purchase
+            by_id[purchase.purchase_id] = purchase
+
+        return by_intent, by_id
+
+    @staticmethod
+    def _find_purchase(intent, by_intent, by_id):
+        purchase = by_intent.get(intent.get('id'))
+        if purchase:
+            return purchase
+
+        purchase_id = (intent.get('metadata') or {}).get('purchase_id')
+        if purchase_id and str(purchase_id).isdigit():
+            purchase = by_id.get(int(purchase_id))
+            # Evento de un intento anterior: la compra ya tiene otro PaymentIntent
+            if purchase and purchase.stripe_payment_intent_id and purchase.stripe_payment_intent_id != intent.get('id'):
+                return None
+            return purchase
+        return None
+
+    @staticmethod
+    def _handle_payment_succeeded(intent, purchase, awards):
+        if not purchase:
+            return
+
+        if purchase.status != 'paid':
+            purchase.status = 'paid'
+            purchase.start_date = datetime.now(timezone.utc)
+        if not purchase.stripe_payment_intent_id:
+            purchase.stripe_payment_intent_id = intent.get('id')
+
+        # La clave ('purchase', purchase_id) hace que reentregas y reintentos no sumen puntos de nuevo
+        course = purchase.course_to
+        if course and course.points > 0:
+            awards.append({
+                'user_id': purchase.user_id,
+                'points': course.points,
+                'source_type': SOURCE_PURCHASE,
+                'source_id': purchase.purchase_id,
+                'type': 'course',
+                'event_description': f"Compra {purchase.purchase_id} del curso: {course.title}"
+            })
+
+    @staticmethod
+    def _handle_payment_failed(intent, purchase, awards):
+        # Un fallo tardío no deshace una compra ya pagada
+        if purchase and purchase.status == 'pending':
+            purchase.status = 'cancelled'
+
+    HANDLERS = {
+        'payment_intent.succeeded': _handle_payment_succeeded,
+        'payment_intent.payment_failed': _handle_payment_failed,
+    }
+
+    @staticmethod
+    def process_batch(limit=STRIPE_WEBHOOK_BATCH_SIZE):
+        """
+        Procesa un lote de eventos pendientes en una sola transacción. Cada evento (incluidos sus puntos)
+        se aplica en un SAVEPOINT: si falla se reintenta en otro lote sin afectar al resto.
+        Si falla el lote entero, sus eventos suman un intento y se descartan al llegar al máximo
+
+        Returns:
+            int: Número de eventos tomados (0 si la bandeja está vacía)
+        """
+        events = StripeWebhookService.claim_batch(limit)
+        if not events:
+            db.session.rollback()
+            return 0
+
+        event_ids = [event.event_id for event in events]
+        try:
+            StripeWebhookService._apply_events(events)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.exception("Stripe webhooks: falló el lote")
+            StripeWebhookService._record_batch_failure(event_ids, str(e))
+
+        # El worker no atiende peticiones: los workers web ven los puntos nuevos cuando su ranking lee
+        # users.points_updated_at (LEADERBOARD_SYNC_SECONDS)
+        return len(event_ids)
+
+    @staticmethod
+    def _record_batch_failure(event_ids, error):
+        """Suma un intento a los eventos de un lote fallido; los que llegan al máximo pasan a 'failed'"""
+        attempts = db.func.coalesce(StripeWebhookEvents.attempts, 0) + 1
+        db.session.execute(
+            db.update(StripeWebhookEvents)
+            .where(StripeWebhookEvents.event_id.in_(event_ids), StripeWebhookEvents.status == 'pending')
+            .values(
+                attempts=attempts,
+                error=error[:500],
+                status=db.cast(
+                    db.case((attempts >= STRIPE_WEBHOOK_MAX_ATTEMPTS, 'failed'), else_='pending'),
+                    StripeWebhookEvents.status.type
+                )
+            )
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+
+    @staticmethod
+    def _apply_events(events):
+        """Aplica los eventos tomados (no hace commit)"""
+        parsed = {}
+        for event in events:
+            try:
+                parsed[event.event_id] = json.loads(event.payload)
+            except ValueError:
+                parsed[event.event_id] = None
+
+        payment_intents = [
+            ((parsed[event.event_id] or {}).get('data') or {}).get('object') or {}
+            for event in events if event.type in StripeWebhookService.HANDLERS
+        ]
+        by_intent, by_id = StripeWebhookService._load_purchases(payment_intents)
+
+        now = datetime.now(timezone.utc)
+        for event in events:
+            event.attempts = (event.attempts or 0) + 1
+            data = parsed[event.event_id]
+
+            if data is None:
+                event.status = 'failed'
+                event.error = 'Payload JSON inválido'
+                continue
+
+            handler = StripeWebhookService.HANDLERS.get(event.type)
+            if handler:
+                intent = (data.get('data') or {}).get('object') or {}
+                event_awards = []
+                try:
+                    # Los puntos van en el mismo SAVEPOINT: un fallo al otorgarlos solo afecta a este evento
+                    with db.session.begin_nested():
+                        handler(intent, StripeWebhookService._find_purchase(intent, by_intent, by_id), event_awards)
+                        points_service.award_batch(event_awards)
+                except Exception as e:
+                    event.error = str(e)[:500]
+                    if event.attempts >= STRIPE_WEBHOOK_MAX_ATTEMPTS:
+                        event.status = 'failed'
+                    continue
+
+            event.status = 'processed'
+            event.error = None
+            event.processed_at = now
+
+    @staticmethod
+    def run_worker(batch_size=STRIPE_WEBHOOK_BATCH_SIZE, poll_interval=1.0, once=False):
+        """
+        Procesa la bandeja en bucle
+
+        Args:
+            batch_size (int): Eventos por lote
+            poll_interval (float): Segundos de espera cuando no hay eventos
+            once (bool): Terminar cuando la bandeja quede vacía
+
+        Returns:
+            int: Número de eventos procesados
+        """
+        processed = 0
+        backoff = poll_interval
+        while True:
+            try:
+                count = StripeWebhookService.process_batch(batch_size)
+            except Exception:
+                # Error fuera del lote (p. ej. base de datos caída): esperar cada vez más, hasta 60s
+                db.session.rollback()
+                current_app.logger.exception("Stripe webhooks: error tomando eventos")
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 60)
+                continue
+
+            backoff = poll_interval
+            if not count:
+                if once:
+                    return processed
+                time.sleep(poll_interval)
+                continue
+
+            processed += count
+            current_app.logger.info("Stripe webhooks: %s eventos procesados", count)
+
+
+# Instancia global del servicio
+stripe_webhook_service = StripeWebhookService()
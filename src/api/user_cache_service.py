@@ -0,0 +1,101 @@
+"""
+user_cache_service.py
+Caché en memoria (por proceso) de los datos de usuario que usan las validaciones de JWT.
+No guarda password_hash: verificar una contraseña siempre lee el hash actual de la base de datos
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from api.models import db, Users
+
+# Pasado este tiempo se vuelve a leer el usuario: los cambios hechos desde otros
+# procesos de gunicorn (p. ej. una desactivación) se aplican como mucho tras el TTL
+USER_CACHE_TTL_SECONDS = int(os.getenv("USER_CACHE_TTL_SECONDS", "60"))
+USER_CACHE_MAX_SIZE = int(os.getenv("USER_CACHE_MAX_SIZE", "10000"))
+
+
+class UserCache:
+    """Caché TTL + LRU de registros de usuario indexada por user_id"""
+
+    def __init__(self, ttl_seconds=USER_CACHE_TTL_SECONDS, max_size=USER_CACHE_MAX_SIZE):
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._records = OrderedDict()  # user_id -> (instante de carga, registro)
+
+    @staticmethod
+    def _load(user_id):
+        row = db.session.execute(
+            db.select(
+                Users.user_id,
+                Users.email,
+                Users.first_name,
+                Users.last_name,
+                Users.role,
+                Users.is_admin,
+                Users.is_active,
+                Users.current_points,
+                Users.trial_end_date
+            ).where(Users.user_id == user_id)
+        ).first()
+
+        if not row:
+            return None
+
+        return {
+            'user_id': row.user_id,
+            'email': row.email,
+            'first_name': row.first_name,
+            'last_name': row.last_name,
+            'role': row.role,
+            'is_admin': row.is_admin,
+            'is_active': row.is_active,
+            'current_points': row.current_points,
+            'trial_end_date': row.trial_end_date.isoformat() if row.trial_end_date else None
+        }
+
+    def get(self, user_id):
+        """
+        Devuelve el registro del usuario (desde la caché o la base de datos)
+
+        Returns:
+            dict: Datos del usuario o None si no existe. No debe modificarse.
+        """
+        if user_id is None:
+            return None
+
+        now = time.monotonic()
+        with self._lock:
+            cached = self._records.get(user_id)
+            if cached and now - cached[0] <= self.ttl_seconds:
+                self._records.move_to_end(user_id)
+                return cached[1]
+
+        record = self._load(user_id)
+
+        with self._lock:
+            if record is None:
+                self._records.pop(user_id, None)
+                return None
+
+            self._records[user_id] = (now, record)
+            self._records.move_to_end(user_id)
+            while len(self._records) > self.max_size:
+                self._records.popitem(last=False)
+
+        return record
+
+    def invalidate(self, user_id):
+        """Descarta el registro de un usuario tras modificarlo"""
+        with self._lock:
+            self._records.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._records.clear()
+
+
+# Instancia global de la caché
+user_cache = UserCache()
@@ -12,6 +12,9 @@ from api.models import db
 from api.routes import api
 from api.admin import setup_admin
 from api.commands import setup_commands
+from api.serializers import setup_json_provider
+from api.sql_instrumentation import setup_sql_instrumentation
+from api.metrics import setup_metrics
 from flask_jwt_extended import JWTManager
 
 import cloudinary
@@ -38,6 +41,9 @@ db.init_app(app)
 # Other configuration
 setup_admin(app)  # Add the admin
 setup_commands(app)  # Add the admin
+setup_json_provider(app)  # JSON con orjson si JSON_PROVIDER=orjson
+setup_sql_instrumentation(app)  # Server-Timing y aviso de N+1 por petición
+setup_metrics(app, db)  # Métricas Prometheus en /metrics
 app.register_blueprint(api, url_prefix='/api')  # Add all endpoints form the API with a "api" prefix
 # Setup the Flask-JWT-Extended extension
 app.config["JWT_SECRET_KEY"] = os.getenv("JWT_SECRET_KEY")
@@ -0,0 +1,83 @@
+"""
+Configuración común de las pruebas: aplicación sobre un SQLite temporal y tokens JWT de prueba
+"""
+import os
+import sys
+import tempfile
+
+import pytest
+
+DB_FILE = os.path.join(tempfile.mkdtemp(prefix='api-tests-'), 'test.db')
+
+# SQLite temporal por defecto; TEST_DATABASE_URL permite pasar las pruebas sobre una base PostgreSQL vacía
+os.environ['DATABASE_URL'] = os.getenv('TEST_DATABASE_URL', f'sqlite:///{DB_FILE}')
+os.environ.setdefault('JWT_SECRET_KEY', 'test-secret-key-with-at-least-32-bytes')
+for name in ('CLOUDINARY_CLOUD_NAME', 'CLOUDINARY_API_KEY', 'CLOUDINARY_API_SECRET'):
+    os.environ.setdefault(name, 'test')
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from app import app as flask_app  # noqa: E402
+from api.models import db, Users  # noqa: E402
+from api.user_cache_service import user_cache  # noqa: E402
+from api.catalog_cache_service import catalog_cache  # noqa: E402
+from api.leaderboard_service import leaderboard  # noqa: E402
+from api.achievement_service import achievement_service  # noqa: E402
+from api.progress_service import progress_service  # noqa: E402
+from flask_jwt_extended import create_access_token  # noqa: E402
+
+
+@pytest.fixture
+def app():
+    """Aplicación con el esquema recién creado en cada prueba"""
+    with flask_app.app_context():
+        db.drop_all()
+        db.create_all()
+        user_cache.clear()
+        catalog_cache.bump()
+        leaderboard.reload()
+        achievement_service.refresh()
+        progress_service.clear()
+        yield flask_app
+        db.session.remove()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def make_user(app):
+    """Crea un usuario activo con el rol indicado"""
+    def _make_user(role='student', is_admin=False, email=None):
+        user = Users(
+            first_name='Test',
+            last_name=role,
+            email=email or f'{role}{Users.query.count()}@example.com',
+            password_hash='not-used',
+            role=role,
+            is_admin=is_admin
+        )
+        db.session.add(user)
+        db.session.commit()
+        return user
+    return _make_user
+
+
+@pytest.fixture
+def auth_headers():
+    """Cabecera Authorization con los mismos claims que genera /login"""
+    def _auth_headers(user):
+        token = create_access_token(
+            identity=str(user.user_id),
+            additional_claims={
+                'user_id': user.user_id,
+                'is_active': True,
+                'role': user.role,
+                'is_admin': user.is_admin,
+                'trial_end_date': None
+            }
+        )
+        return {'Authorization': f'Bearer {token}'}
+    return _auth_headers
@@ -0,0 +1,69 @@
+"""
+Relleno de logros para los usuarios que ya cumplían required_points
+"""
+import pytest
+
+from api.achievement_service import achievement_service
+from api.models import db, Achievements, UserAchievements, Users
+
+
+@pytest.fixture
+def population(make_user):
+    users = {}
+    for points in (0, 15, 30, 60):
+        user = make_user()
+        user.current_points = points
+        users[points] = user.user_id
+    achievements = {points: Achievements(name=f'Logro {points}', description='...', required_points=points)
+                    for points in (10, 30, 50)}
+    db.session.add_all(achievements.values())
+    db.session.commit()
+    return users, {points: row.achievement_id for points, row in achievements.items()}
+
+
+def pairs():
+    db.session.expire_all()
+    return set(db.session.execute(db.select(UserAchievements.user_id, UserAchievements.achievement_id)).all())
+
+
+def expected_pairs(users, achievements, only=None):
+    return {
+        (users[user_points], achievements[required])
+        for user_points in users for required in achievements
+        if user_points >= required and (only is None or required in only)
+    }
+
+
+def test_backfill_inserts_only_qualifying_pairs_and_is_idempotent(population):
+    users, achievements = population
+    # Un logro ya otorgado no se duplica
+    db.session.add(UserAchievements(user_id=users[60], achievement_id=achievements[10]))
+    db.session.commit()
+
+    # chunk_size pequeño: varios rangos de user_id con su commit
+    stats = achievement_service.backfill(chunk_size=2, echo=lambda message: None)
+
+    assert pairs() == expected_pairs(users, achievements)
+    assert stats['inserted'] == len(expected_pairs(users, achievements)) - 1
+    assert stats['chunks'] == 2
+
+    again = achievement_service.backfill(chunk_size=2, echo=lambda message: None)
+    assert again['inserted'] == 0
+    assert pairs() == expected_pairs(users, achievements)
+
+
+def test_backfill_command_limited_to_some_achievements(app, population):
+    users, achievements = population
+
+    result = app.test_cli_runner().invoke(args=['backfill-achievements', '--achievement-id', str(achievements[30])])
+
+    assert result.exit_code == 0, result.output
+    assert 'Awarded 2 achievements' in result.output
+    assert pairs() == expected_pairs(users, achievements, only={30})
+
+
+def test_backfill_without_users(app):
+    stats = achievement_service.backfill(echo=lambda message: None)
+
+    assert stats == {'chunks': 0, 'inserted': 0, 'seconds': 0.0}
+    assert db.session.execute(db.select(db.func.count()).select_from(Users)).scalar() == 0
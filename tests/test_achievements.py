@@ -0,0 +1,106 @@
+"""
+Logros por cruce de umbral: límites del bisect, varios cruces en un lote y umbrales refrescados tras editarlos
+"""
+import pytest
+
+from api.achievement_service import achievement_service
+from api.models import db, Achievements, UserAchievements
+from api.points_service import points_service, SOURCE_PURCHASE
+
+
+@pytest.fixture
+def thresholds(app):
+    rows = [Achievements(name=f'Logro {points}', description='...', required_points=points)
+            for points in (10, 20, 20, 50)]
+    db.session.add_all(rows)
+    db.session.commit()
+    achievement_service.refresh()
+    return {row.achievement_id: row.required_points for row in rows}
+
+
+@pytest.fixture
+def admin_headers(make_user, auth_headers):
+    return auth_headers(make_user(role='teacher', is_admin=True))
+
+
+def required(achievement_ids, thresholds):
+    return sorted(thresholds[achievement_id] for achievement_id in achievement_ids)
+
+
+def awarded(user_id):
+    db.session.expire_all()
+    return set(db.session.execute(
+        db.select(UserAchievements.achievement_id).where(UserAchievements.user_id == user_id)
+    ).scalars())
+
+
+@pytest.mark.parametrize('old, new, expected', [
+    (0, 9, []),
+    (0, 10, [10]),          # required_points == nuevo: se alcanza
+    (10, 19, []),           # required_points == anterior: ya se tenía
+    (9, 20, [10, 20, 20]),  # umbral repetido: ambos logros
+    (19, 50, [20, 20, 50]),
+    (None, 100, [10, 20, 20, 50]),
+    (50, 10, []),           # si los puntos bajan no se retira ni se otorga nada
+])
+def test_crossed_boundaries(thresholds, old, new, expected):
+    assert required(achievement_service.crossed(old, new), thresholds) == expected
+
+
+def test_award_batch_with_several_crossings(thresholds, make_user):
+    first = make_user().user_id
+    second = make_user().user_id
+
+    points_service.award_batch([
+        {'user_id': first, 'points': 15, 'source_type': SOURCE_PURCHASE, 'source_id': 1},
+        {'user_id': first, 'points': 40, 'source_type': SOURCE_PURCHASE, 'source_id': 2},
+        {'user_id': second, 'points': 20, 'source_type': SOURCE_PURCHASE, 'source_id': 3},
+    ])
+    db.session.commit()
+
+    assert required(awarded(first), thresholds) == [10, 20, 20, 50]
+    assert required(awarded(second), thresholds) == [10, 20, 20]
+
+
+def test_thresholds_refresh_after_post_and_put(client, thresholds, admin_headers, make_user):
+    user_id = make_user().user_id
+    achievement_service.thresholds()
+
+    response = client.post('/api/achievements', json={'name': 'Cinco', 'description': '...', 'required_points': 5},
+                           headers=admin_headers)
+    assert response.status_code == 201
+    created_id = response.get_json()['results']['achievement_id']
+    assert created_id in achievement_service.crossed(0, 5)
+
+    fifty_id = next(achievement_id for achievement_id, points in thresholds.items() if points == 50)
+    response = client.put(f'/api/achievements/{fifty_id}', json={'required_points': 6}, headers=admin_headers)
+    assert response.status_code == 200
+    assert fifty_id in achievement_service.crossed(5, 6)
+    assert fifty_id not in achievement_service.crossed(40, 60)
+
+    points_service.award(user_id, 6, SOURCE_PURCHASE, 1)
+    db.session.commit()
+    assert {created_id, fifty_id} <= awarded(user_id)
+
+
+def test_admin_points_edit_awards_crossed_achievements(client, thresholds, admin_headers, make_user):
+    user_id = make_user().user_id
+
+    response = client.put(f'/api/users/{user_id}', json={'current_points': 25}, headers=admin_headers)
+
+    assert response.status_code == 200
+    assert response.get_json()['results']['current_points'] == 25
+    assert required(awarded(user_id), thresholds) == [10, 20, 20]
+
+
+@pytest.mark.parametrize('body', [
+    {'current_points': True},
+    {'current_points': 60, 'trial_end_date': 'mañana'},
+])
+def test_rejected_admin_edit_awards_nothing(client, thresholds, admin_headers, make_user, body):
+    user_id = make_user().user_id
+
+    response = client.put(f'/api/users/{user_id}', json=body, headers=admin_headers)
+
+    assert response.status_code == 400
+    assert awarded(user_id) == set()
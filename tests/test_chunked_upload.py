@@ -0,0 +1,220 @@
+"""
+Subida por partes: un archivo grande atraviesa los endpoints /uploads con memoria acotada
+"""
+import hashlib
+import io
+import os
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from api import chunked_upload_service as chunked_uploads
+from api import media_job_service as media_jobs
+from api.models import db, Courses, Modules, Lessons, MediaJobs, UploadSessions
+
+CHUNK_SIZE = 4 * 1024 * 1024
+TOTAL_SIZE = 12 * CHUNK_SIZE + 12345  # ~48MB en 13 partes
+
+
+class GeneratedStream(io.RawIOBase):
+    """Cuerpo de la petición generado al vuelo (determinista), sin tener el archivo en memoria"""
+
+    def __init__(self, offset, size):
+        self.start = offset
+        self.position = offset
+        self.end = offset + size
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def seek(self, position, whence=io.SEEK_SET):
+        base = {io.SEEK_SET: self.start, io.SEEK_CUR: self.position, io.SEEK_END: self.end}[whence]
+        self.position = min(max(base + position, self.start), self.end)
+        return self.position - self.start
+
+    def readinto(self, buffer):
+        count = min(len(buffer), self.end - self.position)
+        if count <= 0:
+            return 0
+        buffer[:count] = generated_bytes(self.position, count)
+        self.position += count
+        return count
+
+
+PATTERN = bytes(i % 251 for i in range(4096 + 251))
+
+
+def generated_bytes(offset, count):
+    # Cada bloque de 4KB depende de su posición: una parte fuera de sitio cambia el hash del archivo
+    chunks = []
+    position = offset
+    end = offset + count
+    while position < end:
+        block, start = divmod(position, 4096)
+        take = min(4096 - start, end - position)
+        shift = block % 251
+        chunks.append(PATTERN[shift + start:shift + start + take])
+        position += take
+    return b''.join(chunks)
+
+
+def expected_sha256():
+    digest = hashlib.sha256()
+    for offset in range(0, TOTAL_SIZE, 1024 * 1024):
+        digest.update(generated_bytes(offset, min(1024 * 1024, TOTAL_SIZE - offset)))
+    return digest.hexdigest()
+
+
+@pytest.fixture
+def upload_dirs(tmp_path, monkeypatch):
+    monkeypatch.setattr(chunked_uploads, 'UPLOAD_CHUNK_SIZE', CHUNK_SIZE)
+    monkeypatch.setattr(chunked_uploads, 'UPLOAD_SESSION_DIR', str(tmp_path / 'sessions'))
+    monkeypatch.setattr(chunked_uploads, 'MEDIA_SPOOL_DIR', str(tmp_path / 'spool'))
+    monkeypatch.setattr(media_jobs, 'MEDIA_SPOOL_DIR', str(tmp_path / 'spool'))
+    return tmp_path
+
+
+@pytest.fixture
+def teacher_lesson(make_user):
+    teacher = make_user(role='teacher')
+    course = Courses(title='Curso', price=10, points=0, created_by=teacher.user_id)
+    module = Modules(title='Módulo', order=1, course_to=course)
+    lesson = Lessons(title='Lección', content='...', order=1, module_to=module)
+    db.session.add_all([course, module, lesson])
+    db.session.commit()
+    return teacher, lesson
+
+
+def put_chunk(client, headers, upload_id, index):
+    offset = index * CHUNK_SIZE
+    size = min(CHUNK_SIZE, TOTAL_SIZE - offset)
+    return client.put(
+        f'/api/uploads/{upload_id}/chunks/{index}',
+        input_stream=GeneratedStream(offset, size),
+        content_length=size,
+        content_type='application/octet-stream',
+        headers=headers
+    )
+
+
+def test_large_file_upload_keeps_memory_bounded(client, auth_headers, upload_dirs, teacher_lesson):
+    teacher, lesson = teacher_lesson
+    headers = auth_headers(teacher)
+
+    response = client.post('/api/uploads', json={
+        'filename': 'clase.mp4', 'total_size': TOTAL_SIZE, 'lesson_id': lesson.lesson_id
+    }, headers=headers)
+    assert response.status_code == 201, response.get_json()
+    upload = response.get_json()['results']
+    assert upload['total_chunks'] == 13
+
+    # Primera parte fuera de la medición: calienta cachés (JWT, usuarios, sentencias compiladas)
+    assert put_chunk(client, headers, upload['upload_id'], 0).status_code == 200
+
+    tracemalloc.start()
+    try:
+        for index in range(1, upload['total_chunks']):
+            response = put_chunk(client, headers, upload['upload_id'], index)
+            assert response.status_code == 200, response.get_json()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    # Con el cuerpo leído por bloques de 64KB el pico no depende del tamaño de la parte (4MB) ni del archivo (48MB)
+    assert peak < CHUNK_SIZE // 2, f'pico de memoria {peak} bytes'
+
+    response = client.post(f"/api/uploads/{upload['upload_id']}/complete", headers=headers)
+    assert response.status_code == 202, response.get_json()
+
+    job = db.session.get(MediaJobs, response.get_json()['results']['job']['job_id'])
+    path = job.files[0].path
+    assert os.path.getsize(path) == TOTAL_SIZE
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as assembled:
+        for block in iter(lambda: assembled.read(1024 * 1024), b''):
+            digest.update(block)
+    assert digest.hexdigest() == expected_sha256()
+
+
+def start_small_upload(client, headers, lesson, data=b'video corto'):
+    response = client.post('/api/uploads', json={
+        'filename': 'clase.mp4', 'total_size': len(data), 'lesson_id': lesson.lesson_id
+    }, headers=headers)
+    upload_id = response.get_json()['results']['upload_id']
+    response = client.put(f'/api/uploads/{upload_id}/chunks/0', data=data,
+                          content_type='application/octet-stream', headers=headers)
+    assert response.status_code == 200, response.get_json()
+    return upload_id
+
+
+def test_concurrent_complete_enqueues_a_single_job(client, auth_headers, upload_dirs, teacher_lesson, monkeypatch):
+    teacher, lesson = teacher_lesson
+    headers = auth_headers(teacher)
+    upload_id = start_small_upload(client, headers, lesson)
+
+    assemble = chunked_uploads.ChunkedUploadService.assemble
+    competing = []
+
+    def assemble_while_another_completes(upload):
+        # Segunda llamada a /complete mientras la primera ensambla
+        competing.append(client.post(f'/api/uploads/{upload_id}/complete', headers=headers))
+        return assemble(upload)
+
+    monkeypatch.setattr(chunked_uploads.ChunkedUploadService, 'assemble', staticmethod(assemble_while_another_completes))
+
+    response = client.post(f'/api/uploads/{upload_id}/complete', headers=headers)
+
+    assert response.status_code == 202, response.get_json()
+    assert [r.status_code for r in competing] == [409]
+    assert db.session.execute(db.select(db.func.count(MediaJobs.job_id))).scalar() == 1
+    assert db.session.get(UploadSessions, upload_id).job_id == response.get_json()['results']['job']['job_id']
+
+
+def test_failed_complete_releases_the_upload(client, auth_headers, upload_dirs, teacher_lesson, monkeypatch):
+    teacher, lesson = teacher_lesson
+    headers = auth_headers(teacher)
+    upload_id = start_small_upload(client, headers, lesson)
+
+    assemble = chunked_uploads.ChunkedUploadService.assemble
+
+    def broken_assemble(upload):
+        raise OSError('disco lleno')
+
+    monkeypatch.setattr(chunked_uploads.ChunkedUploadService, 'assemble', staticmethod(broken_assemble))
+    assert client.post(f'/api/uploads/{upload_id}/complete', headers=headers).status_code == 500
+    assert db.session.get(UploadSessions, upload_id).status == 'uploading'
+
+    # El cliente puede reintentar cuando el error desaparece
+    monkeypatch.setattr(chunked_uploads.ChunkedUploadService, 'assemble', staticmethod(assemble))
+    assert client.post(f'/api/uploads/{upload_id}/complete', headers=headers).status_code == 202
+
+
+def test_expire_abandoned_cancels_stale_uploads_and_removes_orphans(client, auth_headers, upload_dirs, teacher_lesson):
+    teacher, lesson = teacher_lesson
+    headers = auth_headers(teacher)
+    stale = start_small_upload(client, headers, lesson)
+    active = start_small_upload(client, headers, lesson)
+    sessions = upload_dirs / 'sessions'
+
+    # Ambas se crearon hace dos días, pero 'active' recibió una parte hace poco
+    two_days_ago = datetime.now(timezone.utc) - timedelta(days=2)
+    db.session.execute(db.update(UploadSessions).values(created_at=two_days_ago))
+    db.session.commit()
+    old = time.time() - 2 * 24 * 3600
+    os.utime(sessions / stale, (old, old))
+    orphan = sessions / 'huerfano'
+    orphan.mkdir()
+    os.utime(orphan, (old, old))
+
+    stats = chunked_uploads.chunked_upload_service.expire_abandoned(max_age_hours=24)
+
+    assert stats == {'expired': 1, 'orphaned_dirs': 1}
+    assert db.session.get(UploadSessions, stale).status == 'cancelled'
+    assert db.session.get(UploadSessions, active).status == 'uploading'
+    assert sorted(os.listdir(sessions)) == [active]
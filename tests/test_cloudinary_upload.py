@@ -0,0 +1,80 @@
+"""
+Subidas en paralelo a Cloudinary (upload_many) que usa el worker de multimedia
+"""
+import io
+import threading
+import time
+
+import pytest
+
+from api.cloudinary_service import cloudinary_service, LocalFakeUploader
+
+
+class RecordingUploader(LocalFakeUploader):
+    """Uploader local que anota la concurrencia y puede fallar para un public_id"""
+
+    def __init__(self, base_dir, fail_on=None, delay=0.05):
+        super().__init__(base_dir)
+        self.fail_on = fail_on
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.active = 0
+        self.max_active = 0
+        self.options = []
+
+    def upload_large(self, file, **options):
+        with self.lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+            self.options.append(options)
+        try:
+            time.sleep(self.delay)
+            if options['public_id'] == self.fail_on:
+                raise RuntimeError('fallo de red')
+            return self.upload(file, **options)
+        finally:
+            with self.lock:
+                self.active -= 1
+
+
+@pytest.fixture
+def uploader(app, tmp_path, monkeypatch):
+    def _uploader(**kwargs):
+        fake = RecordingUploader(str(tmp_path), **kwargs)
+        monkeypatch.setattr(cloudinary_service, 'uploader', fake)
+        return fake
+    return _uploader
+
+
+def make_uploads(count):
+    return [
+        (io.BytesIO(f'archivo {index}'.encode()), {'public_id': f'lesson/file_{index}', 'resource_type': 'raw'})
+        for index in range(count)
+    ]
+
+
+def test_upload_many_keeps_order_and_bounds_concurrency(uploader):
+    fake = uploader()
+
+    results = cloudinary_service.upload_many(make_uploads(6), max_workers=2)
+
+    assert [r['public_id'] for r in results] == [f'lesson/file_{i}' for i in range(6)]
+    assert fake.max_active == 2
+    assert all(o['chunk_size'] == cloudinary_service.chunk_size for o in fake.options)
+
+
+def test_upload_many_removes_finished_uploads_when_one_fails(uploader, tmp_path):
+    fake = uploader(fail_on='lesson/file_1')
+
+    with pytest.raises(Exception, match='fallo de red'):
+        cloudinary_service.upload_many(make_uploads(3), max_workers=3)
+
+    assert fake.max_active == 3
+    assert not list((tmp_path / 'lesson').iterdir())
+
+
+def test_upload_many_without_files_does_not_upload(uploader):
+    fake = uploader()
+
+    assert cloudinary_service.upload_many([]) == []
+    assert fake.options == []
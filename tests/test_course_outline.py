@@ -0,0 +1,64 @@
+"""
+Árbol de curso cacheado: la multimedia que inserta el worker (otro proceso) invalida la caché
+"""
+import pytest
+
+from api import media_job_service as media_jobs
+from api.catalog_cache_service import catalog_cache, CatalogCache
+from api.cloudinary_service import cloudinary_service, LocalFakeUploader
+from api.media_job_service import MediaJobService
+from api.models import db, Courses, Modules, Lessons, MediaJobs, MediaJobFiles
+
+
+@pytest.fixture
+def course(app):
+    course = Courses(title='Curso', price=10, points=0)
+    module = Modules(title='Módulo', order=1, course_to=course)
+    lesson = Lessons(title='Lección', content='...', order=1, module_to=module)
+    db.session.add_all([course, module, lesson])
+    db.session.commit()
+    return course.course_id, lesson.lesson_id
+
+
+def outline_media(client, headers, course_id):
+    response = client.get(f'/api/courses-private/{course_id}/outline', headers=headers)
+    assert response.status_code == 200, response.get_json()
+    return [m['url'] for m in response.get_json()['results']['modules'][0]['lessons'][0]['multimedia_resources']]
+
+
+def test_outline_sees_media_inserted_by_the_worker(client, make_user, auth_headers, course, tmp_path, monkeypatch):
+    course_id, lesson_id = course
+    headers = auth_headers(make_user(role='student'))
+    monkeypatch.setattr(catalog_cache, 'sync_seconds', 0)
+    monkeypatch.setattr(cloudinary_service, 'uploader', LocalFakeUploader(str(tmp_path / 'cloudinary')))
+    assert outline_media(client, headers, course_id) == []
+
+    spooled = tmp_path / 'clase.mp4'
+    spooled.write_bytes(b'video')
+    job = MediaJobs(lesson_id=lesson_id, status='pending', total_files=1, processed_files=0, attempts=0)
+    job.files.append(MediaJobFiles(path=str(spooled), original_filename='clase.mp4', type='video',
+                                   position=1, status='pending'))
+    db.session.add(job)
+    db.session.commit()
+
+    # El worker corre en otro proceso: su caché local no es la de los procesos web
+    monkeypatch.setattr(media_jobs, 'catalog_cache', CatalogCache())
+    assert MediaJobService.process_job(MediaJobService.claim_next_job()) is True
+
+    assert len(outline_media(client, headers, course_id)) == 1
+
+
+def test_outline_stays_cached_until_the_shared_version_changes(client, make_user, auth_headers, course, monkeypatch):
+    course_id, _ = course
+    headers = auth_headers(make_user(role='student'))
+    monkeypatch.setattr(catalog_cache, 'sync_seconds', 0)
+    outline_media(client, headers, course_id)
+    version = catalog_cache.version
+
+    outline_media(client, headers, course_id)
+    assert catalog_cache.version == version
+
+    CatalogCache.publish()
+    db.session.commit()
+    outline_media(client, headers, course_id)
+    assert catalog_cache.version == version + 1
@@ -0,0 +1,63 @@
+"""
+Los cursores manipulados por el cliente deben responder 400, nunca 500
+"""
+import base64
+import json
+
+import pytest
+
+from api.models import db, Courses, Modules, Lessons
+
+
+def make_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
+
+
+@pytest.fixture
+def lessons(app):
+    course = Courses(title='Curso', price=10, points=0)
+    module = Modules(title='Módulo', order=1, course_to=course)
+    db.session.add_all([course, module])
+    db.session.flush()
+    db.session.add_all([
+        Lessons(title=f'Lección {index}', content='...', order=index, module_id=module.module_id)
+        for index in range(5)
+    ])
+    db.session.commit()
+
+
+@pytest.mark.parametrize('values', [
+    [[1]],
+    [{'a': 1}],
+    [{'dt': 'no-es-fecha'}],
+    [{'dt': 1}],
+    [True],
+    [1.5],
+    [None],
+    ['1'],
+    [1, 2],
+    [],
+    {'after': 1},
+])
+def test_malformed_cursor_is_rejected(client, make_user, auth_headers, lessons, values):
+    headers = auth_headers(make_user(role='teacher', is_admin=True))
+
+    response = client.get(f'/api/lessons-private?cursor={make_cursor(values)}', headers=headers)
+
+    assert response.status_code == 400
+    assert response.get_json()['message'] == 'Cursor inválido'
+
+
+def test_cursor_walks_all_pages(client, make_user, auth_headers, lessons):
+    headers = auth_headers(make_user(role='teacher', is_admin=True))
+
+    seen = []
+    cursor = ''
+    while True:
+        body = client.get(f'/api/lessons-private?cursor={cursor}&per_page=2', headers=headers).get_json()
+        seen.extend(lesson['lesson_id'] for lesson in body['results'])
+        cursor = body['pagination']['next_cursor']
+        if not cursor:
+            break
+
+    assert seen == sorted(seen) and len(seen) == 5
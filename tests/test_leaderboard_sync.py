@@ -0,0 +1,59 @@
+"""
+El ranking de cada proceso recoge los puntos otorgados en otros procesos (worker de webhooks, conciliación)
+"""
+import pytest
+
+from api.leaderboard_service import leaderboard
+from api.models import db, Users
+from api.points_service import points_service, SOURCE_PURCHASE
+
+
+@pytest.fixture
+def synced_leaderboard(app, monkeypatch):
+    monkeypatch.setattr(leaderboard, 'sync_seconds', 0)
+    return leaderboard
+
+
+def award_elsewhere(user_id, points, source_id):
+    """Otorga puntos como lo haría otro proceso: sin tocar el ranking en memoria de este"""
+    points_service.award(user_id, points, SOURCE_PURCHASE, source_id)
+    db.session.commit()
+
+
+def ranking():
+    return {entry['user_id']: (entry['rank'], entry['points']) for entry in leaderboard.page(0, 100)[0]}
+
+
+def test_sync_picks_up_points_from_other_processes(synced_leaderboard, make_user):
+    first = make_user().user_id
+    second = make_user().user_id
+    leaderboard.reload()
+    assert ranking() == {first: (1, 0), second: (2, 0)}
+
+    award_elsewhere(second, 30, source_id=1)
+    assert ranking() == {second: (1, 30), first: (2, 0)}
+
+    award_elsewhere(first, 50, source_id=2)
+    assert ranking() == {first: (1, 50), second: (2, 30)}
+
+
+def test_sync_removes_deactivated_users(synced_leaderboard, make_user):
+    user_id = make_user().user_id
+    leaderboard.reload()
+
+    user = db.session.get(Users, user_id)
+    user.is_active = False
+    db.session.commit()
+    award_elsewhere(user_id, 10, source_id=1)
+
+    assert user_id not in ranking()
+
+
+def test_without_sync_changes_wait_for_the_interval(app, make_user, monkeypatch):
+    monkeypatch.setattr(leaderboard, 'sync_seconds', 3600)
+    user_id = make_user().user_id
+    leaderboard.reload()
+
+    award_elsewhere(user_id, 30, source_id=1)
+
+    assert ranking()[user_id] == (1, 0)
@@ -0,0 +1,20 @@
+"""
+El sustituto local de Stripe funciona sin STRIPE_SECRET_KEY aunque app.py reasigne stripe.api_key
+"""
+import stripe
+
+from api.stripe_service import stripe_service, use_local_stripe
+
+
+def test_local_stripe_without_api_key(app, monkeypatch):
+    monkeypatch.setattr(stripe, 'default_http_client', stripe.default_http_client)
+    monkeypatch.setattr(stripe, 'api_key', None)
+    use_local_stripe()
+
+    created = stripe_service.create_payment_intent(1000, idempotency_key='purchase_1_1000')
+    assert created['success'], created
+    assert created['id'] == 'pi_local_purchase_1_1000'
+
+    retrieved = stripe_service.retrieve_payment_intent(created['id'])
+    assert retrieved['success'], retrieved
+    assert stripe.api_key is None
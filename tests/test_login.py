@@ -0,0 +1,45 @@
+"""
+/login no retiene una conexión de la base de datos mientras se verifica la contraseña
+"""
+import pytest
+from werkzeug.security import generate_password_hash
+
+from api import routes
+from api.models import db, Users
+from api.password_service import password_service
+
+
+@pytest.fixture
+def student(make_user):
+    user = make_user(email='login@example.com')
+    user.password_hash = generate_password_hash('secreto', method='pbkdf2:sha256:1000')
+    db.session.commit()
+    return user.user_id
+
+
+def login(client, password='secreto'):
+    return client.post('/api/login', json={'email': 'login@example.com', 'password': password})
+
+
+def test_hash_runs_without_an_open_transaction(client, student, monkeypatch):
+    original = password_service.verify_and_update
+    in_transaction = []
+
+    def verify_and_update(password_hash, password):
+        in_transaction.append(db.session().in_transaction())
+        return original(password_hash, password)
+
+    monkeypatch.setattr(routes.password_service, 'verify_and_update', verify_and_update)
+
+    assert login(client).status_code == 200
+    assert in_transaction == [False]
+
+
+def test_login_rehashes_outdated_hash(client, student):
+    assert login(client).status_code == 200
+
+    db.session.expire_all()
+    password_hash = db.session.get(Users, student).password_hash
+    assert not password_service.needs_rehash(password_hash)
+    assert login(client).status_code == 200
+    assert login(client, 'otra').status_code == 401
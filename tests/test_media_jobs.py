@@ -0,0 +1,141 @@
+"""
+Worker de multimedia: recuperación de trabajos abandonados y errores inesperados
+"""
+import io
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from api import media_job_service as media_jobs
+from api.media_job_service import MediaJobService, MEDIA_JOB_LEASE_SECONDS, MEDIA_JOB_MAX_ATTEMPTS
+from api.models import db, Courses, Modules, Lessons, MediaJobs, MediaJobFiles
+
+
+@pytest.fixture
+def lesson(app):
+    course = Courses(title='Curso', price=10, points=0)
+    module = Modules(title='Módulo', order=1, course_to=course)
+    lesson = Lessons(title='Lección', content='...', order=1, module_to=module)
+    db.session.add_all([course, module, lesson])
+    db.session.commit()
+    return lesson
+
+
+def make_job(lesson, status='pending', attempts=0, locked_at=None):
+    job = MediaJobs(lesson_id=lesson.lesson_id, status=status, total_files=0, processed_files=0,
+                    attempts=attempts, locked_at=locked_at)
+    db.session.add(job)
+    db.session.commit()
+    return job.job_id
+
+
+def test_claim_reclaims_running_job_with_expired_lease(lesson):
+    now = datetime.now(timezone.utc)
+    alive = make_job(lesson, status='running', attempts=1, locked_at=now)
+    abandoned = make_job(lesson, status='running', attempts=1,
+                         locked_at=now - timedelta(seconds=MEDIA_JOB_LEASE_SECONDS + 60))
+
+    job = MediaJobService.claim_next_job()
+
+    assert job.job_id == abandoned
+    assert job.status == 'running' and job.attempts == 2
+    assert MediaJobService.claim_next_job() is None
+    assert db.session.get(MediaJobs, alive).attempts == 1
+
+
+def test_claim_fails_abandoned_job_out_of_attempts(lesson):
+    expired = datetime.now(timezone.utc) - timedelta(seconds=MEDIA_JOB_LEASE_SECONDS + 60)
+    job_id = make_job(lesson, status='running', attempts=MEDIA_JOB_MAX_ATTEMPTS, locked_at=expired)
+
+    assert MediaJobService.claim_next_job() is None
+    assert db.session.get(MediaJobs, job_id).status == 'failed'
+
+
+def test_worker_survives_unexpected_errors(lesson, monkeypatch):
+    make_job(lesson)
+    make_job(lesson)
+    calls = []
+
+    def process_job(job, batch_size=None):
+        calls.append(job.job_id)
+        if len(calls) == 1:
+            raise RuntimeError('fallo inesperado')
+        MediaJobService._finish(job, 'done')
+        return True
+
+    monkeypatch.setattr(MediaJobService, 'process_job', staticmethod(process_job))
+    monkeypatch.setattr(media_jobs.time, 'sleep', lambda seconds: None)
+
+    processed = MediaJobService.run_worker(once=True)
+
+    assert processed == 1
+    assert len(calls) == 2
+
+
+def test_job_for_deleted_lesson_discards_its_files(lesson, tmp_path):
+    path = tmp_path / 'clase.mp4'
+    path.write_bytes(b'video')
+    job_id = make_job(lesson)
+    db.session.add(MediaJobFiles(job_id=job_id, path=str(path), original_filename='clase.mp4',
+                                 type='video', position=1, status='pending'))
+    db.session.commit()
+    # Sin ON DELETE CASCADE efectivo (o borrada entre la toma y el proceso) el trabajo sobrevive a la lección
+    db.session.execute(db.delete(Lessons).where(Lessons.lesson_id == lesson.lesson_id))
+    db.session.commit()
+
+    job = db.session.get(MediaJobs, job_id)
+    assert MediaJobService.process_job(job) is False
+
+    assert db.session.get(MediaJobs, job_id).status == 'failed'
+    assert not os.path.exists(path)
+
+
+def test_worker_logs_processed_jobs(lesson, monkeypatch, caplog):
+    make_job(lesson)
+    monkeypatch.setattr(MediaJobService, 'process_job',
+                        staticmethod(lambda job, batch_size=None: MediaJobService._finish(job, 'done') or True))
+
+    with caplog.at_level(logging.INFO):
+        assert MediaJobService.run_worker(once=True) == 1
+
+    assert any('done' in record.getMessage() for record in caplog.records)
+
+
+@pytest.fixture
+def teacher_module(make_user, tmp_path, monkeypatch):
+    monkeypatch.setattr(media_jobs, 'MEDIA_SPOOL_DIR', str(tmp_path / 'spool'))
+    teacher = make_user(role='teacher')
+    course = Courses(title='Curso', price=10, points=0, created_by=teacher.user_id)
+    module = Modules(title='Módulo', order=1, course_to=course)
+    db.session.add_all([course, module])
+    db.session.commit()
+    return teacher, module
+
+
+def post_lesson(client, headers, module, files):
+    return client.post('/api/lessons-private', data={
+        'title': 'Lección', 'content': '...', 'module_id': str(module.module_id), 'order': '1',
+        'files': files
+    }, content_type='multipart/form-data', headers=headers)
+
+
+def test_multipart_lesson_without_supported_files_enqueues_nothing(client, auth_headers, teacher_module):
+    teacher, module = teacher_module
+
+    response = post_lesson(client, auth_headers(teacher), module, [(io.BytesIO(b'x'), 'notas.exe')])
+
+    assert response.status_code == 201, response.get_json()
+    assert response.get_json()['results']['job'] is None
+    assert db.session.execute(db.select(db.func.count(MediaJobs.job_id))).scalar() == 0
+
+
+def test_multipart_lesson_with_files_enqueues_a_job(client, auth_headers, teacher_module):
+    teacher, module = teacher_module
+
+    response = post_lesson(client, auth_headers(teacher), module, [(io.BytesIO(b'video'), 'clase.mp4')])
+
+    assert response.status_code == 202, response.get_json()
+    job = db.session.get(MediaJobs, response.get_json()['results']['job']['job_id'])
+    assert job.total_files == 1 and os.path.exists(job.files[0].path)
@@ -0,0 +1,57 @@
+"""
+Las rutas que verifican la contraseña actual no deben usar datos de la caché de usuarios (por proceso)
+"""
+import pytest
+
+from api.models import db, Users
+from api.password_service import password_service
+from api.user_cache_service import user_cache
+
+
+@pytest.fixture
+def student(make_user):
+    user = make_user(role='student')
+    user.password_hash = password_service.hash_password('old-password')
+    db.session.commit()
+    return user
+
+
+def change_password_elsewhere(user_id, password):
+    """Simula el cambio hecho por otro worker de gunicorn: la caché de este proceso no se entera"""
+    db.session.execute(
+        db.update(Users).where(Users.user_id == user_id)
+        .values(password_hash=password_service.hash_password(password))
+    )
+    db.session.commit()
+
+
+def test_user_cache_does_not_hold_password_hash(student):
+    assert 'password_hash' not in user_cache.get(student.user_id)
+
+
+def test_change_password_rejects_old_password_changed_in_another_worker(client, auth_headers, student):
+    headers = auth_headers(student)
+    user_cache.get(student.user_id)
+    change_password_elsewhere(student.user_id, 'new-password')
+
+    response = client.post('/api/change-password', json={
+        'current_password': 'old-password', 'new_password': 'another-password'
+    }, headers=headers)
+    assert response.status_code == 401
+
+    response = client.post('/api/change-password', json={
+        'current_password': 'new-password', 'new_password': 'another-password'
+    }, headers=headers)
+    assert response.status_code == 200
+
+
+def test_delete_account_rejects_old_password_changed_in_another_worker(client, auth_headers, student):
+    headers = auth_headers(student)
+    user_cache.get(student.user_id)
+    change_password_elsewhere(student.user_id, 'new-password')
+
+    response = client.post('/api/delete-my-account', json={
+        'password': 'old-password', 'confirmation': 'eliminar mi cuenta'
+    }, headers=headers)
+    assert response.status_code == 401
+    assert db.session.get(Users, student.user_id).is_active
@@ -0,0 +1,58 @@
+"""
+Pool de hashing de contraseñas: timeouts, pool roto y detección de hashes desactualizados
+"""
+import os
+import time
+
+import pytest
+from werkzeug.security import generate_password_hash
+
+from api.password_service import PasswordService, PasswordHashBusy, method_prefix
+
+
+def slow_identity(value, seconds):
+    time.sleep(seconds)
+    return value
+
+
+def crash_worker():
+    os._exit(1)
+
+
+@pytest.fixture
+def service():
+    service = PasswordService(method='pbkdf2:sha256:1000', workers=1, queue_depth=1, timeout=0.2)
+    yield service
+    if service._executor:
+        service._executor.shutdown(wait=True, cancel_futures=True)
+
+
+@pytest.mark.parametrize('method', ['scrypt', 'scrypt:16384:8:1', 'pbkdf2', 'pbkdf2:sha512', 'pbkdf2:sha256:1000'])
+def test_method_prefix_matches_werkzeug(method):
+    assert method_prefix(method) == generate_password_hash('x', method).split('$', 1)[0]
+
+
+def test_needs_rehash_compares_prefix(service):
+    assert not service.needs_rehash(generate_password_hash('x', 'pbkdf2:sha256:1000'))
+    assert service.needs_rehash(generate_password_hash('x', 'pbkdf2:sha256:2000'))
+
+
+def test_timeout_is_busy_and_keeps_slot_until_child_finishes(service):
+    with pytest.raises(PasswordHashBusy):
+        service._run(slow_identity, 'a', 1.0)
+
+    # El hijo sigue calculando: el límite de operaciones simultáneas se mantiene
+    with pytest.raises(PasswordHashBusy):
+        service._run(slow_identity, 'b', 0)
+
+    time.sleep(1.2)
+    assert service._run(slow_identity, 'c', 0) == 'c'
+
+
+def test_broken_pool_is_replaced(service):
+    assert service._run(slow_identity, 'a', 0) == 'a'
+
+    with pytest.raises(PasswordHashBusy):
+        service._run(crash_worker)
+
+    assert service._run(slow_identity, 'b', 0) == 'b'
@@ -0,0 +1,26 @@
+"""
+/points-ranking de un estudiante: posición y vecinos del ranking en memoria, puntos propios de la base de datos
+"""
+from api.leaderboard_service import leaderboard
+from api.models import db
+from api.points_service import points_service, SOURCE_PURCHASE
+
+
+def test_student_points_are_not_stale(client, make_user, auth_headers, monkeypatch):
+    monkeypatch.setattr(leaderboard, 'sync_seconds', 3600)
+    student = make_user()
+    make_user()
+    headers = auth_headers(student)
+    leaderboard.reload()
+
+    # Puntos otorgados en otro proceso: el ranking de este todavía no los ha leído
+    points_service.award(student.user_id, 40, SOURCE_PURCHASE, 1)
+    db.session.commit()
+
+    response = client.get('/api/points-ranking', headers=headers)
+
+    assert response.status_code == 200
+    results = response.get_json()['results']
+    assert results['points'] == 40
+    assert results['total'] == 2
+    assert student.user_id in [entry['user_id'] for entry in results['neighbours']]
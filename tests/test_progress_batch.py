@@ -0,0 +1,135 @@
+"""
+/userprogress/batch: combinación de eventos repetidos, reglas del upsert y rechazos por evento
+"""
+import pytest
+
+from api.benchmark import QueryCounter
+from api.models import db, Courses, Modules, Lessons, UserProgress
+
+
+@pytest.fixture
+def lessons(app):
+    course = Courses(title='Curso', price=0, points=0)
+    module = Modules(title='Módulo', order=1, course_to=course)
+    db.session.add_all([course, module])
+    db.session.flush()
+    rows = [Lessons(title=f'Lección {index}', content='...', order=index, module_id=module.module_id)
+            for index in range(40)]
+    db.session.add_all(rows)
+    db.session.commit()
+    return [row.lesson_id for row in rows]
+
+
+@pytest.fixture
+def student(make_user, auth_headers):
+    user = make_user()
+    return user.user_id, auth_headers(user)
+
+
+def post_batch(client, headers, events):
+    response = client.post('/api/userprogress/batch', json={'events': events}, headers=headers)
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()['results']
+
+
+def stored(user_id, lesson_id):
+    db.session.expire_all()
+    return db.session.execute(
+        db.select(UserProgress).where(UserProgress.user_id == user_id, UserProgress.lesson_id == lesson_id)
+    ).scalar_one()
+
+
+def test_keeps_earliest_start_and_latest_completion(client, student, lessons):
+    user_id, headers = student
+    lesson_id = lessons[0]
+
+    post_batch(client, headers, [{'lesson_id': lesson_id, 'completed': True,
+                                  'start_date': '2026-01-10T10:00:00', 'completion_date': '2026-01-12T10:00:00'}])
+    post_batch(client, headers, [{'lesson_id': lesson_id, 'completed': True,
+                                  'start_date': '2026-01-11T10:00:00', 'completion_date': '2026-01-15T10:00:00'}])
+    post_batch(client, headers, [{'lesson_id': lesson_id, 'completed': True,
+                                  'start_date': '2026-01-05T10:00:00', 'completion_date': '2026-01-13T10:00:00'}])
+
+    row = stored(user_id, lesson_id)
+    assert row.start_date.isoformat() == '2026-01-05T10:00:00'
+    assert row.completion_date.isoformat() == '2026-01-15T10:00:00'
+
+
+def test_completed_never_goes_back(client, student, lessons):
+    user_id, headers = student
+    lesson_id = lessons[0]
+
+    post_batch(client, headers, [{'lesson_id': lesson_id, 'completed': True,
+                                  'start_date': '2026-01-10T10:00:00', 'completion_date': '2026-01-12T10:00:00'}])
+    results = post_batch(client, headers, [{'lesson_id': lesson_id, 'completed': False}])
+
+    assert results['items'][0]['progress']['completed'] is True
+    row = stored(user_id, lesson_id)
+    assert row.completed is True
+    assert row.completion_date.isoformat() == '2026-01-12T10:00:00'
+
+
+def test_duplicate_keys_in_one_batch_are_merged(client, student, lessons):
+    user_id, headers = student
+    lesson_id = lessons[0]
+
+    results = post_batch(client, headers, [
+        {'lesson_id': lesson_id, 'completed': False, 'start_date': '2026-02-02T09:00:00'},
+        {'lesson_id': lesson_id, 'completed': True, 'start_date': '2026-02-03T09:00:00',
+         'completion_date': '2026-02-04T09:00:00'},
+        {'lesson_id': lesson_id, 'completed': False, 'start_date': '2026-02-01T09:00:00'},
+    ])
+
+    assert results['applied'] == 3
+    assert len({item['progress']['progress_id'] for item in results['items']}) == 1
+    row = stored(user_id, lesson_id)
+    assert row.completed is True
+    assert row.start_date.isoformat() == '2026-02-01T09:00:00'
+    assert row.completion_date.isoformat() == '2026-02-04T09:00:00'
+
+
+def test_rejections_are_per_item(client, student, lessons, make_user):
+    user_id, headers = student
+    other_id = make_user().user_id
+
+    results = post_batch(client, headers, [
+        {'lesson_id': lessons[0], 'completed': True},
+        'no es un objeto',
+        {'lesson_id': 'uno', 'completed': True},
+        {'lesson_id': 999999, 'completed': True},
+        {'lesson_id': lessons[1], 'completed': 'sí'},
+        {'lesson_id': lessons[2], 'completed': True, 'start_date': 'ayer'},
+        {'lesson_id': lessons[3], 'completed': True, 'user_id': other_id},
+        {'lesson_id': lessons[4], 'completed': False},
+    ])
+
+    assert [item['status'] for item in results['items']] == [
+        'applied', 'rejected', 'rejected', 'rejected', 'rejected', 'rejected', 'rejected', 'applied'
+    ]
+    assert results['applied'] == 2
+    assert results['rejected'] == 6
+    assert results['items'][3]['error'] == 'Lección no encontrada'
+    assert db.session.execute(db.select(db.func.count()).select_from(UserProgress)).scalar() == 2
+
+
+def test_one_upsert_statement_per_batch(client, student, lessons):
+    user_id, headers = student
+    # Primera petición: llena la caché de usuarios del JWT
+    post_batch(client, headers, [{'lesson_id': lessons[0], 'completed': False}])
+
+    with QueryCounter(db.engine) as counter:
+        counter.reset()
+        post_batch(client, headers, [{'lesson_id': lessons[1], 'completed': True}])
+        small = counter.count
+
+        counter.reset()
+        # Fechas a NULL en unas filas y no en otras: no debe partir el INSERT en varios grupos
+        results = post_batch(client, headers, [
+            {'lesson_id': lesson_id, 'completed': index % 2 == 0}
+            for index, lesson_id in enumerate(lessons)
+        ])
+        large = counter.count
+
+    assert results['applied'] == len(lessons)
+    # Lecciones existentes + un único INSERT ... ON CONFLICT DO UPDATE
+    assert small == large == 2
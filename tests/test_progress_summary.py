@@ -0,0 +1,155 @@
+"""
+Listado filtrado de /userprogress, /userprogress/summary y la caché de resúmenes por usuario
+"""
+from datetime import datetime
+
+import pytest
+
+from api.models import db, Courses, Modules, Lessons, UserProgress
+from api.progress_service import progress_service, ProgressService
+
+
+@pytest.fixture
+def catalog(app):
+    """Dos cursos: el primero con dos módulos de 2 lecciones, el segundo con uno de 4"""
+    layout = {}
+    for course_index, modules in enumerate([(2, 2), (4,)]):
+        course = Courses(title=f'Curso {course_index}', price=0, points=0)
+        db.session.add(course)
+        db.session.flush()
+        layout[course.course_id] = {}
+        for module_index, lesson_count in enumerate(modules):
+            module = Modules(title=f'Módulo {module_index}', order=module_index, course_id=course.course_id)
+            db.session.add(module)
+            db.session.flush()
+            lessons = [Lessons(title=f'Lección {n}', content='...', order=n, module_id=module.module_id)
+                       for n in range(lesson_count)]
+            db.session.add_all(lessons)
+            db.session.flush()
+            layout[course.course_id][module.module_id] = [lesson.lesson_id for lesson in lessons]
+    db.session.commit()
+    return layout
+
+
+def add_progress(user_id, lesson_ids, completed=True):
+    db.session.add_all([
+        UserProgress(user_id=user_id, lesson_id=lesson_id, completed=completed, start_date=datetime(2026, 1, 1))
+        for lesson_id in lesson_ids
+    ])
+    db.session.commit()
+
+
+@pytest.fixture
+def progress(catalog, make_user):
+    """Estudiante con el curso 1 completo y una lección empezada del curso 2; otro estudiante con una lección"""
+    (first_course, first_modules), (second_course, second_modules) = catalog.items()
+    student = make_user()
+    other = make_user()
+    add_progress(student.user_id, [lesson for lessons in first_modules.values() for lesson in lessons])
+    add_progress(student.user_id, list(second_modules.values())[0][:1], completed=False)
+    add_progress(other.user_id, list(first_modules.values())[0][:1])
+    return student, other, first_course, second_course
+
+
+def listing(client, headers, query):
+    response = client.get(f'/api/userprogress?{query}', headers=headers)
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()
+
+
+def test_listing_filters_and_pagination(client, progress, catalog, make_user, auth_headers):
+    student, other, first_course, second_course = progress
+    headers = auth_headers(make_user(role='teacher', is_admin=True))
+    first_module = next(iter(catalog[first_course]))
+
+    assert listing(client, headers, 'per_page=100')['pagination']['total'] == 6
+    assert listing(client, headers, f'course_id={first_course}')['pagination']['total'] == 5
+    assert listing(client, headers, f'module_id={first_module}')['pagination']['total'] == 3
+    body = listing(client, headers, f'course_id={first_course}&user_id={other.user_id}')
+    assert [row['user_id'] for row in body['results']] == [other.user_id]
+
+    pages = [listing(client, headers, f'course_id={first_course}&per_page=2&page={page}') for page in (1, 2, 3)]
+    assert [len(page['results']) for page in pages] == [2, 2, 1]
+    assert pages[0]['pagination']['total_pages'] == 3
+
+    seen, cursor = [], ''
+    while cursor is not None:
+        body = listing(client, headers, f'course_id={first_course}&per_page=2&cursor={cursor}')
+        seen += [row['progress_id'] for row in body['results']]
+        cursor = body['pagination']['next_cursor']
+    assert seen == sorted(seen) and len(set(seen)) == 5
+
+
+def test_students_only_list_their_own_progress(client, progress, auth_headers):
+    student, other, first_course, second_course = progress
+
+    body = listing(client, auth_headers(student), f'user_id={other.user_id}')
+
+    assert {row['user_id'] for row in body['results']} == {student.user_id}
+
+
+def test_summary_per_course(client, progress, auth_headers):
+    student, other, first_course, second_course = progress
+    headers = auth_headers(student)
+
+    response = client.get('/api/userprogress/summary', headers=headers)
+
+    assert response.status_code == 200
+    [summary] = response.get_json()['results']
+    courses = {course['course_id']: course for course in summary['courses']}
+    assert courses[first_course]['completed_lessons'] == 4
+    assert courses[first_course]['completion_percent'] == 100.0
+    assert courses[second_course]['started_lessons'] == 1
+    assert courses[second_course]['completed_lessons'] == 0
+    assert courses[second_course]['total_lessons'] == 4
+
+    response = client.get(f'/api/userprogress/summary?course_id={second_course}', headers=headers)
+    assert [course['course_id'] for course in response.get_json()['results'][0]['courses']] == [second_course]
+
+    response = client.get(f'/api/userprogress/summary?user_id={other.user_id}', headers=headers)
+    assert response.status_code == 403
+
+
+def test_summary_is_refreshed_after_a_progress_write(client, progress, catalog, auth_headers):
+    student, other, first_course, second_course = progress
+    headers = auth_headers(student)
+    second_lessons = list(catalog[second_course].values())[0]
+
+    def completed():
+        results = client.get(f'/api/userprogress/summary?course_id={second_course}', headers=headers).get_json()
+        return results['results'][0]['courses'][0]['completed_lessons']
+
+    assert completed() == 0
+    response = client.post('/api/userprogress/batch', headers=headers,
+                           json={'events': [{'lesson_id': lesson_id, 'completed': True} for lesson_id in second_lessons]})
+    assert response.status_code == 200
+    assert completed() == 4
+
+
+def test_invalidation_during_load_is_not_overwritten(progress, monkeypatch):
+    student = progress[0]
+    service = ProgressService()
+    load = ProgressService._load_summaries
+
+    def load_and_write(user_ids):
+        summaries = load(user_ids)
+        # Escritura (e invalidación) que llega entre la consulta y el guardado en caché
+        service.invalidate(student.user_id)
+        return summaries
+
+    monkeypatch.setattr(ProgressService, '_load_summaries', staticmethod(load_and_write))
+    service.summaries([student.user_id])
+    monkeypatch.setattr(ProgressService, '_load_summaries', staticmethod(load))
+
+    assert student.user_id not in service._summaries
+    service.summaries([student.user_id])
+    assert student.user_id in service._summaries
+
+
+def test_invalidations_stay_bounded(app):
+    service = ProgressService(max_size=3)
+    for user_id in range(10):
+        service.invalidate(user_id)
+
+    assert len(service._invalidated) == 3
+    assert service._evicted_generation == 7
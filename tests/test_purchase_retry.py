@@ -0,0 +1,65 @@
+"""
+Reactivar una compra cancelada crea un PaymentIntent nuevo y reinicia el margen del conciliador
+"""
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from api.models import db, Courses, Purchases
+from api.stripe_service import stripe_service
+
+
+@pytest.fixture
+def payment_intents(monkeypatch):
+    """Sustituye la creación de PaymentIntents: el id se deriva de la clave de idempotencia"""
+    keys = []
+
+    def create_payment_intent(amount_cents, idempotency_key=None, **kwargs):
+        keys.append(idempotency_key)
+        return {'success': True, 'id': f'pi_{idempotency_key}', 'client_secret': f'pi_{idempotency_key}_secret'}
+
+    monkeypatch.setattr(stripe_service, 'create_payment_intent', create_payment_intent)
+    return keys
+
+
+@pytest.fixture
+def course(app):
+    course = Courses(title='Curso', price=10, points=50)
+    db.session.add(course)
+    db.session.commit()
+    return course
+
+
+def buy(client, headers, course_id):
+    response = client.post('/api/purchases-private', json={'course_id': course_id}, headers=headers)
+    assert response.status_code == 201, response.get_json()
+    return response.get_json()['results']['stripe_payment']['payment_intent_id']
+
+
+def test_pending_purchase_reuses_payment_intent(client, make_user, auth_headers, course, payment_intents):
+    headers = auth_headers(make_user())
+    course_id = course.course_id
+
+    assert buy(client, headers, course_id) == buy(client, headers, course_id)
+    assert payment_intents[0] == payment_intents[1]
+
+
+def test_cancelled_purchase_gets_new_payment_intent(client, make_user, auth_headers, course, payment_intents):
+    headers = auth_headers(make_user())
+    course_id = course.course_id
+    first_intent = buy(client, headers, course_id)
+
+    stale_date = datetime.now(timezone.utc) - timedelta(hours=2)
+    db.session.execute(db.update(Purchases).values(status='cancelled', purchase_date=stale_date))
+    db.session.commit()
+
+    second_intent = buy(client, headers, course_id)
+
+    assert second_intent != first_intent
+    assert len(set(payment_intents)) == 2
+
+    purchase = db.session.execute(db.select(Purchases)).scalar_one()
+    assert purchase.status == 'pending'
+    assert purchase.payment_attempt == 1
+    assert purchase.stripe_payment_intent_id == second_intent
+    assert purchase.purchase_date.replace(tzinfo=timezone.utc) > stale_date + timedelta(hours=1)
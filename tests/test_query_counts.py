@@ -0,0 +1,97 @@
+"""
+El número de sentencias SQL de los listados no debe crecer con el número de filas de la página (N+1)
+"""
+import pytest
+from sqlalchemy import event
+
+from api.benchmark import QueryCounter
+from api.catalog_cache_service import catalog_cache
+from api.models import db, Courses, Modules, Lessons, MultimediaResources
+
+
+@pytest.fixture
+def counter(app):
+    with QueryCounter(db.engine) as counter:
+        yield counter
+
+
+def create_lessons(count, media_per_lesson=3, modules=1):
+    course = Courses(title=f'Curso {count}', price=10, points=0)
+    db.session.add(course)
+    for order in range(1, modules + 1):
+        module = Modules(title=f'Módulo {order}', order=order, course_to=course)
+        db.session.add(module)
+    db.session.flush()
+
+    for index in range(count):
+        lesson = Lessons(title=f'Lección {index}', content='...', order=index, module_id=module.module_id)
+        db.session.add(lesson)
+        db.session.flush()
+        db.session.add_all([
+            MultimediaResources(type='image', url=f'https://example.com/{lesson.lesson_id}/{n}.png',
+                                order=n, lesson_id=lesson.lesson_id)
+            for n in range(media_per_lesson)
+        ])
+    db.session.commit()
+    return course.course_id
+
+
+def count_queries(client, counter, url, headers):
+    counter.reset()
+    response = client.get(url, headers=headers)
+    assert response.status_code == 200, response.get_json()
+    return counter.count, response.get_json()
+
+
+@pytest.mark.parametrize('query', ['per_page=100', 'cursor=&per_page=100'])
+def test_lessons_private_query_count_does_not_grow_with_rows(client, counter, make_user, auth_headers, query):
+    headers = auth_headers(make_user(role='teacher', is_admin=True))
+    url = f'/api/lessons-private?{query}'
+
+    # Primera petición: llena la caché de usuarios del JWT
+    create_lessons(2)
+    count_queries(client, counter, url, headers)
+    small, body = count_queries(client, counter, url, headers)
+    assert len(body['results']) == 2
+
+    create_lessons(40)
+    large, body = count_queries(client, counter, url, headers)
+    assert len(body['results']) == 42
+    assert all(len(lesson['multimedia_resources']) == 3 for lesson in body['results'])
+
+    # Conteo (si aplica) + lecciones + multimedia de toda la página
+    assert large == small
+    assert large <= 3
+
+
+def test_course_outline_loads_the_tree_in_at_most_four_queries(client, counter, make_user, auth_headers, monkeypatch):
+    headers = auth_headers(make_user(role='student'))
+    small_id = create_lessons(2, media_per_lesson=1)
+    large_id = create_lessons(30, media_per_lesson=4, modules=5)
+
+    # Primera petición: llena la caché de usuarios del JWT y lee la versión compartida del catálogo
+    count_queries(client, counter, f'/api/courses-private/{small_id}/outline', headers)
+    monkeypatch.setattr(catalog_cache, 'sync_seconds', float('inf'))
+    catalog_cache.bump()
+
+    small, _ = count_queries(client, counter, f'/api/courses-private/{small_id}/outline', headers)
+    large, body = count_queries(client, counter, f'/api/courses-private/{large_id}/outline', headers)
+    lessons = [lesson for module in body['results']['modules'] for lesson in module['lessons']]
+    assert len(body['results']['modules']) == 5 and len(lessons) == 30
+    assert all(len(lesson['multimedia_resources']) == 4 for lesson in lessons)
+
+    # Curso + módulos + lecciones + multimedia, sea cual sea el tamaño
+    assert large == small
+    assert large <= 4
+
+    cached, _ = count_queries(client, counter, f'/api/courses-private/{large_id}/outline', headers)
+    assert cached == 0
+
+
+def test_query_counter_removes_its_listener(app):
+    with QueryCounter(db.engine) as counter:
+        assert event.contains(db.engine, 'before_cursor_execute', counter._count)
+        db.session.execute(db.select(Courses.course_id)).all()
+        assert counter.count == 1
+
+    assert not event.contains(db.engine, 'before_cursor_execute', counter._count)
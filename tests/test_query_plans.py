@@ -0,0 +1,21 @@
+"""
+Las consultas calientes usan índices (EXPLAIN en PostgreSQL: TEST_DATABASE_URL=postgresql://...)
+"""
+import os
+
+import pytest
+
+from api.commands import explain_hot_queries
+
+pytestmark = pytest.mark.skipif(
+    not os.environ['DATABASE_URL'].startswith('postgres'),
+    reason='EXPLAIN de las consultas calientes requiere PostgreSQL (TEST_DATABASE_URL)'
+)
+
+
+def test_hot_queries_use_an_index(app):
+    plans = explain_hot_queries()
+
+    assert plans
+    seq_scans = {name: plan for name, plan in plans if 'Seq Scan' in plan}
+    assert not seq_scans, seq_scans
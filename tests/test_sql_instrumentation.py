@@ -0,0 +1,51 @@
+"""
+Instrumentación SQL por petición: cabecera Server-Timing con el número de sentencias
+"""
+import re
+
+import pytest
+from flask import g
+from sqlalchemy.exc import OperationalError
+
+from api.benchmark import QueryCounter
+from api.models import db, Courses
+from api.sql_instrumentation import RequestSqlStats
+
+
+def server_timing(response):
+    header = response.headers['Server-Timing']
+    match = re.fullmatch(r'db;dur=([\d.]+);desc="(\d+) queries", app;dur=([\d.]+)', header)
+    assert match, header
+    return float(match.group(1)), int(match.group(2)), float(match.group(3))
+
+
+def test_server_timing_reports_request_queries(client, make_user, auth_headers):
+    headers = auth_headers(make_user(role='teacher', is_admin=True))
+    db.session.add(Courses(title='Curso', price=0, points=0))
+    db.session.commit()
+    client.get('/api/lessons-private', headers=headers)
+
+    with QueryCounter(db.engine) as counter:
+        response = client.get('/api/lessons-private', headers=headers)
+
+    db_ms, queries, app_ms = server_timing(response)
+    assert response.status_code == 200
+    assert queries == counter.count > 0
+    assert 0 <= db_ms <= app_ms
+
+
+def test_failed_statement_does_not_leak_timing_state(app):
+    with app.test_request_context('/'):
+        g.sql_stats = stats = RequestSqlStats()
+        connection = db.session.connection()
+
+        for _ in range(3):
+            with pytest.raises(OperationalError):
+                db.session.execute(db.text('SELECT * FROM tabla_inexistente'))
+            db.session.rollback()
+            connection = db.session.connection()
+        db.session.execute(db.text('SELECT 1'))
+
+        assert stats.count == 1
+        assert not connection.info.get('sql_timing_start')
+        db.session.rollback()
@@ -0,0 +1,93 @@
+"""
+Bandeja de webhooks de Stripe: un evento o un lote que falla no bloquea al resto ni al worker
+"""
+import json
+
+import pytest
+
+from api import stripe_webhook_service as webhooks
+from api.models import db, Courses, Purchases, StripeWebhookEvents, Users
+from api.points_service import PointsService
+from api.stripe_webhook_service import StripeWebhookService, STRIPE_WEBHOOK_MAX_ATTEMPTS
+
+
+@pytest.fixture
+def purchases(make_user):
+    student = make_user(role='student')
+    courses = [Courses(title=f'Curso {index}', price=10, points=50) for index in range(2)]
+    db.session.add_all(courses)
+    db.session.flush()
+    rows = [
+        Purchases(price=10, total=10, status='pending', course_id=course.course_id, user_id=student.user_id,
+                  stripe_payment_intent_id=f'pi_{index}')
+        for index, course in enumerate(courses)
+    ]
+    db.session.add_all(rows)
+    db.session.commit()
+    return student.user_id, [row.purchase_id for row in rows]
+
+
+def enqueue_succeeded(intent_id):
+    payload = json.dumps({'type': 'payment_intent.succeeded', 'data': {'object': {'id': intent_id}}})
+    StripeWebhookService.enqueue(f'evt_{intent_id}', 'payment_intent.succeeded', payload)
+    db.session.commit()
+
+
+def statuses():
+    db.session.expire_all()
+    return {event.event_id: (event.status, event.attempts)
+            for event in db.session.execute(db.select(StripeWebhookEvents)).scalars()}
+
+
+def test_failed_award_only_affects_its_event(purchases, monkeypatch):
+    user_id, purchase_ids = purchases
+    enqueue_succeeded('pi_0')
+    enqueue_succeeded('pi_1')
+
+    original = PointsService.award_batch
+
+    def award_batch(awards):
+        if any(award['source_id'] == purchase_ids[0] for award in awards):
+            raise RuntimeError('fallo otorgando puntos')
+        return original(awards)
+
+    monkeypatch.setattr(webhooks.points_service, 'award_batch', award_batch)
+
+    assert StripeWebhookService.process_batch() == 2
+
+    assert statuses() == {'evt_pi_0': ('pending', 1), 'evt_pi_1': ('processed', 1)}
+    assert db.session.get(Purchases, purchase_ids[0]).status == 'pending'
+    assert db.session.get(Purchases, purchase_ids[1]).status == 'paid'
+    assert db.session.get(Users, user_id).current_points == 50
+
+
+def test_failed_batch_counts_attempts_until_failed(purchases, monkeypatch):
+    enqueue_succeeded('pi_0')
+
+    def apply_events(events):
+        raise RuntimeError('fallo del lote')
+
+    monkeypatch.setattr(StripeWebhookService, '_apply_events', staticmethod(apply_events))
+
+    for attempt in range(1, STRIPE_WEBHOOK_MAX_ATTEMPTS):
+        StripeWebhookService.process_batch()
+        assert statuses() == {'evt_pi_0': ('pending', attempt)}
+
+    StripeWebhookService.process_batch()
+    assert statuses() == {'evt_pi_0': ('failed', STRIPE_WEBHOOK_MAX_ATTEMPTS)}
+    assert StripeWebhookService.process_batch() == 0
+
+
+def test_worker_survives_errors(app, monkeypatch):
+    results = iter([RuntimeError('base de datos caída'), 3, 0])
+
+    def process_batch(limit):
+        result = next(results)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    monkeypatch.setattr(StripeWebhookService, 'process_batch', staticmethod(process_batch))
+    monkeypatch.setattr(webhooks.time, 'sleep', lambda seconds: None)
+
+    assert StripeWebhookService.run_worker(once=True) == 3
@@ -0,0 +1,101 @@
+"""
+Editar o borrar un registro de puntos mantiene sincronizados total, current_points, ranking y logros
+"""
+import pytest
+
+from api.leaderboard_service import leaderboard
+from api.models import db, Achievements, Users, UserAchievements, UserPointsTotals
+from api.user_cache_service import user_cache
+
+
+@pytest.fixture
+def setup(make_user, auth_headers):
+    admin = make_user(role='teacher', is_admin=True)
+    student = make_user(role='student')
+    db.session.add(Achievements(name='Cien', description='100 puntos', required_points=100))
+    db.session.commit()
+    return auth_headers(admin), student.user_id
+
+
+def state(user_id):
+    db.session.expire_all()
+    total = db.session.get(UserPointsTotals, user_id)
+    achievements = db.session.execute(
+        db.select(db.func.count()).select_from(UserAchievements).where(UserAchievements.user_id == user_id)
+    ).scalar()
+    return {
+        'current': db.session.get(Users, user_id).current_points,
+        'total': total.total_points if total else 0,
+        'cached': user_cache.get(user_id)['current_points'],
+        'ranking': next((entry['points'] for entry in leaderboard.page(0, 100)[0] if entry['user_id'] == user_id), 0),
+        'achievements': achievements
+    }
+
+
+def test_put_and_delete_keep_points_in_sync(client, setup):
+    headers, user_id = setup
+
+    response = client.post('/api/user-points', json={'user_id': user_id, 'points': 40}, headers=headers)
+    assert response.status_code == 201
+    point_id = response.get_json()['results']['point_id']
+    assert state(user_id) == {'current': 40, 'total': 40, 'cached': 40, 'ranking': 40, 'achievements': 0}
+
+    response = client.put(f'/api/user-points/{point_id}', json={'points': 120}, headers=headers)
+    assert response.status_code == 200
+    assert state(user_id) == {'current': 120, 'total': 120, 'cached': 120, 'ranking': 120, 'achievements': 1}
+
+    response = client.delete(f'/api/user-points/{point_id}', headers=headers)
+    assert response.status_code == 200
+    # Los logros no se retiran al bajar los puntos
+    assert state(user_id) == {'current': 0, 'total': 0, 'cached': 0, 'ranking': 0, 'achievements': 1}
+
+
+def test_put_moving_record_to_another_user(client, setup, make_user):
+    headers, user_id = setup
+    other_id = make_user(role='student').user_id
+
+    point_id = client.post('/api/user-points', json={'user_id': user_id, 'points': 30},
+                           headers=headers).get_json()['results']['point_id']
+    response = client.put(f'/api/user-points/{point_id}', json={'user_id': other_id}, headers=headers)
+    assert response.status_code == 200
+
+    assert state(user_id)['current'] == 0 and state(user_id)['total'] == 0
+    assert state(other_id)['current'] == 30 and state(other_id)['total'] == 30
+
+
+@pytest.mark.parametrize('body', [
+    {'points': 0, 'source_type': 'purchase', 'source_id': 1},
+    {'points': 0, 'source_type': 'lesson', 'source_id': 1},
+    {'points': 0, 'source_type': 'module', 'source_id': 1},
+    {'points': 5, 'source_type': 'x' * 31, 'source_id': 1},
+    {'points': 5, 'source_type': '', 'source_id': 1},
+    {'points': 5, 'source_type': 'bonus', 'source_id': True},
+    {'points': True},
+])
+def test_post_rejects_reserved_or_invalid_sources(client, setup, body):
+    headers, user_id = setup
+
+    response = client.post('/api/user-points', json={'user_id': user_id, **body}, headers=headers)
+
+    assert response.status_code == 400
+    assert state(user_id)['total'] == 0
+
+
+def test_post_with_manual_source_is_idempotent(client, setup):
+    headers, user_id = setup
+    body = {'user_id': user_id, 'points': 10, 'source_type': 'bonus', 'source_id': 7}
+
+    assert client.post('/api/user-points', json=body, headers=headers).status_code == 201
+    assert client.post('/api/user-points', json=body, headers=headers).status_code == 409
+    assert state(user_id)['total'] == 10
+
+
+def test_put_rejects_boolean_points(client, setup):
+    headers, user_id = setup
+    point_id = client.post('/api/user-points', json={'user_id': user_id, 'points': 30},
+                           headers=headers).get_json()['results']['point_id']
+
+    response = client.put(f'/api/user-points/{point_id}', json={'points': True}, headers=headers)
+
+    assert response.status_code == 400
+    assert state(user_id)['total'] == 30